@@ -1,9 +1,9 @@
 import json
 import os
 from typing import List, Dict, Any
-import openai
 from summarizer import summarize_document
 from utils import build_document_metadata_string
+from llm_cache import cached_openai_client
 
 def generate_questions_from_summary(
     cumulative_summary: str,
@@ -133,7 +133,7 @@ def process_input_file(input_file: str = "input.json") -> Dict[str, Any]:
         input_data = json.load(f)
     
     # Initialize OpenAI client
-    openai_client = openai.OpenAI()
+    openai_client = cached_openai_client()
     
     # Handle both array and single file structures
     if 'files' in input_data and isinstance(input_data['files'], list):
@@ -0,0 +1,413 @@
+# Shared, rate-limited access to the OpenAI and Voyage APIs
+# Every request runs on one asyncio event loop (in a background thread), so all stages and threads share:
+# - a token bucket per model (requests and tokens per minute),
+# - a global concurrency limit,
+# - jittered exponential retries on rate limits and transient errors (honouring Retry-After),
+# - per-model call metrics (latency, tokens, retries, failures, estimated cost),
+# - a tracing span per call (see tracing.py), attributed to the calling stage and document.
+#
+# Async code awaits APIClientLayer.chat_completion / contextualized_embed / rerank directly.
+# Synchronous stages use the client-shaped facades from openai_client() and voyage_client(),
+# which are drop-in replacements for OpenAI() and voyageai.Client().
+#
+# Rate limits default to DEFAULT_RATE_LIMITS and can be overridden per model with the
+# API_RATE_LIMITS env var, e.g. API_RATE_LIMITS='{"gpt-4o-mini": {"rpm": 10000, "tpm": 10000000}}'.
+
+import asyncio
+import json
+import os
+import random
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+import openai
+import voyageai
+import voyageai.error
+
+from pipeline_logging import get_logger
+from tracing import carry_context, current_context, get_tracer, span
+
+logger = get_logger("api_clients")
+
+RATE_LIMITS_ENV = "API_RATE_LIMITS"
+
+# Requests / tokens per minute per model (None: unlimited); set these to the account's limits
+DEFAULT_RATE_LIMITS: Dict[str, Dict[str, Optional[float]]] = {
+    "gpt-4o-mini": {"rpm": 5000, "tpm": 4_000_000},
+    "gpt-4o": {"rpm": 5000, "tpm": 800_000},
+    "voyage-context-3": {"rpm": 2000, "tpm": 3_000_000},
+    "rerank-2": {"rpm": 2000, "tpm": 2_000_000},
+}
+
+# USD per million tokens: (prompt, completion); embedding and rerank models bill total tokens as prompt
+MODEL_PRICES: Dict[str, tuple] = {
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4o": (2.50, 10.00),
+    "voyage-context-3": (0.18, 0.0),
+    "rerank-2": (0.05, 0.0),
+}
+
+# Errors from either API (retried or not); stages let these propagate instead of returning empty results
+API_ERRORS = (openai.APIError, voyageai.error.VoyageError)
+
+# Errors worth retrying with backoff (rate limits and transient server/network failures)
+RETRYABLE_ERRORS = (
+    openai.RateLimitError, openai.APIConnectionError, openai.APITimeoutError, openai.InternalServerError,
+    voyageai.error.RateLimitError, voyageai.error.ServiceUnavailableError, voyageai.error.ServerError,
+    voyageai.error.Timeout, voyageai.error.APIConnectionError, voyageai.error.TryAgain,
+)
+
+# Completion tokens assumed for a chat request without max_tokens (corrected from usage afterwards)
+DEFAULT_COMPLETION_TOKENS = 1024
+
+
+def retry_after_seconds(error: Exception) -> Optional[float]:
+    """Read a Retry-After hint (in seconds) from an API error response, if present."""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or getattr(error, "headers", None) or {}
+    value = headers.get("retry-after") if hasattr(headers, "get") else None
+    try:
+        return float(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+def estimate_cost(model: str, used: Dict[str, int]) -> float:
+    """Cost in USD of a call's token usage (0 for models without a price)."""
+    prompt_price, completion_price = MODEL_PRICES.get(model, (0.0, 0.0))
+    prompt = used.get("prompt_tokens", used.get("total_tokens", 0) - used.get("completion_tokens", 0))
+    return (prompt * prompt_price + used.get("completion_tokens", 0) * completion_price) / 1_000_000
+
+
+def load_rate_limits(overrides: Optional[Dict[str, Dict[str, Optional[float]]]] = None) -> Dict[str, Dict[str, Optional[float]]]:
+    limits = {model: dict(limit) for model, limit in DEFAULT_RATE_LIMITS.items()}
+    env_limits = os.getenv(RATE_LIMITS_ENV)
+    for source in (json.loads(env_limits) if env_limits else {}, overrides or {}):
+        for model, limit in source.items():
+            limits.setdefault(model, {}).update(limit)
+    return limits
+
+
+class TokenBucket:
+    """Requests and tokens per minute for one model. Only used from the layer's event loop."""
+
+    def __init__(self, rpm: Optional[float] = None, tpm: Optional[float] = None):
+        self.rpm = rpm
+        self.tpm = tpm
+        self.requests = float(rpm or 0)
+        self.tokens = float(tpm or 0)
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+
+    def _refill(self, now: float) -> None:
+        elapsed = now - self.updated
+        self.updated = now
+        if self.rpm:
+            self.requests = min(self.rpm, self.requests + elapsed * self.rpm / 60.0)
+        if self.tpm:
+            self.tokens = min(self.tpm, self.tokens + elapsed * self.tpm / 60.0)
+
+    async def acquire(self, tokens: int) -> float:
+        """Wait until one request and `tokens` tokens are available, then take them; returns the time waited."""
+        started = time.monotonic()
+        # A request larger than the whole bucket only waits for a full bucket
+        tokens = min(tokens, self.tpm) if self.tpm else tokens
+        while True:
+            now = time.monotonic()
+            self._refill(now)
+            wait = self.paused_until - now
+            if self.rpm and self.requests < 1:
+                wait = max(wait, (1 - self.requests) * 60.0 / self.rpm)
+            if self.tpm and self.tokens < tokens:
+                wait = max(wait, (tokens - self.tokens) * 60.0 / self.tpm)
+            if wait <= 0:
+                self.requests -= 1
+                self.tokens -= tokens
+                return now - started
+            await asyncio.sleep(wait)
+
+    def settle(self, estimated: int, actual: int) -> None:
+        """Correct the token estimate taken in acquire() with the usage the API reported."""
+        if self.tpm:
+            self.tokens += estimated - actual
+
+    def pause(self, seconds: float) -> None:
+        """Hold back every request for this model, e.g. after a 429 with Retry-After."""
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+
+@dataclass
+class ModelMetrics:
+    calls: int = 0
+    failures: int = 0
+    retries: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    total_tokens: int = 0
+    latencies: List[float] = field(default_factory=list)
+    queued_seconds: float = 0.0
+    cost_usd: float = 0.0
+
+    def summary(self) -> Dict[str, Any]:
+        latencies = sorted(self.latencies)
+
+        def percentile(p: float) -> float:
+            return round(latencies[min(len(latencies) - 1, int(p * len(latencies)))], 3) if latencies else 0.0
+
+        return {
+            "calls": self.calls,
+            "failures": self.failures,
+            "retries": self.retries,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "total_tokens": self.total_tokens,
+            "latency_p50": percentile(0.5),
+            "latency_p95": percentile(0.95),
+            "latency_max": round(latencies[-1], 3) if latencies else 0.0,
+            "queued_seconds": round(self.queued_seconds, 3),
+            "cost_usd": round(self.cost_usd, 6),
+        }
+
+
+def _chat_token_estimate(kwargs: Dict[str, Any]) -> int:
+    """Rough token count of a chat request (about 4 characters per token) plus its completion budget."""
+    chars = sum(len(str(message.get("content") or "")) for message in kwargs.get("messages", []))
+    for key in ("response_format", "tools"):
+        if kwargs.get(key):
+            chars += len(json.dumps(kwargs[key]))
+    completion = kwargs.get("max_tokens") or kwargs.get("max_completion_tokens") or DEFAULT_COMPLETION_TOKENS
+    return chars // 4 + completion
+
+
+class APIClientLayer:
+    """Rate limiter, retry policy and metrics around async OpenAI and Voyage clients."""
+
+    def __init__(self, max_concurrency: int = 16, max_retries: int = 6, initial_backoff: float = 1.0,
+                 max_backoff: float = 60.0, rate_limits: Optional[Dict[str, Dict[str, Optional[float]]]] = None,
+                 openai_factory: Optional[Callable[[Optional[str]], Any]] = None,
+                 voyage_factory: Optional[Callable[[Optional[str]], Any]] = None):
+        """openai_factory / voyage_factory build the async client for an API key (default: the SDK clients)."""
+        self.openai_factory = openai_factory or self._default_openai
+        self.voyage_factory = voyage_factory or self._default_voyage
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_retries = max_retries
+        self.initial_backoff = initial_backoff
+        self.max_backoff = max_backoff
+        self.rate_limits = load_rate_limits(rate_limits)
+        self.metrics: Dict[str, ModelMetrics] = {}
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._openai_clients: Dict[Optional[str], Any] = {}
+        self._voyage_clients: Dict[Optional[str], Any] = {}
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_lock = threading.Lock()
+
+    # ---------------------------
+    # Event loop for synchronous callers
+    # ---------------------------
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        with self._loop_lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                threading.Thread(target=self._loop.run_forever, name="api-client-loop", daemon=True).start()
+        return self._loop
+
+    def run(self, coro: Awaitable) -> Any:
+        """Run a coroutine on the layer's event loop from synchronous code and wait for its result."""
+        # Run under the caller's span and document, so API spans nest under the stage that made the call
+        if get_tracer() is not None:
+            coro = carry_context(coro, **current_context())
+        return asyncio.run_coroutine_threadsafe(coro, self._ensure_loop()).result()
+
+    # ---------------------------
+    # Clients
+    # ---------------------------
+
+    @staticmethod
+    def _default_openai(api_key: Optional[str]):
+        # Retries are done here, with the shared limiter, not by the SDK
+        return openai.AsyncOpenAI(api_key=api_key, max_retries=0)
+
+    @staticmethod
+    def _default_voyage(api_key: Optional[str]):
+        return voyageai.AsyncClient(api_key=api_key or os.getenv("VOYAGE_API_KEY"))
+
+    def _openai(self, api_key: Optional[str]):
+        if api_key not in self._openai_clients:
+            self._openai_clients[api_key] = self.openai_factory(api_key)
+        return self._openai_clients[api_key]
+
+    def _voyage(self, api_key: Optional[str]):
+        if api_key not in self._voyage_clients:
+            self._voyage_clients[api_key] = self.voyage_factory(api_key)
+        return self._voyage_clients[api_key]
+
+    def _bucket(self, model: str) -> TokenBucket:
+        if model not in self._buckets:
+            limit = self.rate_limits.get(model, {})
+            self._buckets[model] = TokenBucket(limit.get("rpm"), limit.get("tpm"))
+        return self._buckets[model]
+
+    # ---------------------------
+    # Calls
+    # ---------------------------
+
+    async def call(self, model: str, estimated_tokens: int, request: Callable[[], Awaitable[Any]],
+                   usage: Callable[[Any], Dict[str, int]], operation: str = "api") -> Any:
+        """Run request() under the model's rate limit and the concurrency limit, retrying transient errors."""
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        bucket = self._bucket(model)
+        metrics = self.metrics.setdefault(model, ModelMetrics())
+        delay = self.initial_backoff
+        with span(operation, kind="api", model=model, retries=0) as trace:
+            for attempt in range(self.max_retries + 1):
+                queued = await bucket.acquire(estimated_tokens)
+                metrics.queued_seconds += queued
+                trace.add("queued_seconds", round(queued, 6))
+                async with self._semaphore:
+                    started = time.perf_counter()
+                    try:
+                        response = await request()
+                    except RETRYABLE_ERRORS as e:
+                        # A rejected request used no tokens
+                        bucket.settle(estimated_tokens, 0)
+                        if attempt == self.max_retries:
+                            metrics.failures += 1
+                            raise
+                        wait = retry_after_seconds(e) or delay * (0.5 + random.random())
+                        if isinstance(e, (openai.RateLimitError, voyageai.error.RateLimitError)):
+                            bucket.pause(wait)
+                        metrics.retries += 1
+                        trace.add("retries")
+                        logger.warning("%s from %s, retrying in %.1fs (%d/%d)", type(e).__name__, model, wait,
+                                       attempt + 1, self.max_retries)
+                        delay = min(delay * 2, self.max_backoff)
+                    except Exception:
+                        metrics.failures += 1
+                        raise
+                    else:
+                        latency = time.perf_counter() - started
+                        metrics.latencies.append(latency)
+                        metrics.calls += 1
+                        used = usage(response)
+                        cost = estimate_cost(model, used)
+                        metrics.prompt_tokens += used.get("prompt_tokens", 0)
+                        metrics.completion_tokens += used.get("completion_tokens", 0)
+                        metrics.total_tokens += used.get("total_tokens", 0)
+                        metrics.cost_usd += cost
+                        bucket.settle(estimated_tokens, used.get("total_tokens", estimated_tokens))
+                        trace.set(latency=round(latency, 6), cost_usd=round(cost, 8), **used)
+                        return response
+                await asyncio.sleep(wait)
+
+    async def chat_completion(self, api_key: Optional[str] = None, **kwargs) -> Any:
+        def usage(response) -> Dict[str, int]:
+            u = getattr(response, "usage", None)
+            if u is None:
+                return {}
+            return {"prompt_tokens": u.prompt_tokens, "completion_tokens": u.completion_tokens,
+                    "total_tokens": u.total_tokens}
+
+        client = self._openai(api_key)
+        return await self.call(kwargs.get("model", ""), _chat_token_estimate(kwargs),
+                               lambda: client.chat.completions.create(**kwargs), usage, operation="openai.chat")
+
+    async def contextualized_embed(self, api_key: Optional[str] = None, **kwargs) -> Any:
+        inputs = kwargs.get("inputs", [])
+        chars = sum(len(text) for document in inputs for text in (document if isinstance(document, list) else [document]))
+        client = self._voyage(api_key)
+        return await self.call(kwargs.get("model", ""), chars // 3, lambda: client.contextualized_embed(**kwargs),
+                               lambda r: {"total_tokens": getattr(r, "total_tokens", 0) or 0},
+                               operation="voyage.contextualized_embed")
+
+    async def rerank(self, api_key: Optional[str] = None, **kwargs) -> Any:
+        chars = len(kwargs.get("query", "")) * len(kwargs.get("documents", [])) + sum(map(len, kwargs.get("documents", [])))
+        client = self._voyage(api_key)
+        return await self.call(kwargs.get("model", ""), chars // 3, lambda: client.rerank(**kwargs),
+                               lambda r: {"total_tokens": getattr(r, "total_tokens", 0) or 0},
+                               operation="voyage.rerank")
+
+    # ---------------------------
+    # Metrics
+    # ---------------------------
+
+    def metrics_summary(self) -> Dict[str, Dict[str, Any]]:
+        return {model: metrics.summary() for model, metrics in sorted(self.metrics.items())}
+
+    def print_metrics(self) -> None:
+        summary = self.metrics_summary()
+        if not summary:
+            return
+        print("\nAPI calls:")
+        for model, m in summary.items():
+            print(f"  {model}: {m['calls']} calls, {m['retries']} retries, {m['failures']} failed, "
+                  f"{m['total_tokens']} tokens, latency p50 {m['latency_p50']}s / p95 {m['latency_p95']}s, "
+                  f"{m['queued_seconds']}s waiting for rate limits, ${m['cost_usd']:.4f}")
+
+
+class _Completions:
+    def __init__(self, facade: "OpenAIClientFacade"):
+        self._facade = facade
+
+    def create(self, **kwargs):
+        return self._facade.layer.run(self._facade.layer.chat_completion(api_key=self._facade.api_key, **kwargs))
+
+
+class _Chat:
+    def __init__(self, facade: "OpenAIClientFacade"):
+        self.completions = _Completions(facade)
+
+
+class OpenAIClientFacade:
+    """Synchronous OpenAI-client stand-in: chat.completions.create goes through the shared layer."""
+
+    def __init__(self, layer: APIClientLayer, api_key: Optional[str] = None):
+        self.layer = layer
+        self.api_key = api_key
+        self.chat = _Chat(self)
+
+
+class VoyageClientFacade:
+    """Synchronous voyageai.Client stand-in for contextualized_embed and rerank."""
+
+    def __init__(self, layer: APIClientLayer, api_key: Optional[str] = None):
+        self.layer = layer
+        self.api_key = api_key
+
+    def contextualized_embed(self, **kwargs):
+        return self.layer.run(self.layer.contextualized_embed(api_key=self.api_key, **kwargs))
+
+    def rerank(self, **kwargs):
+        return self.layer.run(self.layer.rerank(api_key=self.api_key, **kwargs))
+
+
+_shared_layer: Optional[APIClientLayer] = None
+_shared_layer_lock = threading.Lock()
+
+
+def shared_api_layer() -> APIClientLayer:
+    """The process-wide layer (concurrency from API_MAX_CONCURRENCY, default 16)."""
+    global _shared_layer
+    with _shared_layer_lock:
+        if _shared_layer is None:
+            _shared_layer = APIClientLayer(max_concurrency=int(os.getenv("API_MAX_CONCURRENCY") or 16))
+        return _shared_layer
+
+
+def set_shared_api_layer(layer: Optional[APIClientLayer]) -> None:
+    """Replace the process-wide layer (e.g. with one backed by local stand-in services); None resets it."""
+    global _shared_layer
+    with _shared_layer_lock:
+        _shared_layer = layer
+
+
+def openai_client(api_key: Optional[str] = None) -> OpenAIClientFacade:
+    return OpenAIClientFacade(shared_api_layer(), api_key)
+
+
+def voyage_client(api_key: Optional[str] = None) -> VoyageClientFacade:
+    return VoyageClientFacade(shared_api_layer(), api_key)
@@ -0,0 +1,432 @@
+# OpenAI Batch API mode for the entities, relations and interpretation stages
+# For overnight corpus runs that don't need interactive latency: batched requests cost half as much and do not
+# count against the per-minute rate limits. Per stage, for all documents the stage would run for (see
+# run_pipeline.PipelineRunner):
+# 1. collect: run the stage's extraction code with a RecordingOpenAIClient, which records every request that is
+#    not in the LLM cache yet and answers it with an empty, schema-valid placeholder. No stage outputs are
+#    written; the extractors' debug/ files (prompts, full_qa.txt) are, and the apply step overwrites them.
+# 2. submit: write the requests to JSONL batch files (custom_id = the request's LLM cache key), upload them,
+#    create the batches and poll until they finish. Batch ids are kept in <batch-dir>/batch_state.json, so an
+#    interrupted run re-attaches to its batches instead of submitting them again.
+# 3. store: put every response into the LLM response cache (llm_cache.py) under its custom_id.
+# 4. apply: run the stage through PipelineRunner as usual. Every request is now a cache hit, so entities.json,
+#    relations.json and interpretation.json get exactly the interactive post-processing.
+# Stages depend on each other's outputs, so they are batched one after the other.
+#
+# Documents with failed batch requests are left for the next run, unless --fallback-interactive is given
+# (their missing requests then go to the API interactively during the apply step).
+#
+# fake_services.FakeBatchOpenAI is a local stub of the Batch API; benchmark_pipeline.py --batch runs these
+# stages through it in a scratch workspace.
+#
+# Usage:
+#   python batch_runner.py                                       # entities -> relations -> interpretation
+#   python batch_runner.py --stages relations --documents bouwman_1991
+#   python batch_runner.py --poll-interval 300 --timeout 3600   # stop polling after an hour; re-run to resume
+
+import argparse
+import hashlib
+import json
+import os
+import threading
+import time
+from types import SimpleNamespace
+from typing import Any, Dict, Iterator, List, Optional, Set
+
+from api_clients import estimate_cost
+from llm_cache import get_shared_cache, request_cache_key
+from pipeline_logging import add_logging_arguments, configure_logging_from_args, get_logger
+from run_pipeline import INPUT_FILE, PipelineRunner
+from tracing import current_context, document
+
+logger = get_logger("batch_runner")
+
+BATCH_STAGES = ["entities", "relations", "interpretation"]
+BATCH_ENDPOINT = "/v1/chat/completions"
+BATCH_STATE_FILE = "batch_state.json"
+
+# Batch API limits per input file (50,000 requests, 200 MB), with some headroom on the size
+MAX_BATCH_REQUESTS = 50_000
+MAX_BATCH_BYTES = 190 * 1024 * 1024
+
+# Batch requests are billed at half the interactive price
+BATCH_DISCOUNT = 0.5
+
+TERMINAL_STATUSES = ("completed", "failed", "expired", "cancelled")
+
+
+# ---------------------------
+# Collect
+# ---------------------------
+
+def placeholder_value(schema: Dict[str, Any]) -> Any:
+    """The smallest JSON value matching a JSON schema (empty arrays and strings, first enum value)."""
+    if "enum" in schema:
+        return schema["enum"][0]
+    kind = schema.get("type", "string")
+    if isinstance(kind, list):
+        kind = next((k for k in kind if k != "null"), "null")
+    if kind == "object":
+        return {key: placeholder_value(sub) for key, sub in (schema.get("properties") or {}).items()}
+    return {"array": [], "string": "", "integer": 0, "number": 0.0, "boolean": False}.get(kind)
+
+
+def placeholder_content(request: Dict[str, Any]) -> str:
+    response_format = request.get("response_format") or {}
+    if response_format.get("type") == "json_schema":
+        return json.dumps(placeholder_value(response_format["json_schema"].get("schema", {})))
+    if response_format.get("type") == "json_object":
+        return "{}"
+    return ""
+
+
+class RecordingOpenAIClient:
+    """OpenAI client stand-in for the collect pass.
+
+    Requests already in the cache get their cached response; the others are recorded (per document, from the
+    tracing context) and answered with a placeholder, so the calling code finishes without output of value.
+    """
+
+    def __init__(self, cache):
+        self.cache = cache
+        self.requests: Dict[str, Dict[str, Any]] = {}
+        self.documents: Dict[str, Set[str]] = {}
+        self._lock = threading.Lock()
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create_chat_completion))
+
+    def create_chat_completion(self, **kwargs):
+        from openai.types.chat import ChatCompletion
+
+        key = request_cache_key(kwargs)
+        document_id = current_context()["document_id"] or "-"
+        with self._lock:
+            self.documents.setdefault(document_id, set()).add(key)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return ChatCompletion.model_validate(cached)
+        with self._lock:
+            self.requests.setdefault(key, kwargs)
+        return ChatCompletion.model_validate({
+            "id": "chatcmpl-batch-placeholder",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": kwargs.get("model", ""),
+            "choices": [{"index": 0, "finish_reason": "stop",
+                         "message": {"role": "assistant", "content": placeholder_content(kwargs)}}],
+        })
+
+
+def collect_requests(runner: PipelineRunner, stage: str, entries: List[Dict[str, Any]],
+                     client: RecordingOpenAIClient) -> Set[str]:
+    """Run a stage's extraction for entries against the recording client, without writing stage outputs.
+
+    Returns the file_ids that failed (e.g. an upstream output is missing); the stage cannot run for them.
+    """
+    failed = set()
+    if stage == "entities":
+        from entity_extractor import FirstExtractor
+        extractor = FirstExtractor(input_metadata_file=runner.input_file)
+        extractor.client = client
+        qa_paths = [os.path.join(runner.doc_dir(e), "rag_document_qa.json") for e in entries]
+        for entry, outcome in zip(entries, extractor.extract_from_files(qa_paths).values()):
+            if isinstance(outcome, Exception):
+                logger.warning("[%s] %s: could not collect requests: %s", stage, entry["file_id"], outcome)
+                failed.add(entry["file_id"])
+        return failed
+    if stage == "relations":
+        from relationship_extractor import WorkSchemaGenerator
+        generator = WorkSchemaGenerator()
+        generator.client = client
+        run = lambda entry: generator.generate_work_schemas(os.path.join(runner.doc_dir(entry), "entities.json"))
+    elif stage == "interpretation":
+        from interpretation_extractor import InterpretationExtractor
+        extractor = InterpretationExtractor()
+        extractor.client = client
+        run = lambda entry: extractor.extract(**runner.interpretation_arguments(entry))
+    else:
+        raise ValueError(f"Stage {stage} has no batch mode; expected one of {BATCH_STAGES}")
+    for entry in entries:
+        try:
+            with document(entry["file_id"]):
+                run(entry)
+        except Exception as e:
+            logger.warning("[%s] %s: could not collect requests: %s", stage, entry["file_id"], e)
+            failed.add(entry["file_id"])
+    return failed
+
+
+# ---------------------------
+# Batch files
+# ---------------------------
+
+def batch_lines(requests: Dict[str, Dict[str, Any]]) -> Iterator[str]:
+    for key in sorted(requests):
+        yield json.dumps({"custom_id": key, "method": "POST", "url": BATCH_ENDPOINT, "body": requests[key]},
+                         ensure_ascii=False)
+
+
+def write_batch_files(requests: Dict[str, Dict[str, Any]], directory: str, prefix: str,
+                      max_requests: int = MAX_BATCH_REQUESTS, max_bytes: int = MAX_BATCH_BYTES) -> List[str]:
+    """Write requests as JSONL batch input files, split to stay under the per-file limits."""
+    os.makedirs(directory, exist_ok=True)
+    paths: List[str] = []
+    out, count, size = None, 0, 0
+    try:
+        for line in batch_lines(requests):
+            data = (line + "\n").encode("utf-8")
+            if out is None or count >= max_requests or (count and size + len(data) > max_bytes):
+                if out is not None:
+                    out.close()
+                paths.append(os.path.join(directory, f"{prefix}_{len(paths) + 1:03d}.jsonl"))
+                out, count, size = open(paths[-1], "wb"), 0, 0
+            out.write(data)
+            count += 1
+            size += len(data)
+    finally:
+        if out is not None:
+            out.close()
+    return paths
+
+
+def requests_digest(keys: Set[str]) -> str:
+    return hashlib.sha256("\n".join(sorted(keys)).encode("utf-8")).hexdigest()
+
+
+# ---------------------------
+# Runner
+# ---------------------------
+
+class BatchRunner:
+    """Runs pipeline stages through the OpenAI Batch API (collect -> submit -> poll -> store -> apply)."""
+
+    def __init__(self, runner: PipelineRunner, client: Any = None, batch_dir: str = "batches",
+                 poll_interval: float = 60.0, timeout: Optional[float] = None, completion_window: str = "24h",
+                 max_rounds: int = 2, fallback_interactive: bool = False):
+        if (os.getenv("LLM_CACHE_MODE") or "").lower() == "off":
+            raise ValueError("Batch mode hands results to the stages through the LLM cache; unset LLM_CACHE_MODE=off")
+        self.runner = runner
+        self._client = client
+        self.batch_dir = batch_dir
+        self.poll_interval = poll_interval
+        self.timeout = timeout
+        self.completion_window = completion_window
+        self.max_rounds = max(1, max_rounds)
+        self.fallback_interactive = fallback_interactive
+        # The same cache the stages' cached_openai_client() uses (LLM_CACHE_PATH or the default), so the
+        # apply step finds the batch results
+        self.cache = get_shared_cache()
+        self.state_path = os.path.join(batch_dir, BATCH_STATE_FILE)
+        self.reports: List[Dict[str, Any]] = []
+
+    @property
+    def client(self):
+        if self._client is None:
+            from openai import OpenAI
+            self._client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+        return self._client
+
+    # ---------------------------
+    # Batch state (resume)
+    # ---------------------------
+
+    def load_state(self) -> Dict[str, Any]:
+        if not os.path.exists(self.state_path):
+            return {}
+        try:
+            with open(self.state_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except Exception as e:
+            logger.warning("Ignoring unreadable %s: %s", self.state_path, e)
+            return {}
+
+    def save_state(self, state: Dict[str, Any]) -> None:
+        os.makedirs(self.batch_dir, exist_ok=True)
+        tmp_path = f"{self.state_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(state, f, indent=2)
+        os.replace(tmp_path, self.state_path)
+
+    # ---------------------------
+    # Submit, poll, store
+    # ---------------------------
+
+    def submit(self, stage: str, requests: Dict[str, Dict[str, Any]]) -> List[str]:
+        """Submit requests as one or more batches (or re-attach to the unfinished batches of the same requests)."""
+        digest = requests_digest(set(requests))
+        state = self.load_state()
+        previous = state.get(stage) or {}
+        if previous.get("digest") == digest and previous.get("batch_ids"):
+            logger.info("[%s] re-attaching to %s", stage, ", ".join(previous["batch_ids"]))
+            return previous["batch_ids"]
+
+        batch_ids = []
+        prefix = f"{stage}_{time.strftime('%Y%m%dT%H%M%S')}"
+        for path in write_batch_files(requests, self.batch_dir, prefix):
+            with open(path, "rb") as f:
+                uploaded = self.client.files.create(file=f, purpose="batch")
+            batch = self.client.batches.create(input_file_id=uploaded.id, endpoint=BATCH_ENDPOINT,
+                                               completion_window=self.completion_window,
+                                               metadata={"stage": stage, "file": os.path.basename(path)})
+            logger.info("[%s] submitted %s as %s", stage, os.path.basename(path), batch.id)
+            batch_ids.append(batch.id)
+        state[stage] = {"digest": digest, "batch_ids": batch_ids, "submitted_at": time.time()}
+        self.save_state(state)
+        return batch_ids
+
+    def wait(self, stage: str, batch_ids: List[str]) -> Optional[List[Any]]:
+        """Poll until every batch reached a terminal status; None if the timeout expired first."""
+        started = time.time()
+        finished: Dict[str, Any] = {}
+        while True:
+            for batch_id in batch_ids:
+                if batch_id in finished:
+                    continue
+                batch = self.client.batches.retrieve(batch_id)
+                if batch.status in TERMINAL_STATUSES:
+                    finished[batch_id] = batch
+                    counts = batch.request_counts
+                    logger.info("[%s] %s %s (%s/%s completed, %s failed)", stage, batch_id, batch.status,
+                                counts.completed if counts else "?", counts.total if counts else "?",
+                                counts.failed if counts else "?")
+                    for error in ((batch.errors.data or []) if batch.errors else []):
+                        logger.warning("[%s] %s: %s", stage, batch_id, error.message)
+            if len(finished) == len(batch_ids):
+                return [finished[batch_id] for batch_id in batch_ids]
+            if self.timeout is not None and time.time() - started > self.timeout:
+                logger.warning("[%s] batches still running after %.0fs; re-run to pick them up", stage,
+                               time.time() - started)
+                return None
+            time.sleep(self.poll_interval)
+
+    def _file_lines(self, file_id: Optional[str]) -> Iterator[Dict[str, Any]]:
+        if not file_id:
+            return
+        for line in self.client.files.content(file_id).text.splitlines():
+            if line.strip():
+                yield json.loads(line)
+
+    def store_results(self, stage: str, batches: List[Any], requests: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+        """Put successful responses into the LLM cache; returns counts, failures and estimated cost."""
+        stored, failed = 0, {}
+        cost = 0.0
+        for batch in batches:
+            for record in list(self._file_lines(batch.output_file_id)) + list(self._file_lines(batch.error_file_id)):
+                key = record.get("custom_id")
+                response = record.get("response") or {}
+                body = response.get("body")
+                if key not in requests:
+                    continue
+                if record.get("error") or response.get("status_code") != 200 or not body:
+                    error = record.get("error") or (body or {}).get("error") or {}
+                    failed[key] = error.get("message") or f"status {response.get('status_code')}"
+                    continue
+                model = requests[key].get("model", "")
+                self.cache.put(key, model, body)
+                stored += 1
+                cost += estimate_cost(model, body.get("usage") or {})
+        for key in requests:
+            if self.cache.get(key) is None and key not in failed:
+                failed[key] = "no result in the batch output"
+        return {"stored": stored, "failed": failed, "cost_usd": cost}
+
+    # ---------------------------
+    # Stages
+    # ---------------------------
+
+    def run_stage(self, stage: str, document_ids: Optional[List[str]] = None) -> Dict[str, Any]:
+        entries = self.runner.pending(stage, document_ids)
+        report = {"stage": stage, "documents": [e["file_id"] for e in entries], "requests": 0, "stored": 0,
+                  "failed": 0, "batches": [], "cost_usd": 0.0}
+        self.reports.append(report)
+        if not entries:
+            logger.info("[%s] nothing to run", stage)
+            return report
+
+        failed: Dict[str, str] = {}
+        documents: Dict[str, Set[str]] = {}
+        for round_number in range(1, self.max_rounds + 1):
+            # Later rounds only find requests that depend on responses of the previous one
+            recorder = RecordingOpenAIClient(self.cache)
+            unusable = collect_requests(self.runner, stage, entries, recorder)
+            entries = [e for e in entries if e["file_id"] not in unusable]
+            documents = recorder.documents
+            requests = {key: request for key, request in recorder.requests.items() if key not in failed}
+            if not requests:
+                break
+            logger.info("[%s] round %d: %d requests for %d documents", stage, round_number, len(requests),
+                        len(entries))
+            batch_ids = self.submit(stage, requests)
+            report["batches"].extend(batch_ids)
+            batches = self.wait(stage, batch_ids)
+            if batches is None:
+                report["status"] = "pending"
+                return report
+            result = self.store_results(stage, batches, requests)
+            state = self.load_state()
+            state.pop(stage, None)
+            self.save_state(state)
+            report["requests"] += len(requests)
+            report["stored"] += result["stored"]
+            report["cost_usd"] += result["cost_usd"] * BATCH_DISCOUNT
+            failed.update(result["failed"])
+        report["failed"] = len(failed)
+
+        blocked = sorted(doc for doc, keys in documents.items() if keys & set(failed))
+        if blocked and not self.fallback_interactive:
+            logger.warning("[%s] %d failed requests; leaving %s for the next run", stage, len(failed),
+                           ", ".join(blocked))
+        apply_ids = [e["file_id"] for e in entries if self.fallback_interactive or e["file_id"] not in blocked]
+        report["applied"] = apply_ids
+        report["status"] = "done"
+        if apply_ids:
+            self.runner.run([stage], document_ids=apply_ids)
+        return report
+
+    def run(self, stages: List[str], document_ids: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        for stage in [s for s in BATCH_STAGES if s in stages]:
+            report = self.run_stage(stage, document_ids)
+            if report.get("status") == "pending":
+                # Later stages need this stage's outputs
+                break
+        return self.reports
+
+
+def print_batch_report(reports: List[Dict[str, Any]]) -> None:
+    print(f"\n{'stage':<16}{'documents':>10}{'requests':>10}{'stored':>8}{'failed':>8}{'est. $':>10}  status")
+    for r in reports:
+        print(f"{r['stage']:<16}{len(r['documents']):>10}{r['requests']:>10}{r['stored']:>8}{r['failed']:>8}"
+              f"{r['cost_usd']:>10.4f}  {r.get('status', '-')}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run LLM stages of the pipeline through the OpenAI Batch API")
+    parser.add_argument("--stages", nargs="+", choices=BATCH_STAGES, default=BATCH_STAGES,
+                        help="Stages to batch (default: entities relations interpretation, in that order)")
+    parser.add_argument("--documents", nargs="+", default=None, help="Restrict to these file_ids from input.json")
+    parser.add_argument("--input", default=INPUT_FILE, help="Path to input.json")
+    parser.add_argument("--force", action="store_true", help="Re-run selected stages regardless of fingerprints")
+    parser.add_argument("--batch-dir", default="batches", help="Directory for batch files and batch_state.json")
+    parser.add_argument("--poll-interval", type=float, default=60.0, help="Seconds between status checks")
+    parser.add_argument("--timeout", type=float, default=None,
+                        help="Stop polling after this many seconds (re-run later to pick the batches up)")
+    parser.add_argument("--completion-window", default="24h", help="Batch completion window (default: 24h)")
+    parser.add_argument("--fallback-interactive", action="store_true",
+                        help="Send requests that failed in the batch to the API interactively")
+    add_logging_arguments(parser)
+    args = parser.parse_args()
+    configure_logging_from_args(args)
+
+    runner = PipelineRunner(input_file=args.input, force=args.force)
+    batch_runner = BatchRunner(
+        runner,
+        batch_dir=args.batch_dir,
+        poll_interval=args.poll_interval,
+        timeout=args.timeout,
+        completion_window=args.completion_window,
+        fallback_interactive=args.fallback_interactive,
+    )
+    print_batch_report(batch_runner.run(args.stages, args.documents))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+# Scaling benchmark for the CIDOC generators
+# Times CidocEventGroupGenerator.generate_event_rdf_from_data and cidoc_generator_utils.generate_cidoc_trig
+# on synthetic interpretation layers of growing size (synthetic_graph.py) and reports, per size, wall time
+# (best of --repeat), CPU time and peak Python memory (tracemalloc, in a separate run), plus the scaling
+# exponent between consecutive sizes: about 1.0 is linear, 2.0 quadratic.
+#
+# With --baseline, results are compared with an earlier --output report and the run fails (exit 1) when a
+# target got slower than --tolerance or its scaling exponent grew past --max-exponent.
+#
+# Usage:
+#   python benchmark_cidoc.py                                   # 100/1k, 1k/10k, 10k/100k nodes/relations
+#   python benchmark_cidoc.py --sizes 1000:10000 5000:50000 --output cidoc_bench.json
+#   python benchmark_cidoc.py --baseline cidoc_bench.json
+
+import argparse
+import contextlib
+import gc
+import json
+import math
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from cidoc_generator_utils import generate_cidoc_trig
+from cidoc_group_generator import CidocEventGroupGenerator
+from synthetic_graph import synthetic_input_entry, synthetic_interpretation_layer
+
+DEFAULT_SIZES = ["100:1000", "1000:10000", "10000:100000"]
+
+
+def _event_rdf(payload: Dict[str, Any], workdir: str) -> int:
+    return len(CidocEventGroupGenerator().generate_event_rdf_from_data(payload))
+
+
+def _cidoc_trig(payload: Dict[str, Any], workdir: str) -> int:
+    facts, assertions = generate_cidoc_trig(workdir, payload, synthetic_input_entry(), "synthetic")
+    return len(facts) + len(assertions)
+
+
+TARGETS: Dict[str, Callable[[Dict[str, Any], str], int]] = {
+    "generate_event_rdf_from_data": _event_rdf,
+    "generate_cidoc_trig": _cidoc_trig,
+}
+
+
+def parse_size(text: str) -> Tuple[int, int]:
+    nodes, _, relations = text.partition(":")
+    return int(nodes), int(relations or int(nodes) * 10)
+
+
+@contextlib.contextmanager
+def _quiet():
+    # Debug messages are off by default (pipeline_logging); anything still printed is kept out of the timings
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        yield
+
+
+def measure(fn: Callable[[Dict[str, Any], str], int], payload: Dict[str, Any], workdir: str, repeat: int = 3,
+            memory: bool = True) -> Dict[str, Any]:
+    walls, cpus = [], []
+    output_chars = 0
+    for _ in range(max(1, repeat)):
+        gc.collect()
+        wall, cpu = time.perf_counter(), time.process_time()
+        with _quiet():
+            output_chars = fn(payload, workdir)
+        walls.append(time.perf_counter() - wall)
+        cpus.append(time.process_time() - cpu)
+    result = {
+        "wall_seconds": round(min(walls), 4),
+        "cpu_seconds": round(min(cpus), 4),
+        "output_chars": output_chars,
+    }
+    if memory:
+        gc.collect()
+        tracemalloc.start()
+        try:
+            with _quiet():
+                fn(payload, workdir)
+            result["peak_mb"] = round(tracemalloc.get_traced_memory()[1] / (1 << 20), 2)
+        finally:
+            tracemalloc.stop()
+    return result
+
+
+def run_benchmark(sizes: List[Tuple[int, int]], targets: List[str], repeat: int = 3, memory: bool = True,
+                  seed: int = 0) -> Dict[str, Any]:
+    results: Dict[str, List[Dict[str, Any]]] = {target: [] for target in targets}
+    with tempfile.TemporaryDirectory(prefix="cidoc_benchmark_") as workdir:
+        for n_nodes, n_relations in sizes:
+            started = time.perf_counter()
+            payload = synthetic_interpretation_layer(n_nodes, n_relations, seed=seed)
+            print(f"{n_nodes} nodes / {n_relations} relations (generated in {time.perf_counter() - started:.2f}s)")
+            for target in targets:
+                result = {"nodes": n_nodes, "relations": n_relations,
+                          **measure(TARGETS[target], payload, workdir, repeat=repeat, memory=memory)}
+                previous = results[target][-1] if results[target] else None
+                if previous and previous["wall_seconds"] > 0 and n_relations != previous["relations"]:
+                    result["scaling_exponent"] = round(
+                        math.log(result["wall_seconds"] / previous["wall_seconds"])
+                        / math.log(n_relations / previous["relations"]), 2)
+                results[target].append(result)
+                print(f"  {target:<30} {result['wall_seconds']:>8.3f}s wall {result['cpu_seconds']:>8.3f}s cpu"
+                      + (f" {result['peak_mb']:>8.1f} MB" if "peak_mb" in result else "")
+                      + (f"  exponent {result['scaling_exponent']}" if "scaling_exponent" in result else ""))
+    return {"seed": seed, "repeat": repeat, "python": sys.version.split()[0], "targets": results}
+
+
+def compare_with_baseline(report: Dict[str, Any], baseline: Dict[str, Any], tolerance: float = 0.25,
+                          max_exponent: Optional[float] = 1.3, min_seconds: float = 0.05) -> List[str]:
+    """Regressions of report against baseline (same target and size), as printable messages.
+
+    Slowdowns below min_seconds are timer noise on the small sizes and are not reported.
+    """
+    problems = []
+    for target, results in report["targets"].items():
+        earlier = {(r["nodes"], r["relations"]): r for r in baseline.get("targets", {}).get(target, [])}
+        for result in results:
+            size = (result["nodes"], result["relations"])
+            label = f"{target} at {size[0]}/{size[1]}"
+            before = earlier.get(size)
+            slowdown = result["wall_seconds"] - before["wall_seconds"] if before else 0.0
+            if before and slowdown > before["wall_seconds"] * tolerance and slowdown > min_seconds:
+                problems.append(f"{label}: {before['wall_seconds']:.3f}s -> {result['wall_seconds']:.3f}s")
+            exponent = result.get("scaling_exponent")
+            if max_exponent is not None and exponent is not None and exponent > max_exponent:
+                if not before or (before.get("scaling_exponent") or 0) <= max_exponent:
+                    problems.append(f"{label}: scaling exponent {exponent} exceeds {max_exponent}")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Scaling benchmark for the CIDOC event generators")
+    parser.add_argument("--sizes", nargs="+", default=DEFAULT_SIZES,
+                        help="Graph sizes as nodes:relations (default: 100:1000 1000:10000 10000:100000)")
+    parser.add_argument("--targets", nargs="+", choices=list(TARGETS), default=list(TARGETS),
+                        help="Functions to benchmark (default: both)")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per size; the fastest is reported")
+    parser.add_argument("--no-memory", action="store_true", help="Skip the tracemalloc run")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the synthetic graphs")
+    parser.add_argument("--output", default=None, help="Write the JSON report to this file")
+    parser.add_argument("--baseline", default=None, help="Earlier report to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed slowdown against the baseline (default: 0.25)")
+    parser.add_argument("--max-exponent", type=float, default=1.3, help="Largest acceptable scaling exponent (default: 1.3)")
+    args = parser.parse_args()
+
+    report = run_benchmark([parse_size(s) for s in args.sizes], args.targets, repeat=args.repeat,
+                           memory=not args.no_memory, seed=args.seed)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Report saved to {args.output}")
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        problems = compare_with_baseline(report, baseline, tolerance=args.tolerance, max_exponent=args.max_exponent)
+        if problems:
+            print("\nRegressions against the baseline:")
+            for problem in problems:
+                print(f"  {problem}")
+            sys.exit(1)
+        print("\nNo regressions against the baseline.")
+
+
+if __name__ == "__main__":
+    main()
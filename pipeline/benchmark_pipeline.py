@@ -0,0 +1,313 @@
+# Offline end-to-end benchmark of the pipeline
+# Runs run_pipeline's stages (index -> qa -> entities -> relations -> interpretation -> nanopub, optionally
+# preceded by OCR) on the pipeline/data documents and on synthetic scaled-up copies of them, against the
+# local stand-in services of fake_services.py. Everything is written to a temporary workspace, so the real
+# documents/, data/ and caches are never touched and no API key is needed.
+#
+# Per stage it reports wall time, CPU time, peak RSS and the calls made to each service, so regressions in
+# our own orchestration show up independently of provider latency (set with --latency / --latency-per-1k).
+# With --batch, the entities, relations and interpretation stages go through batch_runner.py and the local
+# Batch API stub (fake_services.FakeBatchOpenAI) instead of interactive calls.
+#
+# Usage:
+#   python benchmark_pipeline.py                              # the five documents, no simulated latency
+#   python benchmark_pipeline.py --copies 4 --scale 2 --latency 0.2 --output bench.json
+#   python benchmark_pipeline.py --recordings llm_cache.sqlite   # replay recorded OpenAI responses
+#   python benchmark_pipeline.py --batch --batch-fail-every 7    # Batch API mode, with failing requests
+
+import argparse
+import json
+import os
+import resource
+import shutil
+import tempfile
+import time
+from typing import Any, Dict, List, Optional
+
+# No tokenizer downloads; huggingface_hub reads this at import time (pulled in by voyageai)
+os.environ.setdefault("HF_HUB_OFFLINE", "1")
+
+from api_clients import APIClientLayer, set_shared_api_layer
+from fake_services import (CallCounter, FakeAsyncOpenAI, FakeAsyncVoyage, FakeBatchOpenAI, FakeOCRBackend,
+                           ServiceLatency, split_pages, write_stub_pdf)
+
+BASE_DIR = os.path.abspath(os.path.dirname(__file__))
+INPUT_FILE = os.path.join(BASE_DIR, "input.json")
+DATA_DIR = os.path.join(BASE_DIR, "data")
+
+
+# ---------------------------
+# Resource measurement
+# ---------------------------
+
+def reset_peak_rss() -> bool:
+    """Reset the kernel's peak-RSS counter (Linux); False if unsupported, then peaks are process-wide."""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def peak_rss_mb() -> float:
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024.0
+    except OSError:
+        pass
+    # ru_maxrss is in KiB on Linux (bytes on macOS), and never resets
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+
+def _diff_counts(after: Dict[str, int], before: Dict[str, int]) -> Dict[str, int]:
+    return {name: after[name] - before.get(name, 0) for name in sorted(after) if after[name] != before.get(name, 0)}
+
+
+def _model_calls(layer: APIClientLayer) -> Dict[str, int]:
+    return {model: m["calls"] for model, m in layer.metrics_summary().items()}
+
+
+# ---------------------------
+# Workspace
+# ---------------------------
+
+def scaled_text(text: str, scale: float) -> str:
+    """The text repeated to about scale times its length (whole paragraphs)."""
+    if scale <= 1:
+        return text
+    paragraphs = text.split("\n\n")
+    target = int(len(text) * scale)
+    parts: List[str] = [text]
+    size = len(text)
+    i = 0
+    while size < target:
+        parts.append(paragraphs[i % len(paragraphs)])
+        size += len(parts[-1]) + 2
+        i += 1
+    return "\n\n".join(parts)
+
+
+def build_workspace(root: str, copies: int = 1, scale: float = 1.0, input_file: str = INPUT_FILE,
+                    data_dir: str = DATA_DIR, document_ids: Optional[List[str]] = None) -> Dict[str, Any]:
+    """Write data/, documents/ and input.json under root; copy n > 0 of a document gets the suffix _x<n>."""
+    with open(input_file, "r", encoding="utf-8") as f:
+        input_data = json.load(f)
+    base_entries = input_data.get("files") if isinstance(input_data.get("files"), list) else [input_data]
+    workspace = {
+        "root": root,
+        "data_dir": os.path.join(root, "data"),
+        "documents_dir": os.path.join(root, "documents"),
+        "input_file": os.path.join(root, "input.json"),
+        "markdown": {},
+    }
+    os.makedirs(workspace["data_dir"])
+    os.makedirs(workspace["documents_dir"])
+
+    entries = []
+    for entry in base_entries:
+        meta = entry.get("document_metadata") or {}
+        declared = entry.get("file_path") or meta.get("file_path")
+        if not entry.get("file_id") or not declared or (document_ids and entry["file_id"] not in document_ids):
+            continue
+        source = os.path.join(data_dir, os.path.basename(declared))
+        if not os.path.exists(source):
+            print(f"Warning: {source} missing, skipping {entry['file_id']}")
+            continue
+        with open(source, "r", encoding="utf-8") as f:
+            text = scaled_text(f.read(), scale)
+        name = os.path.splitext(os.path.basename(declared))[0]
+        for n in range(copies):
+            suffix = f"_x{n}" if n else ""
+            copy = json.loads(json.dumps(entry))
+            copy["file_id"] = entry["file_id"] + suffix
+            copy.pop("file_path", None)
+            copy.setdefault("document_metadata", {})["file_path"] = f"data/{name}{suffix}.md"
+            # Distinct text per copy, so copies are not served from each other's embedding cache entries
+            workspace["markdown"][name + suffix] = f"<!-- copy {n} -->\n\n{text}" if n else text
+            entries.append(copy)
+
+    for name, text in workspace["markdown"].items():
+        with open(os.path.join(workspace["data_dir"], f"{name}.md"), "w", encoding="utf-8") as f:
+            f.write(text)
+    with open(workspace["input_file"], "w", encoding="utf-8") as f:
+        json.dump({"files": entries}, f, ensure_ascii=False, indent=2)
+    workspace["entries"] = entries
+    return workspace
+
+
+# ---------------------------
+# Benchmark
+# ---------------------------
+
+class PipelineBenchmark:
+    """Runs the pipeline stages in a workspace against fake services and records per-stage measurements."""
+
+    def __init__(self, workspace: Dict[str, Any], latency: Optional[ServiceLatency] = None,
+                 recordings: Optional[str] = None, max_workers: int = 4, items_per_array: int = 3,
+                 batch_fail_every: int = 0):
+        self.workspace = workspace
+        self.max_workers = max_workers
+        self.counter = CallCounter()
+        latency = latency or ServiceLatency()
+        self.latency = latency
+        fake_openai = FakeAsyncOpenAI(latency=latency, recordings=recordings, counter=self.counter,
+                                      items_per_array=items_per_array)
+        fake_voyage = FakeAsyncVoyage(latency=latency, counter=self.counter)
+        self.batch_client = FakeBatchOpenAI(chat=fake_openai, fail_every=batch_fail_every, counter=self.counter)
+        self.layer = APIClientLayer(openai_factory=lambda api_key: fake_openai,
+                                    voyage_factory=lambda api_key: fake_voyage)
+        self.results: List[Dict[str, Any]] = []
+
+    def measure(self, stage: str, fn) -> Dict[str, Any]:
+        calls_before = self.counter.snapshot()
+        models_before = _model_calls(self.layer)
+        resettable = reset_peak_rss()
+        wall_start, cpu_start = time.perf_counter(), time.process_time()
+        fn()
+        result = {
+            "stage": stage,
+            "wall_seconds": round(time.perf_counter() - wall_start, 3),
+            "cpu_seconds": round(time.process_time() - cpu_start, 3),
+            "peak_rss_mb": round(peak_rss_mb(), 1),
+            "peak_rss_scope": "stage" if resettable else "process",
+            "calls": _diff_counts(self.counter.snapshot(), calls_before),
+            "calls_by_model": _diff_counts(_model_calls(self.layer), models_before),
+        }
+        self.results.append(result)
+        return result
+
+    def run_ocr(self, page_chars: int = 3000) -> None:
+        """OCR stub PDFs of the workspace markdown back into data/ (the markdown is regenerated page by page)."""
+        from ocr_batch import run_batch
+
+        pdf_dir = os.path.join(self.workspace["root"], "pdfs")
+        os.makedirs(pdf_dir, exist_ok=True)
+        pages = {name: split_pages(text, page_chars) for name, text in self.workspace["markdown"].items()}
+        for name, doc_pages in pages.items():
+            write_stub_pdf(os.path.join(pdf_dir, f"{name}.pdf"), len(doc_pages))
+            os.remove(os.path.join(self.workspace["data_dir"], f"{name}.md"))
+        backend = FakeOCRBackend(pages, latency=self.latency, counter=self.counter)
+        checkpoint_dir = os.path.join(self.workspace["root"], "ocr_checkpoints")
+        self.measure("ocr", lambda: run_batch(
+            self.workspace["entries"], backend, max_workers=self.max_workers,
+            data_dir=self.workspace["data_dir"], checkpoint_dir=checkpoint_dir, pdf_dir=pdf_dir,
+            manifest_path=os.path.join(checkpoint_dir, "manifest.json")))
+
+    def run(self, stages: List[str], ocr: bool = False, batch: bool = False) -> List[Dict[str, Any]]:
+        from batch_runner import BATCH_STAGES, BatchRunner
+        from run_pipeline import STAGES, PipelineRunner
+
+        set_shared_api_layer(self.layer)
+        try:
+            if ocr:
+                self.run_ocr()
+            runner = PipelineRunner(
+                input_file=self.workspace["input_file"],
+                documents_dir=self.workspace["documents_dir"],
+                data_dir=self.workspace["data_dir"],
+                max_workers=self.max_workers,
+                rag_options={"embeddings_cache_dir": os.path.join(self.workspace["root"], "embeddings_cache")},
+            )
+            batch_runner = BatchRunner(runner, client=self.batch_client, poll_interval=0.0,
+                                       batch_dir=os.path.join(self.workspace["root"], "batches")) if batch else None
+            for stage in [s for s in STAGES if s in stages]:
+                if batch_runner and stage in BATCH_STAGES:
+                    self.measure(stage, lambda: batch_runner.run_stage(stage))
+                    self.results[-1]["batch"] = {key: batch_runner.reports[-1][key]
+                                                 for key in ("requests", "stored", "failed", "cost_usd")}
+                else:
+                    self.measure(stage, lambda: runner.run([stage]))
+                missing = [e["file_id"] for e in runner.entries if not runner.outputs_exist(stage, e)]
+                if missing:
+                    self.results[-1]["missing_outputs"] = missing
+        finally:
+            set_shared_api_layer(None)
+        return self.results
+
+    def report(self) -> Dict[str, Any]:
+        return {
+            "documents": len(self.workspace["entries"]),
+            "characters": sum(len(text) for text in self.workspace["markdown"].values()),
+            "latency": {"base": self.latency.base, "per_1k_tokens": self.latency.per_1k_tokens},
+            "stages": self.results,
+            "api": self.layer.metrics_summary(),
+        }
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    print(f"\nBenchmark: {report['documents']} documents, {report['characters']:,} characters, "
+          f"latency {report['latency']['base']}s + {report['latency']['per_1k_tokens']}s/1k tokens")
+    print(f"{'stage':<15}{'wall s':>9}{'cpu s':>9}{'peak MB':>10}  calls")
+    for r in report["stages"]:
+        calls = ", ".join(f"{name}={n}" for name, n in r["calls"].items()) or "-"
+        print(f"{r['stage']:<15}{r['wall_seconds']:>9.2f}{r['cpu_seconds']:>9.2f}{r['peak_rss_mb']:>10.1f}  {calls}")
+        if r.get("missing_outputs"):
+            print(f"{'':<15}missing outputs: {', '.join(r['missing_outputs'])}")
+    total_wall = sum(r["wall_seconds"] for r in report["stages"])
+    total_cpu = sum(r["cpu_seconds"] for r in report["stages"])
+    print(f"{'total':<15}{total_wall:>9.2f}{total_cpu:>9.2f}")
+
+
+def main():
+    from run_pipeline import STAGES
+
+    parser = argparse.ArgumentParser(description="Benchmark the pipeline offline against local stand-in services")
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=STAGES, help="Stages to run (default: all)")
+    parser.add_argument("--documents", nargs="+", default=None, help="Restrict to these file_ids from input.json")
+    parser.add_argument("--input", default=INPUT_FILE, help="input.json to take documents and questions from")
+    parser.add_argument("--copies", type=int, default=1, help="Copies of each document (synthetic corpus size)")
+    parser.add_argument("--scale", type=float, default=1.0, help="Scale each document's text length by this factor")
+    parser.add_argument("--ocr", action="store_true", help="Also benchmark OCR of stub PDFs of the documents")
+    parser.add_argument("--latency", type=float, default=0.0, help="Simulated seconds per API call")
+    parser.add_argument("--latency-per-1k", type=float, default=0.0, help="Simulated seconds per 1000 tokens")
+    parser.add_argument("--recordings", default=None,
+                        help="LLM cache sqlite file whose recorded OpenAI responses are replayed when they match")
+    parser.add_argument("--items", type=int, default=3, help="Items per array in synthesised JSON responses")
+    parser.add_argument("--max-workers", type=int, default=4, help="Concurrent documents for RAG stages")
+    parser.add_argument("--output", default=None, help="Write the JSON report to this file")
+    parser.add_argument("--keep", action="store_true", help="Keep the temporary workspace")
+    parser.add_argument("--batch", action="store_true",
+                        help="Run entities, relations and interpretation through the Batch API stub")
+    parser.add_argument("--batch-fail-every", type=int, default=0,
+                        help="With --batch, fail every n-th batch request (0: none)")
+    args = parser.parse_args()
+
+    output = os.path.abspath(args.output) if args.output else None
+    recordings = os.path.abspath(args.recordings) if args.recordings else None
+    root = tempfile.mkdtemp(prefix="pipeline_benchmark_")
+    if args.batch:
+        # Batch results reach the stages through the response cache; use a fresh one in the workspace
+        os.environ["LLM_CACHE_MODE"] = "readwrite"
+        os.environ["LLM_CACHE_PATH"] = os.path.join(root, "llm_cache.sqlite")
+    else:
+        # Every request goes to the stand-ins, not to the response cache
+        os.environ["LLM_CACHE_MODE"] = "off"
+    cwd = os.getcwd()
+    # Stages write debug files relative to the working directory
+    os.chdir(root)
+    try:
+        workspace = build_workspace(root, copies=max(1, args.copies), scale=args.scale, input_file=args.input,
+                                    document_ids=args.documents)
+        benchmark = PipelineBenchmark(workspace, latency=ServiceLatency(args.latency, args.latency_per_1k),
+                                      recordings=recordings, max_workers=args.max_workers,
+                                      items_per_array=args.items, batch_fail_every=args.batch_fail_every)
+        benchmark.run(args.stages, ocr=args.ocr, batch=args.batch)
+        report = benchmark.report()
+        print_report(report)
+        if output:
+            with open(output, "w", encoding="utf-8") as f:
+                json.dump(report, f, indent=2)
+            print(f"Report saved to {output}")
+    finally:
+        os.chdir(cwd)
+        if args.keep:
+            print(f"Workspace kept at {root}")
+        else:
+            shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
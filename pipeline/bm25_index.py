@@ -0,0 +1,120 @@
+# BM25 lexical index over document chunks
+# Complements the dense FAISS index for rare proper names ("Willem van Boudelo", "Reynardus Vulpes")
+# that embeddings blur. Stored next to document_index.faiss as document_bm25.npz.
+
+import re
+import unicodedata
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+
+BM25_FILE = "document_bm25.npz"
+
+_TOKEN = re.compile(r"\w+", re.UNICODE)
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase, accent-folded word tokens ("Cisterciënzers" -> "cistercienzers")."""
+    folded = unicodedata.normalize("NFKD", (text or "").casefold())
+    folded = "".join(c for c in folded if not unicodedata.combining(c))
+    return _TOKEN.findall(folded)
+
+
+class BM25Index:
+    """Okapi BM25 over a fixed list of texts, with postings stored as flat numpy arrays."""
+
+    def __init__(self, terms: Sequence[str], offsets: np.ndarray, doc_ids: np.ndarray, tfs: np.ndarray,
+                 doc_lengths: np.ndarray, k1: float = 1.5, b: float = 0.75):
+        self.terms = {term: i for i, term in enumerate(terms)}
+        self.offsets = offsets
+        self.doc_ids = doc_ids
+        self.tfs = tfs
+        self.doc_lengths = doc_lengths.astype('float32')
+        self.k1 = k1
+        self.b = b
+        n_docs = len(doc_lengths)
+        self.avgdl = float(self.doc_lengths.mean()) if n_docs else 0.0
+        df = np.diff(offsets).astype('float32')
+        self.idf = np.log(1.0 + (n_docs - df + 0.5) / (df + 0.5))
+
+    @classmethod
+    def build(cls, texts: Sequence[str], k1: float = 1.5, b: float = 0.75) -> "BM25Index":
+        postings: Dict[str, List[Tuple[int, int]]] = {}
+        doc_lengths = np.zeros(len(texts), dtype='int32')
+        for doc_id, text in enumerate(texts):
+            tokens = tokenize(text)
+            doc_lengths[doc_id] = len(tokens)
+            counts: Dict[str, int] = {}
+            for token in tokens:
+                counts[token] = counts.get(token, 0) + 1
+            for token, tf in counts.items():
+                postings.setdefault(token, []).append((doc_id, tf))
+
+        terms = sorted(postings)
+        offsets = np.zeros(len(terms) + 1, dtype='int64')
+        for i, term in enumerate(terms):
+            offsets[i + 1] = offsets[i] + len(postings[term])
+        doc_ids = np.empty(offsets[-1], dtype='int32')
+        tfs = np.empty(offsets[-1], dtype='int32')
+        for i, term in enumerate(terms):
+            entries = postings[term]
+            doc_ids[offsets[i]:offsets[i + 1]] = [d for d, _ in entries]
+            tfs[offsets[i]:offsets[i + 1]] = [tf for _, tf in entries]
+        return cls(terms, offsets, doc_ids, tfs, doc_lengths, k1=k1, b=b)
+
+    def __len__(self) -> int:
+        return len(self.doc_lengths)
+
+    def save(self, path: str) -> None:
+        terms = sorted(self.terms, key=self.terms.get)
+        with open(path, 'wb') as f:
+            np.savez(
+                f,
+                terms=np.array(terms, dtype=str),
+                offsets=self.offsets,
+                doc_ids=self.doc_ids,
+                tfs=self.tfs,
+                doc_lengths=self.doc_lengths.astype('int32'),
+                params=np.array([self.k1, self.b], dtype='float32'),
+            )
+
+    @classmethod
+    def load(cls, path: str) -> "BM25Index":
+        with np.load(path, allow_pickle=False) as data:
+            k1, b = (float(x) for x in data['params'])
+            return cls(data['terms'].tolist(), data['offsets'], data['doc_ids'], data['tfs'],
+                       data['doc_lengths'], k1=k1, b=b)
+
+    def scores(self, query: str) -> np.ndarray:
+        """BM25 score of every document for the query."""
+        scores = np.zeros(len(self.doc_lengths), dtype='float32')
+        norm = self.k1 * (1.0 - self.b + self.b * self.doc_lengths / (self.avgdl or 1.0))
+        for token in set(tokenize(query)):
+            t = self.terms.get(token)
+            if t is None:
+                continue
+            start, end = self.offsets[t], self.offsets[t + 1]
+            ids = self.doc_ids[start:end]
+            tf = self.tfs[start:end].astype('float32')
+            scores[ids] += self.idf[t] * tf * (self.k1 + 1.0) / (tf + norm[ids])
+        return scores
+
+    def search(self, query: str, k: int) -> Tuple[List[int], List[float]]:
+        """Top-k document ids with a positive score, best first."""
+        scores = self.scores(query)
+        k = min(k, len(scores))
+        if k <= 0:
+            return [], []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind='stable')]
+        top = [int(i) for i in top if scores[i] > 0]
+        return top, [float(scores[i]) for i in top]
+
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[int]], k: int = 60) -> List[Tuple[int, float]]:
+    """Fuse ranked id lists: score(d) = sum over lists of 1 / (k + rank). Returns (id, score) best first."""
+    fused: Dict[int, float] = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, start=1):
+            fused[doc_id] = fused.get(doc_id, 0.0) + 1.0 / (k + rank)
+    return sorted(fused.items(), key=lambda item: -item[1])
@@ -0,0 +1,107 @@
+# Offset-indexed on-disk chunk store
+# Chunks are stored as UTF-8 JSON records back to back in document_chunks.bin, with an int64
+# offsets array in document_chunks.offsets.npy. Both are memory-mapped, so only the chunks
+# that are actually retrieved get decoded; nothing else stays resident.
+
+import json
+import mmap
+import os
+from collections.abc import Sequence
+from typing import Dict, Iterable, List
+
+import numpy as np
+
+CHUNKS_FILE = "document_chunks.bin"
+OFFSETS_FILE = "document_chunks.offsets.npy"
+
+
+def has_chunk_store(directory: str) -> bool:
+    return (os.path.exists(os.path.join(directory, CHUNKS_FILE))
+            and os.path.exists(os.path.join(directory, OFFSETS_FILE)))
+
+
+def write_chunk_store(chunks: Iterable[Dict], directory: str) -> int:
+    """Write chunks to directory; returns the number of chunks written."""
+    os.makedirs(directory, exist_ok=True)
+    data_path = os.path.join(directory, CHUNKS_FILE)
+    offsets_path = os.path.join(directory, OFFSETS_FILE)
+    offsets = [0]
+    tmp_data = f"{data_path}.{os.getpid()}.tmp"
+    with open(tmp_data, 'wb') as f:
+        for chunk in chunks:
+            record = json.dumps(chunk, ensure_ascii=False).encode('utf-8')
+            f.write(record)
+            offsets.append(offsets[-1] + len(record))
+    tmp_offsets = f"{offsets_path}.{os.getpid()}.tmp"
+    with open(tmp_offsets, 'wb') as f:
+        np.save(f, np.array(offsets, dtype='int64'))
+    os.replace(tmp_data, data_path)
+    os.replace(tmp_offsets, offsets_path)
+    return len(offsets) - 1
+
+
+class ChunkStore(Sequence):
+    """Read-only list-like view of a chunk store; store[i] decodes chunk i on access."""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        # The offsets array is read from a mapping of its .npy file held here, so close() can release it
+        self._offsets_file = open(os.path.join(directory, OFFSETS_FILE), 'rb')
+        version = np.lib.format.read_magic(self._offsets_file)
+        read_header = np.lib.format.read_array_header_1_0 if version == (1, 0) else np.lib.format.read_array_header_2_0
+        shape, _, dtype = read_header(self._offsets_file)
+        self._offsets_map = mmap.mmap(self._offsets_file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._offsets = np.frombuffer(self._offsets_map, dtype=dtype, count=shape[0], offset=self._offsets_file.tell())
+        self._file = open(os.path.join(directory, CHUNKS_FILE), 'rb')
+        size = os.fstat(self._file.fileno()).st_size
+        # mmap cannot map empty files
+        self._data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        n = len(self)
+        if i < 0:
+            i += n
+        if not 0 <= i < n:
+            raise IndexError("chunk index out of range")
+        start, end = int(self._offsets[i]), int(self._offsets[i + 1])
+        return json.loads(self._data[start:end].decode('utf-8'))
+
+    def texts(self, ids: Iterable[int]) -> List[str]:
+        return [self[i]['text'] for i in ids]
+
+    def close(self) -> None:
+        """Unmap the chunk data and offsets and close the data file; the store is unusable afterwards."""
+        if isinstance(self._data, mmap.mmap):
+            self._data.close()
+        self._data = b""
+        # Drop the array viewing the mapping before closing it
+        self._offsets = np.zeros(1, dtype='int64')
+        self._offsets_map.close()
+        self._offsets_file.close()
+        self._file.close()
+
+    def __enter__(self) -> "ChunkStore":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+if __name__ == "__main__":
+    # Convert existing documents/<file_id>/document_metadata.json files into chunk stores
+    base_dir = os.path.abspath(os.path.dirname(__file__))
+    documents_dir = os.path.join(base_dir, "documents")
+    for file_id in sorted(os.listdir(documents_dir)):
+        ddir = os.path.join(documents_dir, file_id)
+        metadata_path = os.path.join(ddir, "document_metadata.json")
+        if not os.path.exists(metadata_path):
+            continue
+        with open(metadata_path, 'r', encoding='utf-8') as f:
+            chunks = json.load(f).get('chunks', [])
+        written = write_chunk_store(chunks, ddir)
+        print(f"{file_id}: {written} chunks")
@@ -1,42 +1,29 @@
 # RDFlib-backed CIDOC event generator wrapper
-# Bridges existing CidocEventGroupGenerator (string/Turtle) into rdflib named graphs.
-# Step 1 of refactor: keep grouping/pattern logic, but assemble graphs with rdflib.
+# Bridges existing CidocEventGroupGenerator into rdflib named graphs.
+# Grouping/pattern logic stays in the generator; its triple model is added to the graph directly (no Turtle round-trip).
 
 from typing import Any, Dict
 
-from rdflib import ConjunctiveGraph, Namespace
-from rdflib.namespace import RDFS
+from rdflib import ConjunctiveGraph
 
-from cidoc_group_generator import CidocEventGroupGenerator
-
-EX = Namespace("http://example.org/")
-CRM = Namespace("http://www.cidoc-crm.org/cidoc-crm/")
-
-HEADER = "\n".join([
-    "@prefix ex: <http://example.org/> .",
-    "@prefix crm: <http://www.cidoc-crm.org/cidoc-crm/> .",
-    "@prefix rdfs: <http://www.w3.org/2000/01/rdf-schema#> .",
-    "",
-])
+from cidoc_group_generator import CidocEventGroupGenerator, TurtleGraphModel
+from cidoc_patterns import EX
 
 
 class CidocEventGeneratorRDFlib:
     def __init__(self) -> None:
         self._bridge = CidocEventGroupGenerator()
 
-    def _generate_events_turtle(self, nodes, relations, emit_entities: bool = False) -> str:
+    def _generate_events_model(self, nodes, relations, emit_entities: bool = False) -> TurtleGraphModel:
         ws = {"work_schema_metadata": {"interpretation_layer": {"nodes": nodes, "relations": relations}}}
-        # Use the bridge to generate just the event relations in Turtle form
-        turtle = self._bridge.generate_event_rdf_from_data(ws, include_prefixes=False, emit_entities=emit_entities)
-        return turtle.strip()
+        # Use the bridge to generate just the event relations as triples
+        return self._bridge.build_event_model_from_data(ws, include_prefixes=False, emit_entities=emit_entities)
 
     def emit_to_named_graph(self, cg: ConjunctiveGraph, graph_name: str, nodes, relations) -> None:
         """Build events for given nodes/relations into the cg named graph."""
         g = cg.get_context(EX[graph_name]) if not graph_name.startswith("http") else cg.get_context(graph_name)
-        # Generate events in Turtle and parse into the graph
-        turtle = self._generate_events_turtle(nodes, relations, emit_entities=False)
-        if turtle:
-            g.parse(data=HEADER + turtle, format="turtle")
+        # Add event triples straight into the graph
+        self._generate_events_model(nodes, relations, emit_entities=False).add_to_graph(g)
 
     def emit_facts_events(self, cg: ConjunctiveGraph, doc_id: str, payload: Dict[str, Any]) -> None:
         interp = (payload.get("work_schema_metadata", {}) or {}).get("interpretation_layer", {})
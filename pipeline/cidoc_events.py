@@ -1,11 +1,11 @@
 # Quiet wrapper API around CidocEventGroupGenerator
 # Provides a clean class interface with no stdout noise or file I/O.
+# The wrapped generator gets a silent logger, so its progress and DEBUG messages are never even formatted.
 
 from typing import Any, Dict, List
-import io
-import contextlib
 
 from cidoc_group_generator import CidocEventGroupGenerator
+from pipeline_logging import silent_logger
 
 
 class CidocEventGenerator:
@@ -16,15 +16,13 @@ class CidocEventGenerator:
     """
 
     def __init__(self) -> None:
-        self._gen = CidocEventGroupGenerator()
+        self._gen = CidocEventGroupGenerator(log=silent_logger("cidoc_events"))
 
     def events_from_payload(self, payload: Dict[str, Any], include_prefixes: bool = False, emit_entities: bool = False) -> str:
         """Generate CIDOC events from a full work-schema payload.
         payload must contain work_schema_metadata.interpretation_layer.nodes/relations
         """
-        f = io.StringIO()
-        with contextlib.redirect_stdout(f):
-            turtle = self._gen.generate_event_rdf_from_data(payload, include_prefixes=include_prefixes, emit_entities=emit_entities)
+        turtle = self._gen.generate_event_rdf_from_data(payload, include_prefixes=include_prefixes, emit_entities=emit_entities)
         return (turtle or "").strip()
 
     def events_for_claim_type(self, payload: Dict[str, Any], claim_type: str, include_prefixes: bool = False, emit_entities: bool = False) -> str:
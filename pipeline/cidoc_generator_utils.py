@@ -10,6 +10,9 @@ from cidoc_event_generator_rdflib import CidocEventGeneratorRDFlib
 from rdflib import ConjunctiveGraph, Namespace, Literal
 from rdflib.namespace import RDF, RDFS
 
+from trig_writer import render_graph_block
+from tracing import traced
+
 EX = Namespace("http://example.org/")
 DCTERMS = Namespace("http://purl.org/dc/terms/")
 FOAF = Namespace("http://xmlns.com/foaf/0.1/")
@@ -94,18 +97,9 @@ def build_biblio_facts(facts_g, doc_id: str, input_entry: Dict[str, Any]) -> Non
             facts_g.add((book_node, DCTERMS.title, Literal(btitle)))
 
 
-def _extract_named_graph_block(trig_text: str, graph_iri: str) -> str:
-    anchor = f"{graph_iri} {{"
-    start = trig_text.find(anchor)
-    if start == -1:
-        return ""
-    close = trig_text.find("\n}\n", start)
-    if close == -1:
-        close = len(trig_text)
-    return trig_text[start:close+3].strip()
-
-
-def generate_cidoc_trig(doc_dir: str, relations_payload: Dict[str, Any], input_entry: Dict[str, Any], file_id: str) -> str:
+@traced
+def build_cidoc_graph(relations_payload: Dict[str, Any], input_entry: Dict[str, Any], file_id: str) -> ConjunctiveGraph:
+    """Build the CIDOC facts and assertion named graphs (ex:facts_<doc_id>, ex:assertion_<doc_id>)."""
     doc_id = _slug(file_id)
     interp = (relations_payload.get("work_schema_metadata", {}) or {}).get("interpretation_layer", {})
     nodes = interp.get("nodes", [])
@@ -120,13 +114,12 @@ def generate_cidoc_trig(doc_dir: str, relations_payload: Dict[str, Any], input_e
 
     # Entity block (facts layer) across all relations
     gen_entities = CidocEventGroupGenerator()
-    entity_block = gen_entities.generate_grouped_rdf_content(
+    entity_model = gen_entities.build_grouped_model(
         {e["id"]: e for e in nodes},
         gen_entities.group_relations_by_event(combined_ws["work_schema_metadata"]["interpretation_layer"]["relations"]),
         include_prefixes=False,
         emit_entities=True,
     )
-    entity_block_str = "\n".join(entity_block).strip()
 
     # Facts: event triples will be emitted directly into rdflib below
 
@@ -134,7 +127,7 @@ def generate_cidoc_trig(doc_dir: str, relations_payload: Dict[str, Any], input_e
 
     # Build via rdflib into named graphs and return serialized blocks
     cg = ConjunctiveGraph()
-    # Bind prefixes for parsing Turtle into the named graphs
+    # Bind prefixes for serialising the named graphs
     cg.bind("ex", EX)
     cg.bind("crm", Namespace("http://www.cidoc-crm.org/cidoc-crm/"))
     cg.bind("rdfs", RDFS)
@@ -153,29 +146,27 @@ def generate_cidoc_trig(doc_dir: str, relations_payload: Dict[str, Any], input_e
     # Add bibliographic facts via rdflib directly
     build_biblio_facts(facts_g, doc_id, input_entry)
 
-    # Prepare a Turtle header for parsing entity block only
-    header = "\n".join([
-        "@prefix ex: <http://example.org/> .",
-        "@prefix crm: <http://www.cidoc-crm.org/cidoc-crm/> .",
-        "@prefix rdfs: <http://www.w3.org/2000/01/rdf-schema#> .",
-        "@prefix dcterms: <http://purl.org/dc/terms/> .",
-        "@prefix foaf: <http://xmlns.com/foaf/0.1/> .",
-        "@prefix fabio: <http://purl.org/spar/fabio/> .",
-        "@prefix frbr: <http://purl.org/vocab/frbr/core#> .",
-        "@prefix prism: <http://prismstandard.org/namespaces/basic/2.0/> .",
-        "",
-    ])
-    if entity_block_str:
-        facts_g.parse(data=header + entity_block_str, format="turtle")
+    # Add the entity block directly as triples
+    entity_model.add_to_graph(facts_g)
     # Emit event triples directly via rdflib wrapper
     eg = CidocEventGeneratorRDFlib()
     eg.emit_facts_events(cg, doc_id, relations_payload)
     eg.emit_assertion_events(cg, doc_id, relations_payload)
+    return cg
+
 
-    trig_text = cg.serialize(format="trig")
-    facts_block = _extract_named_graph_block(trig_text, f"ex:facts_{doc_id}")
-    assertion_block = _extract_named_graph_block(trig_text, f"ex:assertion_{doc_id}")
-    return facts_block[len(f"ex:facts_{doc_id} {{\n"): -2] if facts_block else "", assertion_block[len(f"ex:assertion_{doc_id} {{\n"): -2] if assertion_block else ""
+def _graph_body(cg: ConjunctiveGraph, graph_iri) -> str:
+    block = render_graph_block(cg, graph_iri)
+    # Drop the "<iri> {" and "}" lines
+    return "\n".join(block.split("\n")[1:-1])
+
+
+@traced
+def generate_cidoc_trig(doc_dir: str, relations_payload: Dict[str, Any], input_entry: Dict[str, Any], file_id: str) -> str:
+    """Facts and assertion graph contents as TriG text (digital_hermeneutics_generator streams the graphs instead)."""
+    doc_id = _slug(file_id)
+    cg = build_cidoc_graph(relations_payload, input_entry, file_id)
+    return _graph_body(cg, EX[f"facts_{doc_id}"]), _graph_body(cg, EX[f"assertion_{doc_id}"])
 
 
 def write_cidoc_trig_file(doc_dir: str, doc_id: str, facts_graph: str, assertion_graph: str):
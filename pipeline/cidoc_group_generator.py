@@ -2,32 +2,156 @@
 # Groups relations by event type and mints complete CIDOC-CRM events with all participants
 
 import json
+import logging
 import os
-from typing import Dict, List, Any, Set, Tuple
+from typing import Dict, List, Any, Tuple, Iterator
 from collections import defaultdict
 
+from rdflib import Literal
+from rdflib.namespace import RDF, RDFS
+from rdflib.term import Node
+
+from pipeline_logging import get_logger
+from tracing import traced
+
 # Import pattern functions from cidoc_patterns.py
 from cidoc_patterns import (
-    pattern_spatial_location, pattern_temporal_location, pattern_type_assignment,
-    pattern_influence, pattern_membership, pattern_association,
-    pattern_birth_event, pattern_death_event, pattern_activity_participation,
-    pattern_event_place, pattern_event_time,
-    pattern_expertise, pattern_language_speaker
+    pattern_spatial_location_triples, pattern_temporal_location_triples,
+    pattern_membership_triples, pattern_association_triples,
+    pattern_expertise_triples, pattern_language_speaker_triples,
+    EX, CRM
 )
 
+logger = get_logger("cidoc_group_generator")
+
+# Namespace -> prefix used when rendering the model as Turtle
+TURTLE_PREFIXES = {
+    str(CRM): "crm:",
+    str(RDFS): "rdfs:",
+    str(EX): "ex:",
+}
+
+
+class TurtleBlock:
+    """One Turtle statement: a subject with its ordered predicate/object pairs (rdflib terms)."""
+
+    def __init__(self, subject: Node, pairs: List[Tuple[Node, Node]] = None):
+        self.subject = subject
+        self.pairs = list(pairs or [])
+
+    def to_lines(self, render) -> List[str]:
+        lines = []
+        last = len(self.pairs) - 1
+        subject = render(self.subject)
+        for i, (predicate, obj) in enumerate(self.pairs):
+            end = " ." if i == last else " ;"
+            if i == 0:
+                lines.append(f"{subject} {render(predicate)} {render(obj)}{end}")
+            else:
+                lines.append(f"    {render(predicate)} {render(obj)}{end}")
+        return lines
+
+
+class TurtleGraphModel:
+    """In-memory triple model: ordered statements plus indexes, serialised once at the end.
+
+    - index: subject -> predicate -> objects, for O(1) "does X already have Y" checks
+    - events: event URI (e.g. ex:Work_Creation) -> its block, so later relations can extend it
+    Output goes either to Turtle text (to_lines) or straight into an rdflib graph (add_to_graph).
+    """
+
+    def __init__(self, prefixes: Dict[str, str] = None):
+        self.prefixes = prefixes or TURTLE_PREFIXES
+        self.entries: List[Any] = []  # TurtleBlock or raw line ("" for blank lines, @prefix lines)
+        self.index: Dict[Node, Dict[Node, List[Node]]] = defaultdict(lambda: defaultdict(list))
+        self.events: Dict[Node, TurtleBlock] = {}
+
+    def add_raw(self, line: str):
+        self.entries.append(line)
+
+    def add_block(self, subject: Node, pairs: List[Tuple[Node, Node]], blank_after: bool = False,
+                  event: bool = False) -> TurtleBlock:
+        block = TurtleBlock(subject)
+        self.entries.append(block)
+        for predicate, obj in pairs:
+            self.add_pair(block, predicate, obj)
+        if event:
+            # First block wins, like the former first-match line scan
+            self.events.setdefault(subject, block)
+        if blank_after:
+            self.entries.append("")
+        return block
+
+    def add_pair(self, block: TurtleBlock, predicate: Node, obj: Node):
+        block.pairs.append((predicate, obj))
+        self.index[block.subject][predicate].append(obj)
+
+    def add_triples(self, triples: List[Tuple[Node, Node, Node]]):
+        """Add triples from the cidoc_patterns *_triples functions; consecutive triples on one subject share a block."""
+        block = None
+        for subject, predicate, obj in triples:
+            if block is None or block.subject != subject:
+                block = TurtleBlock(subject)
+                self.entries.append(block)
+            self.add_pair(block, predicate, obj)
+
+    def objects(self, subject: Node, predicate: Node) -> List[Node]:
+        return self.index.get(subject, {}).get(predicate, [])
+
+    def has_type(self, subject: Node) -> bool:
+        return bool(self.objects(subject, RDF.type))
+
+    def subjects_with(self, predicate: Node) -> List[Node]:
+        return [s for s, preds in self.index.items() if predicate in preds]
+
+    def triples(self) -> Iterator[Tuple[Node, Node, Node]]:
+        for entry in self.entries:
+            if isinstance(entry, TurtleBlock):
+                for predicate, obj in entry.pairs:
+                    yield entry.subject, predicate, obj
+
+    def add_to_graph(self, graph):
+        """Add all triples to an rdflib Graph (or named-graph context) without a Turtle round-trip."""
+        graph.addN((s, p, o, graph) for s, p, o in self.triples())
+
+    def render_term(self, term: Node) -> str:
+        if isinstance(term, Literal):
+            value = str(term).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+            return f'"{value}"'
+        if term == RDF.type:
+            return "a"
+        uri = str(term)
+        for namespace, prefix in self.prefixes.items():
+            if uri.startswith(namespace):
+                return f"{prefix}{uri[len(namespace):]}"
+        return f"<{uri}>"
+
+    def to_lines(self) -> List[str]:
+        lines = []
+        for entry in self.entries:
+            if isinstance(entry, TurtleBlock):
+                lines.extend(entry.to_lines(self.render_term))
+            else:
+                lines.append(entry)
+        return lines
+
+
 class CidocEventGroupGenerator:
     """
     Event-centric CIDOC-CRM RDF generator that groups relations by event type
     and mints complete events with all participating entities.
     """
     
-    def __init__(self):
+    def __init__(self, log: logging.Logger = None):
+        # Progress and DEBUG messages (cidoc_events passes a silent logger)
+        self.log = log or logger
+
         # Namespaces
         self.crm = "crm:"
         self.ex = "ex:"
         
-        # Output content
-        self.rdf_content = []
+        # Output content (structured, serialised by rdf_content / generate_* at the end)
+        self.model = TurtleGraphModel()
         
         # Track processed entities and events
         self.processed_entities = set()
@@ -63,6 +187,11 @@ class CidocEventGroupGenerator:
             "historical_context": "E4_Period"
         }
 
+    @property
+    def rdf_content(self) -> List[str]:
+        """Current output as Turtle lines."""
+        return self.model.to_lines()
+
     def load_work_schema(self, file_path: str) -> Dict[str, Any]:
         """Load work schema JSON file."""
         with open(file_path, 'r', encoding='utf-8') as f:
@@ -106,30 +235,37 @@ class CidocEventGroupGenerator:
                                        entities_lookup: Dict[str, Any]) -> Dict[str, Any]:
         """Collect all entities involved in an event group."""
         involved_entities = {}
+        # Checked once: this runs per relation, and quiet runs should not pay for the messages
+        debug = self.log.isEnabledFor(logging.DEBUG)
         
-        print(f"\nDEBUG: Collecting entities for event group with {len(event_group)} relations")
-        print(f"DEBUG: Available entities in lookup: {len(entities_lookup)}")
-        print(f"DEBUG: Entity IDs in lookup: {list(entities_lookup.keys())[:5]}...")
+        if debug:
+            self.log.debug("Collecting entities for event group with %d relations", len(event_group))
+            self.log.debug("Available entities in lookup: %d", len(entities_lookup))
+            self.log.debug("Entity IDs in lookup: %s...", list(entities_lookup.keys())[:5])
         
         for relation in event_group:
             source_id = relation["source_id"]
             target_id = relation["target_id"]
             
-            print(f"DEBUG: Looking for source_id={source_id}, target_id={target_id}")
+            if debug:
+                self.log.debug("Looking for source_id=%s, target_id=%s", source_id, target_id)
             
             if source_id in entities_lookup:
                 involved_entities[source_id] = entities_lookup[source_id]
-                print(f"DEBUG: Found source entity: {source_id}")
-            else:
-                print(f"DEBUG: Source entity not found: {source_id}")
+                if debug:
+                    self.log.debug("Found source entity: %s", source_id)
+            elif debug:
+                self.log.debug("Source entity not found: %s", source_id)
                 
             if target_id in entities_lookup:
                 involved_entities[target_id] = entities_lookup[target_id]
-                print(f"DEBUG: Found target entity: {target_id}")
-            else:
-                print(f"DEBUG: Target entity not found: {target_id}")
+                if debug:
+                    self.log.debug("Found target entity: %s", target_id)
+            elif debug:
+                self.log.debug("Target entity not found: %s", target_id)
         
-        print(f"DEBUG: Collected {len(involved_entities)} entities")
+        if debug:
+            self.log.debug("Collected %d entities", len(involved_entities))
         return involved_entities
 
     def add_entity_rdf(self, entity: Dict[str, Any]):
@@ -145,41 +281,48 @@ class CidocEventGroupGenerator:
         # Get CIDOC-CRM class
         cidoc_class = self.entity_mappings.get(entity_type, "E1_CRM_Entity")
         
-        # Add entity
-        self.rdf_content.append(f"{self.ex}{urified_name} a {self.crm}{cidoc_class} ;")
-        
-        # Add appellation for entities that need them (all except dates and concepts)
+        # Add entity (with appellation for entities that need them, all except dates and concepts)
+        self.add_entity_blocks(self.model, urified_name, entity_name, entity_type, cidoc_class)
+        self.processed_entities.add(entity_id)
+
+    def add_entity_blocks(self, model: TurtleGraphModel, urified_name: str, entity_name: str,
+                          entity_type: str, cidoc_class: str):
+        """Add an entity declaration (and its appellation where needed) to a model."""
+        subject = EX[urified_name]
         if entity_type in ["work", "person", "place", "organization"]:
-            appellation_id = f"{urified_name}_appellation"
-            self.rdf_content.append(f"    {self.crm}P1_is_identified_by {self.ex}{appellation_id} .")
-            self.rdf_content.append("")
-            self.rdf_content.append(f"{self.ex}{appellation_id} a {self.crm}E41_Appellation ;")
-            self.rdf_content.append(f'    rdfs:label "{entity_name}" .')
+            appellation_id = EX[f"{urified_name}_appellation"]
+            model.add_block(subject, [
+                (RDF.type, CRM[cidoc_class]),
+                (CRM["P1_is_identified_by"], appellation_id),
+            ], blank_after=True)
+            model.add_block(appellation_id, [
+                (RDF.type, CRM["E41_Appellation"]),
+                (RDFS.label, Literal(entity_name)),
+            ], blank_after=True)
         else:
-            self.rdf_content.append(f'    rdfs:label "{entity_name}" .')
-        
-        self.rdf_content.append("")
-        self.processed_entities.add(entity_id)
+            model.add_block(subject, [
+                (RDF.type, CRM[cidoc_class]),
+                (RDFS.label, Literal(entity_name)),
+            ], blank_after=True)
 
     def collect_creation_influences(self, creation_id: str, entities_lookup: Dict[str, Any]) -> List[str]:
         """Collect all influences that should be attached to this creation event."""
         influences = []
+        influence_predicate = CRM["P15_was_influenced_by"]
+        creation_subject = EX[creation_id]
+        render = self.model.render_term
         
         # Find work influences from processed influence relations
-        for content_line in self.rdf_content:
-            if f"{creation_id} {self.crm}P15_was_influenced_by" in content_line:
-                influences.append(content_line.strip())
+        for influence_target in self.model.objects(creation_subject, influence_predicate):
+            influences.append(f"{render(creation_subject)} {render(influence_predicate)} {render(influence_target)} .")
         
         # Find creator influences that should be redirected to creation
-        creator_name = None
         for entity_id, entity in entities_lookup.items():
             if entity["type"] == "person":
                 person_name = self.urify_name(entity["name"])
-                for content_line in self.rdf_content:
-                    if f"{self.ex}{person_name} {self.crm}P15_was_influenced_by" in content_line:
-                        # Redirect person influence to creation
-                        influence_target = content_line.split(f"{self.crm}P15_was_influenced_by ")[1].rstrip(" .")
-                        influences.append(f"{self.ex}{creation_id} {self.crm}P15_was_influenced_by {influence_target} .")
+                for influence_target in self.model.objects(EX[person_name], influence_predicate):
+                    # Redirect person influence to creation
+                    influences.append(f"{render(creation_subject)} {render(influence_predicate)} {render(influence_target)} .")
         
         return influences
     
@@ -216,31 +359,24 @@ class CidocEventGroupGenerator:
         creation_id = f"{work_name}_Creation"
         
         # Start creation event
-        properties = []
-        properties.append(f"    {self.crm}P14_carried_out_by {self.ex}{self.urify_name(creator_entity['name'])}")
-        properties.append(f"    {self.crm}P94_has_created {self.ex}{work_name}")
+        properties = [(RDF.type, CRM["E65_Creation"])]
+        properties.append((CRM["P14_carried_out_by"], EX[self.urify_name(creator_entity['name'])]))
+        properties.append((CRM["P94_has_created"], EX[work_name]))
         
         # Add time-span if available
         if time_entity:
-            properties.append(f"    {self.crm}P4_has_time-span {self.ex}{self.urify_name(time_entity['name'])}")
+            properties.append((CRM["P4_has_time-span"], EX[self.urify_name(time_entity['name'])]))
         
         # Add place if available
         if place_entity:
-            properties.append(f"    {self.crm}P7_took_place_at {self.ex}{self.urify_name(place_entity['name'])}")
+            properties.append((CRM["P7_took_place_at"], EX[self.urify_name(place_entity['name'])]))
         
         # Store creation info for influence processing
         self.current_creation_id = creation_id
         self.current_creator_name = self.urify_name(creator_entity["name"])
         
         # Add creation event with properties
-        self.rdf_content.append(f"{self.ex}{creation_id} a {self.crm}E65_Creation ;")
-        for i, prop in enumerate(properties):
-            if i < len(properties) - 1:
-                self.rdf_content.append(f"{prop} ;")
-            else:
-                self.rdf_content.append(f"{prop} .")
-        
-        self.rdf_content.append("")
+        self.model.add_block(EX[creation_id], properties, blank_after=True, event=True)
         self.processed_events.add(group_key)
 
     def mint_creation_event(self, group_key: str, event_group: List[Dict[str, Any]], 
@@ -281,14 +417,9 @@ class CidocEventGroupGenerator:
     
     def find_creation_event_for_work(self, work_id: str) -> str:
         """Find the creation event ID for a given work."""
-        work_name = None
-        for entity_id, entity in self.entities_lookup.items():
-            if entity_id == work_id:
-                work_name = self.urify_name(entity["name"])
-                break
-        
-        if work_name:
-            return f"{work_name}_Creation"
+        entity = self.entities_lookup.get(work_id)
+        if entity is not None:
+            return f"{self.urify_name(entity['name'])}_Creation"
         return None
     
     def mint_influence_relations_only(self, group_key: str, event_group: List[Dict[str, Any]], 
@@ -324,44 +455,25 @@ class CidocEventGroupGenerator:
                     if source_entity["type"] == "work":
                         creation_event_id = self.find_creation_event_for_work(corrected_source_id)
                         if creation_event_id:
-                            creation_influences.append(f"    {self.crm}P15_was_influenced_by {self.ex}{target_name}")
+                            creation_influences.append(EX[target_name])
                     # If source is the creator person, redirect to creation event
                     elif (hasattr(self, 'current_creator_name') and 
                           source_name == self.current_creator_name):
-                        creation_influences.append(f"    {self.crm}P15_was_influenced_by {self.ex}{target_name}")
+                        creation_influences.append(EX[target_name])
                     else:
                         # Other person influences remain direct
-                        other_influences.append(f"{self.ex}{source_name} {self.crm}P15_was_influenced_by {self.ex}{target_name} .")
+                        other_influences.append((EX[source_name], EX[target_name]))
         
         # Update the creation event with consolidated influences
         if creation_influences and hasattr(self, 'current_creation_id'):
-            # Find and update the creation event in rdf_content
-            creation_line_idx = None
-            for i, line in enumerate(self.rdf_content):
-                if f"{self.ex}{self.current_creation_id} a {self.crm}E65_Creation" in line:
-                    creation_line_idx = i
-                    break
-            
-            if creation_line_idx is not None:
-                # Find the end of the creation event (line ending with '.')
-                end_idx = creation_line_idx
-                for i in range(creation_line_idx, len(self.rdf_content)):
-                    if self.rdf_content[i].strip().endswith('.'):
-                        end_idx = i
-                        break
-                
-                # Remove the final '.' and add influences
-                self.rdf_content[end_idx] = self.rdf_content[end_idx].rstrip(' .') + ' ;'
-                
-                # Add influences
-                for i, influence in enumerate(creation_influences):
-                    if i < len(creation_influences) - 1:
-                        self.rdf_content.insert(end_idx + 1 + i, f"{influence} ;")
-                    else:
-                        self.rdf_content.insert(end_idx + 1 + i, f"{influence} .")
+            creation_block = self.model.events.get(EX[self.current_creation_id])
+            if creation_block is not None:
+                for influence_target in creation_influences:
+                    self.model.add_pair(creation_block, CRM["P15_was_influenced_by"], influence_target)
         
         # Add other influences separately
-        self.rdf_content.extend(other_influences)
+        for source, target in other_influences:
+            self.model.add_block(source, [(CRM["P15_was_influenced_by"], target)])
         
         # Mark as processed
         self.processed_events.add(group_key)
@@ -401,38 +513,29 @@ class CidocEventGroupGenerator:
             if rel_type == "located_in_space" and target_entity["type"] == "place":
                 if source_entity["type"] == "work":
                     # Redirect work spatial location to the Creation event as P7_took_place_at
-                    creation_id = f"{source_name}_Creation"
-                    # Check if Creation event exists in rdf_content
-                    creation_line_idx = None
-                    for i, line in enumerate(self.rdf_content):
-                        if f"{self.ex}{creation_id} a {self.crm}E65_Creation" in line:
-                            creation_line_idx = i
-                            break
-                    if creation_line_idx is None:
+                    creation_id = EX[f"{source_name}_Creation"]
+                    # Check if Creation event exists
+                    creation_block = self.model.events.get(creation_id)
+                    if creation_block is None:
                         # Mint a minimal Creation event block and attach place
-                        self.rdf_content.append(f"{self.ex}{creation_id} a {self.crm}E65_Creation ;")
-                        self.rdf_content.append(f"    {self.crm}P94_has_created {self.ex}{source_name} ;")
-                        self.rdf_content.append(f"    {self.crm}P7_took_place_at {self.ex}{target_name} .")
-                        self.rdf_content.append("")
+                        self.model.add_block(creation_id, [
+                            (RDF.type, CRM["E65_Creation"]),
+                            (CRM["P94_has_created"], EX[source_name]),
+                            (CRM["P7_took_place_at"], EX[target_name]),
+                        ], blank_after=True, event=True)
                     else:
                         # Append P7 to existing Creation event block
-                        end_idx = creation_line_idx
-                        for j in range(creation_line_idx, len(self.rdf_content)):
-                            if self.rdf_content[j].strip().endswith('.'):
-                                end_idx = j
-                                break
-                        self.rdf_content[end_idx] = self.rdf_content[end_idx].rstrip(' .') + ' ;'
-                        self.rdf_content.insert(end_idx + 1, f"    {self.crm}P7_took_place_at {self.ex}{target_name} .")
+                        self.model.add_pair(creation_block, CRM["P7_took_place_at"], EX[target_name])
                 else:
                     # Use the pattern for non-work entities (e.g., people)
-                    location_triple = pattern_spatial_location(self.ex, self.crm, source_name, target_name)
-                    self.rdf_content.append(location_triple)
+                    location_triple = pattern_spatial_location_triples(EX, CRM, source_name, target_name)
+                    self.model.add_triples(location_triple)
                 
             # Handle temporal location
             elif rel_type == "located_in_time" and target_entity["type"] == "date":
                 # Use the pattern function for temporal location
-                temporal_triple = pattern_temporal_location(self.ex, self.crm, source_name, target_name)
-                self.rdf_content.append(temporal_triple)
+                temporal_triple = pattern_temporal_location_triples(EX, CRM, source_name, target_name)
+                self.model.add_triples(temporal_triple)
         
         # Mark as processed
         self.processed_events.add(group_key)
@@ -471,20 +574,20 @@ class CidocEventGroupGenerator:
             # Handle membership-only semantics for associated_with
             if rel_type == "associated_with":
                 if target_entity["type"] in ["organization"] and source_entity["type"] in ["person"]:
-                    membership_triple = pattern_membership(self.ex, self.crm, source_name, target_name)
-                    self.rdf_content.append(membership_triple)
+                    membership_triple = pattern_membership_triples(EX, CRM, source_name, target_name)
+                    self.model.add_triples(membership_triple)
                 elif source_entity["type"] == "work":
                     # Backward-compatibility: map legacy work-associated_with-X to refers_to (P67)
-                    association_triple = pattern_association(self.ex, self.crm, source_name, target_name)
-                    self.rdf_content.append(association_triple)
+                    association_triple = pattern_association_triples(EX, CRM, source_name, target_name)
+                    self.model.add_triples(association_triple)
                 else:
                     # Skip non-membership associated_with
                     continue
             # Explicit refers_to: only emit P67 from works to any other entity
             elif rel_type == "refers_to":
                 if source_entity["type"] == "work":
-                    association_triple = pattern_association(self.ex, self.crm, source_name, target_name)
-                    self.rdf_content.append(association_triple)
+                    association_triple = pattern_association_triples(EX, CRM, source_name, target_name)
+                    self.model.add_triples(association_triple)
                 else:
                     # Skip non-work sources for refers_to
                     continue
@@ -532,27 +635,28 @@ class CidocEventGroupGenerator:
             # Handle language competence
             if rel_type == "speaks_language" and target_entity["type"] == "language":
                 # Create language speaker type with appellation
-                language_speaker_triples = pattern_language_speaker(self.ex, self.crm, person_name, language_name, target_entity["name"])
+                language_speaker_triples = pattern_language_speaker_triples(EX, CRM, person_name, language_name, target_entity["name"])
                 
-                # Debug: Check if Old French is in the RDF content
-                old_french_in_rdf = False
-                for line in self.rdf_content:
-                    if "Old_French" in line:
-                        old_french_in_rdf = True
-                if not old_french_in_rdf:
-                    # Add Old French entity explicitly
-                    self.rdf_content.append(f"ex:{language_name} a crm:E56_Language ;")
-                    self.rdf_content.append(f'    rdfs:label "{target_entity["name"]}" .')
-                    self.rdf_content.append("")
+                # Declare the language entity if it is not in the output yet
+                self.add_language_entity_if_missing(language_name, target_entity["name"])
                 
                 # Add only the language speaker type (no P72_has_language on persons)
-                self.rdf_content.extend(language_speaker_triples)
+                self.model.add_triples(language_speaker_triples)
             
         
         
         # Mark as processed
         self.processed_events.add(group_key)
         
+    def add_language_entity_if_missing(self, language_name: str, label: str):
+        """Declare ex:<language> as E56_Language unless it already has a type in the output."""
+        if self.model.has_type(EX[language_name]):
+            return
+        self.model.add_block(EX[language_name], [
+            (RDF.type, CRM["E56_Language"]),
+            (RDFS.label, Literal(label)),
+        ], blank_after=True)
+
     def mint_person_language_relations(self, group_key: str, event_group: List[Dict[str, Any]],
                                     entities: Dict[str, Any]):
         """Mint person language relations with appropriate properties."""
@@ -590,9 +694,8 @@ class CidocEventGroupGenerator:
             # Handle expertise
             if rel_type == "has_expertise_in" and target_entity["type"] in ["concept", "language", "genre"]:
                 # Create expertise type and assign to person (use slug for ID, original name for label)
-                expertise_triples = pattern_expertise(self.ex, self.crm, person_name, expertise_name, target_entity["name"])
-                for triple in expertise_triples:
-                    self.rdf_content.append(triple)
+                expertise_triples = pattern_expertise_triples(EX, CRM, person_name, expertise_name, target_entity["name"])
+                self.model.add_triples(expertise_triples)
         
         # Mark as processed
         self.processed_events.add(group_key)
@@ -633,20 +736,15 @@ class CidocEventGroupGenerator:
         event_id = f"{person_name}_Birth"
         # Build event block
         props = [
-            f"    {self.crm}P98_brought_into_life {self.ex}{person_name}"
+            (RDF.type, CRM["E67_Birth"]),
+            (CRM["P98_brought_into_life"], EX[person_name]),
         ]
         if time_entity:
-            props.append(f"    {self.crm}P4_has_time-span {self.ex}{self.urify_name(time_entity['name'])}")
+            props.append((CRM["P4_has_time-span"], EX[self.urify_name(time_entity['name'])]))
         if place_entity:
-            props.append(f"    {self.crm}P7_took_place_at {self.ex}{self.urify_name(place_entity['name'])}")
+            props.append((CRM["P7_took_place_at"], EX[self.urify_name(place_entity['name'])]))
         # Emit
-        self.rdf_content.append(f"{self.ex}{event_id} a {self.crm}E67_Birth ;")
-        for i, prop in enumerate(props):
-            if i < len(props) - 1:
-                self.rdf_content.append(f"{prop} ;")
-            else:
-                self.rdf_content.append(f"{prop} .")
-        self.rdf_content.append("")
+        self.model.add_block(EX[event_id], props, blank_after=True, event=True)
         self.processed_events.add(group_key)
 
     def mint_person_death_event_only(self, group_key: str, event_group: List[Dict[str, Any]], 
@@ -675,34 +773,36 @@ class CidocEventGroupGenerator:
         event_id = f"{person_name}_Death"
         # Build event block
         props = [
-            f"    {self.crm}P100_was_death_of {self.ex}{person_name}"
+            (RDF.type, CRM["E69_Death"]),
+            (CRM["P100_was_death_of"], EX[person_name]),
         ]
         if time_entity:
-            props.append(f"    {self.crm}P4_has_time-span {self.ex}{self.urify_name(time_entity['name'])}")
+            props.append((CRM["P4_has_time-span"], EX[self.urify_name(time_entity['name'])]))
         if place_entity:
-            props.append(f"    {self.crm}P7_took_place_at {self.ex}{self.urify_name(place_entity['name'])}")
+            props.append((CRM["P7_took_place_at"], EX[self.urify_name(place_entity['name'])]))
         # Emit
-        self.rdf_content.append(f"{self.ex}{event_id} a {self.crm}E69_Death ;")
-        for i, prop in enumerate(props):
-            if i < len(props) - 1:
-                self.rdf_content.append(f"{prop} ;")
-            else:
-                self.rdf_content.append(f"{prop} .")
-        self.rdf_content.append("")
+        self.model.add_block(EX[event_id], props, blank_after=True, event=True)
         self.processed_events.add(group_key)
 
     def generate_grouped_rdf_content(self, entities_lookup: Dict[str, Any], event_groups: Dict[str, List[Dict[str, Any]]], include_prefixes: bool = True, emit_entities: bool = True) -> List[str]:
         """Generate RDF content with entities grouped with their properties.
         Set include_prefixes=False to omit @prefix lines for embedding inside a named graph.
         """
-        grouped_content = []
+        return self.build_grouped_model(entities_lookup, event_groups, include_prefixes=include_prefixes,
+                                        emit_entities=emit_entities).to_lines()
+
+    @traced
+    def build_grouped_model(self, entities_lookup: Dict[str, Any], event_groups: Dict[str, List[Dict[str, Any]]], include_prefixes: bool = True, emit_entities: bool = True) -> TurtleGraphModel:
+        """Build a model holding the (optional) prefixes and the entity declarations grouped by type."""
+        grouped_content = TurtleGraphModel()
         if include_prefixes:
-            grouped_content.extend([
+            for line in [
                 "@prefix crm: <http://www.cidoc-crm.org/cidoc-crm/> .",
                 "@prefix rdfs: <http://www.w3.org/2000/01/rdf-schema#> .", 
                 "@prefix ex: <http://example.org/> .",
                 ""
-            ])
+            ]:
+                grouped_content.add_raw(line)
         
         if emit_entities:
             # First pass: collect all entities that will be used
@@ -734,18 +834,7 @@ class CidocEventGroupGenerator:
                         cidoc_class = self.entity_mappings.get(entity_type, "E1_CRM_Entity")
                         
                         # Add entity with appellation if needed
-                        if entity_type in ["work", "person", "place", "organization"]:
-                            appellation_id = f"{urified_name}_appellation"
-                            grouped_content.append(f"{self.ex}{urified_name} a {self.crm}{cidoc_class} ;")
-                            grouped_content.append(f"    {self.crm}P1_is_identified_by {self.ex}{appellation_id} .")
-                            grouped_content.append("")
-                            grouped_content.append(f"{self.ex}{appellation_id} a {self.crm}E41_Appellation ;")
-                            grouped_content.append(f'    rdfs:label "{entity_name}" .')
-                        else:
-                            grouped_content.append(f"{self.ex}{urified_name} a {self.crm}{cidoc_class} ;")
-                            grouped_content.append(f'    rdfs:label "{entity_name}" .')
-                        
-                        grouped_content.append("")
+                        self.add_entity_blocks(grouped_content, urified_name, entity_name, entity_type, cidoc_class)
                         self.processed_entities.add(entity_id)
         
         return grouped_content
@@ -762,24 +851,25 @@ class CidocEventGroupGenerator:
         entities_lookup = {entity["id"]: entity for entity in nodes}
         
         # Debug check for specific entities
-        if "old_french" in entities_lookup:
-            print(f"\nDEBUG: Old French entity found in entities_lookup: {entities_lookup['old_french']}")
-        else:
-            print(f"\nDEBUG: Old French entity NOT found in entities_lookup")
-            # Check all entity IDs
-            print(f"DEBUG: Available entity IDs: {list(entities_lookup.keys())}")
-            # Check if there's any language entity
-            language_entities = [entity for entity in nodes if entity["type"] == "language"]
-            print(f"DEBUG: Language entities: {language_entities}")
+        if self.log.isEnabledFor(logging.DEBUG):
+            if "old_french" in entities_lookup:
+                self.log.debug("Old French entity found in entities_lookup: %s", entities_lookup["old_french"])
+            else:
+                self.log.debug("Old French entity NOT found in entities_lookup")
+                # Check all entity IDs
+                self.log.debug("Available entity IDs: %s", list(entities_lookup.keys()))
+                # Check if there's any language entity
+                language_entities = [entity for entity in nodes if entity["type"] == "language"]
+                self.log.debug("Language entities: %s", language_entities)
         
         # Group relations by event type
         event_groups = self.group_relations_by_event(relations)
         
         # Generate grouped entity content first
-        self.rdf_content = self.generate_grouped_rdf_content(entities_lookup, event_groups, include_prefixes=True)
+        self.model = self.build_grouped_model(entities_lookup, event_groups, include_prefixes=True)
         
         # Add events and relations section
-        self.rdf_content.append("")
+        self.model.add_raw("")
         
         # Process each event group
         for group_key, event_group in event_groups.items():
@@ -791,7 +881,7 @@ class CidocEventGroupGenerator:
                     break
             if event_type is None:
                 event_type = group_key.split("_", 1)[0]
-            print(f"Processing event group: {group_key}, type: {event_type}, relations: {len(event_group)}")
+            self.log.info("Processing event group: %s, type: %s, relations: %d", group_key, event_type, len(event_group))
             
             # Collect entities for this event
             involved_entities = self.collect_entities_for_event_group(event_group, entities_lookup)
@@ -817,14 +907,10 @@ class CidocEventGroupGenerator:
                             source_name = self.urify_name(source_entity["name"])
                             language_name = self.urify_name(target_entity["name"])
                             # Add language entity if not already in RDF content
-                            language_entity_found = any(f"ex:{language_name} a" in line for line in self.rdf_content)
-                            if not language_entity_found:
-                                self.rdf_content.append(f"ex:{language_name} a crm:E56_Language ;")
-                                self.rdf_content.append(f'    rdfs:label "{target_entity["name"]}" .')
-                                self.rdf_content.append("")
+                            self.add_language_entity_if_missing(language_name, target_entity["name"])
                             # Add only the language speaker type (no P72_has_language)
-                            speaker_triples = pattern_language_speaker(self.ex, self.crm, source_name, language_name, target_entity["name"])
-                            self.rdf_content.extend(speaker_triples)
+                            speaker_triples = pattern_language_speaker_triples(EX, CRM, source_name, language_name, target_entity["name"])
+                            self.model.add_triples(speaker_triples)
                 
                 # Mark as processed
                 self.processed_events.add(group_key)
@@ -839,7 +925,7 @@ class CidocEventGroupGenerator:
                 self.mint_person_death_event_only(group_key, event_group, involved_entities)
             elif event_type.startswith("person_"):
                 # Other person groups not implemented
-                print(f"Skipping person relation group: {group_key} (not yet implemented)")
+                self.log.info("Skipping person relation group: %s (not yet implemented)", group_key)
                 self.processed_events.add(group_key)
             elif event_type == "association":
                 self.mint_association_relations(group_key, event_group, involved_entities)
@@ -847,12 +933,19 @@ class CidocEventGroupGenerator:
                 self.mint_location_relations(group_key, event_group, involved_entities)
             # TODO: Add other event types
         
-        return "\n".join(self.rdf_content)
+        return "\n".join(self.model.to_lines())
 
+    @traced
     def generate_event_rdf_from_data(self, data: Dict[str, Any], include_prefixes: bool = False, emit_entities: bool = True) -> str:
         """Generate event-centric RDF from an in-memory work schema dict.
         When embedding inside a TRIG named graph, set include_prefixes=False.
         """
+        return "\n".join(self.build_event_model_from_data(data, include_prefixes=include_prefixes, emit_entities=emit_entities).to_lines())
+
+    def build_event_model_from_data(self, data: Dict[str, Any], include_prefixes: bool = False, emit_entities: bool = True) -> TurtleGraphModel:
+        """Build the event-centric triple model for an in-memory work schema dict.
+        Use model.add_to_graph(graph) to load it into rdflib without going through Turtle text.
+        """
         interpretation_layer = data["work_schema_metadata"]["interpretation_layer"]
         nodes = interpretation_layer["nodes"]
         relations = interpretation_layer["relations"]
@@ -860,8 +953,8 @@ class CidocEventGroupGenerator:
         entities_lookup = {entity["id"]: entity for entity in nodes}
         event_groups = self.group_relations_by_event(relations)
         # reset per-run state
-        self.rdf_content = self.generate_grouped_rdf_content(entities_lookup, event_groups, include_prefixes=include_prefixes, emit_entities=emit_entities)
-        self.rdf_content.append("")
+        self.model = self.build_grouped_model(entities_lookup, event_groups, include_prefixes=include_prefixes, emit_entities=emit_entities)
+        self.model.add_raw("")
 
         for group_key, event_group in event_groups.items():
             event_type = None
@@ -890,14 +983,10 @@ class CidocEventGroupGenerator:
                             source_name = self.urify_name(source_entity["name"])
                             language_name = self.urify_name(target_entity["name"])
                             if emit_entities:
-                                language_entity_found = any(f"ex:{language_name} a" in line for line in self.rdf_content)
-                                if not language_entity_found:
-                                    self.rdf_content.append(f"ex:{language_name} a crm:E56_Language ;")
-                                    self.rdf_content.append(f'    rdfs:label "{target_entity["name"]}" .')
-                                    self.rdf_content.append("")
+                                self.add_language_entity_if_missing(language_name, target_entity["name"])
                             # Add only the language speaker type (no P72_has_language)
-                            speaker_triples = pattern_language_speaker(self.ex, self.crm, source_name, language_name, target_entity["name"])
-                            self.rdf_content.extend(speaker_triples)
+                            speaker_triples = pattern_language_speaker_triples(EX, CRM, source_name, language_name, target_entity["name"])
+                            self.model.add_triples(speaker_triples)
                 self.processed_events.add(group_key)
             elif event_type == "person_expertise":
                 self.mint_person_expertise_relations_only(group_key, event_group, involved_entities)
@@ -912,7 +1001,7 @@ class CidocEventGroupGenerator:
             elif event_type == "location":
                 self.mint_location_relations_only(group_key, event_group, involved_entities)
 
-        return "\n".join(self.rdf_content)
+        return self.model
 
     def mint_person_occupation_relations_only(self, group_key: str, event_group: List[Dict[str, Any]],
                                               entities: Dict[str, Any]):
@@ -935,13 +1024,15 @@ class CidocEventGroupGenerator:
             activity_id = f"{person_name}_{occ_slug}_Activity"
             app_id = f"{activity_id}_appellation"
             # Emit E7 Activity block with P14 and P1 identified by an appellation labeled as occupation
-            self.rdf_content.append(f"{self.ex}{activity_id} a {self.crm}E7_Activity ;")
-            self.rdf_content.append(f"    {self.crm}P14_carried_out_by {self.ex}{person_name} ;")
-            self.rdf_content.append(f"    {self.crm}P1_is_identified_by {self.ex}{app_id} .")
-            self.rdf_content.append("")
-            self.rdf_content.append(f"{self.ex}{app_id} a {self.crm}E41_Appellation ;")
-            self.rdf_content.append(f"    rdfs:label \"{occ_label}\" .")
-            self.rdf_content.append("")
+            self.model.add_block(EX[activity_id], [
+                (RDF.type, CRM["E7_Activity"]),
+                (CRM["P14_carried_out_by"], EX[person_name]),
+                (CRM["P1_is_identified_by"], EX[app_id]),
+            ], blank_after=True, event=True)
+            self.model.add_block(EX[app_id], [
+                (RDF.type, CRM["E41_Appellation"]),
+                (RDFS.label, Literal(occ_label)),
+            ], blank_after=True)
         self.processed_events.add(group_key)
 
     def mint_person_occupation_relations(self, group_key: str, event_group: List[Dict[str, Any]],
@@ -954,7 +1045,7 @@ class CidocEventGroupGenerator:
     def save_rdf_to_file(self, output_file: str):
         """Save RDF content to file."""
         with open(output_file, 'w', encoding='utf-8') as f:
-            f.write("\n".join(self.rdf_content))
+            f.write("\n".join(self.model.to_lines()))
 
 def main():
     """Generate TRIG per document with facts and assertions graphs and nanopub head."""
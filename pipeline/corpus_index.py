@@ -0,0 +1,239 @@
+# Corpus-wide FAISS index over the chunks of all documents
+# Built from the per-document indexes in documents/<file_id>/ (no re-embedding) via indexer.create_hybrid_index.
+# Each corpus vector id maps to (file_id, chunk_id); searches can be restricted to a subset of documents.
+#
+# Files in corpus_index/:
+# - corpus_index.faiss: the FAISS index
+# - corpus_ids.npy:     int32 array [n, 2] of (document position, chunk position) per vector id
+# - corpus_files.json:  file_ids in document-position order
+# - corpus_sources.json: modification time of each document_index.faiss merged in, to spot re-indexed documents
+
+import json
+import os
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+import faiss
+import numpy as np
+
+from chunk_store import ChunkStore, has_chunk_store, OFFSETS_FILE
+from indexer import (
+    create_hybrid_index, save_index, load_index, index_vectors,
+    normalize_embeddings, similarity_scores, INDEX_TYPES,
+)
+
+BASE_DIR = os.path.abspath(os.path.dirname(__file__))
+DOCUMENTS_DIR = os.path.join(BASE_DIR, "documents")
+CORPUS_DIR = os.path.join(BASE_DIR, "corpus_index")
+
+INDEX_FILE = "corpus_index.faiss"
+IDS_FILE = "corpus_ids.npy"
+FILES_FILE = "corpus_files.json"
+SOURCES_FILE = "corpus_sources.json"
+
+# Per-query filter: None (all documents), or the file_ids a query may retrieve from
+DocumentFilter = Optional[Sequence[str]]
+
+
+def build_corpus_index(documents_dir: str = DOCUMENTS_DIR, output_dir: str = CORPUS_DIR,
+                       file_ids: Optional[List[str]] = None, **index_params) -> "CorpusIndex":
+    """Merge per-document indexes into one corpus index and save it to output_dir.
+
+    index_params are passed to indexer.create_hybrid_index (index_type, nlist, nprobe, ...).
+    """
+    if file_ids is None:
+        file_ids = sorted(
+            d for d in os.listdir(documents_dir)
+            if os.path.exists(os.path.join(documents_dir, d, "document_index.faiss"))
+        )
+    vectors: List[np.ndarray] = []
+    ids: List[np.ndarray] = []
+    kept: List[str] = []
+    index_mtimes: Dict[str, float] = {}
+    for file_id in file_ids:
+        index_path = os.path.join(documents_dir, file_id, "document_index.faiss")
+        if not os.path.exists(index_path):
+            print(f"Warning: No document index for {file_id}, skipping")
+            continue
+        index_mtimes[file_id] = os.path.getmtime(index_path)
+        doc_vectors = index_vectors(load_index(index_path))
+        doc_pos = len(kept)
+        kept.append(file_id)
+        vectors.append(doc_vectors)
+        ids.append(np.column_stack([
+            np.full(len(doc_vectors), doc_pos, dtype='int32'),
+            np.arange(len(doc_vectors), dtype='int32'),
+        ]))
+        print(f"Added {len(doc_vectors)} chunks from {file_id}")
+    if not vectors:
+        raise ValueError(f"No document indexes found in {documents_dir}")
+
+    corpus = CorpusIndex(
+        create_hybrid_index(np.vstack(vectors), **index_params),
+        kept,
+        np.vstack(ids),
+        documents_dir=documents_dir,
+        index_mtimes=index_mtimes,
+    )
+    corpus.save(output_dir)
+    return corpus
+
+
+class CorpusIndex:
+    """FAISS index over all documents with an id -> (file_id, chunk_id) mapping."""
+
+    def __init__(self, index: faiss.Index, file_ids: List[str], id_map: np.ndarray,
+                 documents_dir: str = DOCUMENTS_DIR, index_mtimes: Optional[Dict[str, float]] = None):
+        self.index = index
+        self.file_ids = list(file_ids)
+        self.id_map = np.asarray(id_map, dtype='int32')
+        self.documents_dir = documents_dir
+        # Modification time of each document_index.faiss when it was merged in (empty for older corpus indexes)
+        self.index_mtimes = dict(index_mtimes or {})
+        self._doc_pos = {file_id: i for i, file_id in enumerate(self.file_ids)}
+        self._chunks: Dict[str, Sequence[Dict]] = {}
+        self._selectors: Dict[Tuple[str, ...], faiss.IDSelector] = {}
+
+    def save(self, output_dir: str = CORPUS_DIR) -> None:
+        os.makedirs(output_dir, exist_ok=True)
+        save_index(self.index, os.path.join(output_dir, INDEX_FILE))
+        np.save(os.path.join(output_dir, IDS_FILE), self.id_map)
+        with open(os.path.join(output_dir, FILES_FILE), 'w', encoding='utf-8') as f:
+            json.dump(self.file_ids, f, ensure_ascii=False, indent=2)
+        with open(os.path.join(output_dir, SOURCES_FILE), 'w', encoding='utf-8') as f:
+            json.dump(self.index_mtimes, f, ensure_ascii=False, indent=2)
+        print(f"Corpus index saved to {output_dir} ({self.index.ntotal} chunks, {len(self.file_ids)} documents)")
+
+    @classmethod
+    def load(cls, corpus_dir: str = CORPUS_DIR, documents_dir: str = DOCUMENTS_DIR,
+             mmap: bool = True) -> "CorpusIndex":
+        with open(os.path.join(corpus_dir, FILES_FILE), 'r', encoding='utf-8') as f:
+            file_ids = json.load(f)
+        sources_path = os.path.join(corpus_dir, SOURCES_FILE)
+        index_mtimes = None
+        if os.path.exists(sources_path):
+            with open(sources_path, 'r', encoding='utf-8') as f:
+                index_mtimes = json.load(f)
+        return cls(
+            load_index(os.path.join(corpus_dir, INDEX_FILE), mmap=mmap),
+            file_ids,
+            np.load(os.path.join(corpus_dir, IDS_FILE), mmap_mode='r' if mmap else None),
+            documents_dir=documents_dir,
+            index_mtimes=index_mtimes,
+        )
+
+    def close(self) -> None:
+        """Close the chunk stores opened by document_chunks()."""
+        for chunks in self._chunks.values():
+            if isinstance(chunks, ChunkStore):
+                chunks.close()
+        self._chunks.clear()
+
+    def locate(self, vector_id: int) -> Tuple[str, int]:
+        """Map a corpus vector id to (file_id, chunk_id)."""
+        doc_pos, chunk_id = self.id_map[vector_id]
+        return self.file_ids[doc_pos], int(chunk_id)
+
+    def is_stale(self, file_id: str) -> bool:
+        """True if the document was re-indexed after it was merged into this corpus index."""
+        recorded = self.index_mtimes.get(file_id)
+        index_path = os.path.join(self.documents_dir, file_id, "document_index.faiss")
+        return recorded is not None and (not os.path.exists(index_path) or os.path.getmtime(index_path) != recorded)
+
+    def document_chunks(self, file_id: str) -> Sequence[Dict]:
+        """Chunks of one document (loaded on first use): its chunk store if up to date, else document_metadata.json."""
+        if file_id not in self._chunks:
+            if self.is_stale(file_id):
+                print(f"Warning: {file_id} was re-indexed after the corpus index was built; its corpus hits may "
+                      f"point at the wrong chunks until the corpus index is rebuilt (python corpus_index.py)")
+            ddir = os.path.join(self.documents_dir, file_id)
+            metadata_path = os.path.join(ddir, "document_metadata.json")
+            # Same check as SimpleRAGPipeline.load_metadata: the chunk store must not be older than the JSON
+            if has_chunk_store(ddir) and (not os.path.exists(metadata_path) or os.path.getmtime(
+                    os.path.join(ddir, OFFSETS_FILE)) >= os.path.getmtime(metadata_path)):
+                self._chunks[file_id] = ChunkStore(ddir)
+            else:
+                with open(metadata_path, 'r', encoding='utf-8') as f:
+                    self._chunks[file_id] = json.load(f).get('chunks', [])
+        return self._chunks[file_id]
+
+    def _selector(self, file_ids: Sequence[str]) -> faiss.IDSelector:
+        key = tuple(sorted(set(file_ids)))
+        if key not in self._selectors:
+            unknown = [f for f in key if f not in self._doc_pos]
+            if unknown:
+                raise KeyError(f"Documents not in corpus index: {unknown}")
+            positions = np.array([self._doc_pos[f] for f in key], dtype='int32')
+            allowed = np.flatnonzero(np.isin(self.id_map[:, 0], positions)).astype('int64')
+            self._selectors[key] = faiss.IDSelectorBatch(allowed)
+        return self._selectors[key]
+
+    def _search_params(self, selector: faiss.IDSelector) -> faiss.SearchParameters:
+        try:
+            ivf = faiss.extract_index_ivf(self.index)
+        except RuntimeError:
+            ivf = None
+        if ivf is not None:
+            return faiss.SearchParametersIVF(sel=selector, nprobe=ivf.nprobe)
+        return faiss.SearchParameters(sel=selector)
+
+    def search(self, query_embeddings: np.ndarray, k: int,
+               file_ids: Union[DocumentFilter, List[DocumentFilter]] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Search all queries, restricting each to its document filter.
+
+        file_ids is either one filter for every query or a list with one filter per query; an empty list is
+        one filter with no documents. Queries sharing a filter are searched together; returns (cosine
+        similarities, ids), with id -1 where a query has no hit.
+        """
+        query_embeddings = normalize_embeddings(query_embeddings)
+        n = len(query_embeddings)
+        if isinstance(file_ids, str):
+            # A single file_id, not a sequence of one-character file_ids
+            file_ids = [file_ids]
+        if file_ids is None or len(file_ids) == 0 or isinstance(file_ids[0], str):
+            filters = [file_ids] * n
+        else:
+            filters = list(file_ids)
+            if len(filters) != n:
+                raise ValueError("Need one document filter per query")
+
+        scores = np.zeros((n, k), dtype='float32')
+        ids = np.full((n, k), -1, dtype='int64')
+        groups: Dict[Optional[Tuple[str, ...]], List[int]] = {}
+        for i, f in enumerate(filters):
+            groups.setdefault(tuple(sorted(set(f))) if f is not None else None, []).append(i)
+        for key, rows in groups.items():
+            if key == ():
+                continue
+            params = self._search_params(self._selector(key)) if key is not None else None
+            d, I = self.index.search(query_embeddings[rows], k, params=params)
+            scores[rows] = similarity_scores(self.index, d)
+            ids[rows] = I
+        return scores, ids
+
+    def hits(self, vector_ids: Sequence[int], scores: Sequence[float]) -> List[Tuple[Dict, float]]:
+        """(chunk, score) pairs for one result row; chunks are copies tagged with file_id and chunk_id."""
+        results = []
+        for vector_id, score in zip(vector_ids, scores):
+            if vector_id < 0:
+                continue
+            file_id, chunk_id = self.locate(int(vector_id))
+            chunk = dict(self.document_chunks(file_id)[chunk_id])
+            chunk['file_id'] = file_id
+            chunk['chunk_id'] = chunk_id
+            results.append((chunk, float(score)))
+        return results
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Build the corpus-wide FAISS index from the per-document indexes")
+    parser.add_argument("--documents", nargs="*", help="file_ids to include (default: every indexed document)")
+    parser.add_argument("--output", default=CORPUS_DIR, help="Output directory (default: pipeline/corpus_index)")
+    parser.add_argument("--index-type", choices=INDEX_TYPES, default="auto", help="FAISS index type (default: auto)")
+    parser.add_argument("--nlist", type=int, default=None, help="IVF lists (default: ~4*sqrt(n))")
+    parser.add_argument("--nprobe", type=int, default=None, help="IVF lists probed per query (default: nlist / 4, at least 8)")
+    args = parser.parse_args()
+
+    build_corpus_index(DOCUMENTS_DIR, args.output, file_ids=args.documents or None,
+                       index_type=args.index_type, nlist=args.nlist, nprobe=args.nprobe)
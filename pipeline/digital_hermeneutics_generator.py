@@ -9,8 +9,10 @@ import os
 import json
 from typing import Any, Dict
 
-from nanopub_generator_utils import generate_nanopub_trig
-from cidoc_generator_utils import generate_cidoc_trig
+from nanopub_generator_utils import build_nanopub_graph, slug, EX
+from cidoc_generator_utils import build_cidoc_graph
+from trig_writer import TrigStreamWriter, head_triples
+from tracing import traced
 
 
 def load_input_index(base_dir: str) -> Dict[str, Any]:
@@ -30,6 +32,41 @@ def load_relations(doc_dir: str) -> Dict[str, Any]:
     return {"work_schema_metadata": {"interpretation_layer": {"nodes": [], "relations": []}}}
 
 
+@traced
+def generate_document_trig(ddir: str, doc_id: str, entry: Dict[str, Any], fmt: str = "trig") -> str:
+    """Write the nanopub.trig (or nanopub.nq for fmt="nquads") for one document directory and return its path."""
+    relations_payload = load_relations(ddir)
+    # If interpretation.json exists, inject HiCO metadata for provenance
+    interp_path = os.path.join(ddir, "interpretation.json")
+    if os.path.exists(interp_path):
+        try:
+            with open(interp_path, "r", encoding="utf-8") as f:
+                interp_data = json.load(f)
+            hico_obj = interp_data.get("hico") if isinstance(interp_data, dict) else None
+            if isinstance(hico_obj, dict):
+                ws = relations_payload.setdefault("work_schema_metadata", {})
+                il = ws.setdefault("interpretation_layer", {})
+                il["hico"] = hico_obj
+        except Exception:
+            pass
+    # 1+2 nanopub first (pubInfo + provenance graphs)
+    nanopub_cg = build_nanopub_graph(doc_id, entry, relations_payload)
+    # 3+4 CIDOC (facts + assertion graphs)
+    cidoc_cg = build_cidoc_graph(relations_payload, entry, doc_id)
+    # Stream every named graph straight into a single file per document
+    gid = slug(doc_id)
+    out_trig = os.path.join(ddir, "nanopub.nq" if fmt == "nquads" else "nanopub.trig")
+    with open(out_trig, "w", encoding="utf-8") as f:
+        writer = TrigStreamWriter(f, fmt=fmt)
+        writer.write_prefixes()
+        writer.write_context(cidoc_cg, EX[f"facts_{gid}"])
+        writer.write_context(cidoc_cg, EX[f"assertion_{gid}"])
+        writer.write_context(nanopub_cg, EX[f"provenance_{gid}"])
+        writer.write_context(nanopub_cg, EX[f"pubInfo_{gid}"])
+        writer.write_graph(EX[f"head_{gid}"], head_triples(EX, gid))
+    return out_trig
+
+
 def main():
     base = os.path.dirname(__file__)
     docs = os.path.join(base, "documents")
@@ -42,70 +79,7 @@ def main():
         if not os.path.isdir(ddir):
             continue
         entry = index_by_id.get(doc_id, {})
-        relations_payload = load_relations(ddir)
-        # If interpretation.json exists, inject HiCO metadata for provenance
-        interp_path = os.path.join(ddir, "interpretation.json")
-        if os.path.exists(interp_path):
-            try:
-                with open(interp_path, "r", encoding="utf-8") as f:
-                    interp_data = json.load(f)
-                hico_obj = interp_data.get("hico") if isinstance(interp_data, dict) else None
-                if isinstance(hico_obj, dict):
-                    ws = relations_payload.setdefault("work_schema_metadata", {})
-                    il = ws.setdefault("interpretation_layer", {})
-                    il["hico"] = hico_obj
-            except Exception:
-                pass
-        # 1+2 nanopub first (as text blocks)
-        prov_block, pubinfo_block = generate_nanopub_trig(ddir, doc_id, entry, relations_payload)
-        # 3+4 CIDOC (as text blocks)
-        facts_graph, assertion_graph = generate_cidoc_trig(ddir, relations_payload, entry, doc_id)
-        # Compose single TRIG per document
-        out_trig = os.path.join(ddir, "nanopub.trig")
-        lines = [
-            "@prefix ex: <http://example.org/> .",
-            "@prefix np: <http://www.nanopub.org/nschema#> .",
-            "@prefix prov: <http://www.w3.org/ns/prov#> .",
-            "@prefix dcterms: <http://purl.org/dc/terms/> .",
-            "@prefix foaf: <http://xmlns.com/foaf/0.1/> .",
-            "@prefix fabio: <http://purl.org/spar/fabio/> .",
-            "@prefix frbr: <http://purl.org/vocab/frbr/core#> .",
-            "@prefix prism: <http://prismstandard.org/namespaces/basic/2.0/> .",
-            "@prefix crm: <http://www.cidoc-crm.org/cidoc-crm/> .",
-            "@prefix rdfs: <http://www.w3.org/2000/01/rdf-schema#> .",
-            "@prefix hico: <http://purl.org/emmedi/hico/> .",
-            "@prefix cwrc: <http://sparql.cwrc.ca/ontologies/cwrc#> .",
-            "@prefix xsd: <http://www.w3.org/2001/XMLSchema#> .",
-            "",
-            # facts and assertions
-            f"ex:facts_{doc_id} {{",
-        ]
-        if facts_graph:
-            lines.append(facts_graph)
-        lines.append("}")
-        lines.append("")
-        lines.append(f"ex:assertion_{doc_id} {{")
-        if assertion_graph:
-            lines.append(assertion_graph)
-        lines.append("}")
-        lines.append("")
-        # insert provenance and pubInfo blocks captured from rdflib
-        if prov_block:
-            lines.append(prov_block)
-            lines.append("")
-        if pubinfo_block:
-            lines.append(pubinfo_block)
-            lines.append("")
-        # Head graph
-        lines.append(f"ex:head_{doc_id} {{")
-        lines.append(f"    ex:pub_{doc_id} a np:Nanopublication ;")
-        lines.append(f"        np:hasAssertion ex:assertion_{doc_id} ;")
-        lines.append(f"        np:hasProvenance ex:provenance_{doc_id} ;")
-        lines.append(f"        np:hasPublicationInfo ex:pubInfo_{doc_id} .")
-        lines.append("}")
-
-        with open(out_trig, "w", encoding="utf-8") as f:
-            f.write("\n".join(lines))
+        out_trig = generate_document_trig(ddir, doc_id, entry)
         print(f"Wrote {out_trig}")
 
 
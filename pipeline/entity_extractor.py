@@ -9,6 +9,7 @@
 import json
 import os
 import glob
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import Dict, List, Any, Optional, Tuple
 import argparse
@@ -39,6 +40,10 @@ from dataclasses import dataclass, asdict
 from enum import Enum
 from openai import OpenAI
 
+from llm_cache import CacheMissError, cached_openai_client
+from api_clients import API_ERRORS
+from tracing import bind_context, document, traced
+
 @dataclass
 class ExtractedEntity:
     name: str
@@ -58,10 +63,19 @@ class FirstExtractor:
     """
     Extracts entities, locations, works, and dates from auto_document_qa.json
     using GPT-4o-mini with JSON schema for structured output.
+
+    max_concurrency is the number of threads extract_from_files() runs questions on. It does not
+    limit API requests: those are capped, retried and rate limited by the shared API client layer
+    (API_MAX_CONCURRENCY and API_RATE_LIMITS, see api_clients.py), which every stage shares.
     """
     
-    def __init__(self, api_key: str = None, input_metadata_file: str = None):
-        self.client = OpenAI(api_key=api_key or os.getenv("OPENAI_API_KEY"))
+    def __init__(self, api_key: str = None, input_metadata_file: str = None,
+                 max_concurrency: int = 8):
+        # Rate limiting and retries are handled by the shared API client layer (api_clients.py)
+        self.client = cached_openai_client(api_key=api_key or os.getenv("OPENAI_API_KEY"))
+        
+        # Threads for questions extracted in parallel (the request limit is the shared layer's)
+        self.max_concurrency = max(1, max_concurrency)
         
         # Use a default path that works on both Windows and Linux
         default_metadata_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "input.json")
@@ -275,8 +289,12 @@ Text to analyze:
             entity_types=", ".join(ENTITY_TYPES)
         )
 
+    @traced
     def extract_entities_from_text(self, text: str, question_id: int, document_id: str) -> List[ExtractedEntity]:
-        """Extract entities using GPT-4o-mini with structured JSON output."""
+        """Extract entities using GPT-4o-mini with structured JSON output.
+
+        API errors that persist after retries are raised, so a document is never saved with entities missing.
+        """
         try:
             formatted_prompt = self._format_extraction_prompt(document_id)
             
@@ -317,34 +335,71 @@ Text to analyze:
             
             return entities
             
+        except (CacheMissError, *API_ERRORS):
+            # Failed and replay-missed requests fail the document instead of saving no entities
+            raise
         except Exception as e:
             print(f"Error in LLM extraction: {e}")
             return []
 
-    def extract_from_all_questions(self, file_path: str) -> ExtractionResult:
-        """Extract entities from all questions (1, 2, 3) in the auto_document_qa.json file."""
-        data = self.load_document_qa(file_path)
-        document_id = self._get_document_id_from_path(file_path)
-        
-        all_entities = []
+    def _collect_source_answers(self, data: Dict[str, Any]) -> Dict[int, str]:
+        """Collect the answers to questions 1, 2 and 3 from a QA file."""
         source_answers = {}
-        processed_questions = []
-        
-        # Process questions 1, 2, and 3
         for section_name, section_data in data["sections"].items():
             for qa in section_data["questions_and_answers"]:
                 question_id = qa["question_id"]
                 if question_id in [1, 2, 3]:
-                    answer_text = qa["answer"]
-                    entities = self.extract_entities_from_text(answer_text, question_id, document_id)
-                    
-                    all_entities.extend(entities)
-                    source_answers[question_id] = answer_text
-                    processed_questions.append(question_id)
-        
-        if not processed_questions:
-            raise ValueError("No questions with IDs 1, 2, or 3 found in the document")
+                    source_answers[question_id] = qa["answer"]
+        return source_answers
+
+    def extract_from_files(self, file_paths: List[str]) -> Dict[str, Any]:
+        """Extract entities from several QA files, fanning out every (document, question) pair at once.
+
+        Returns a mapping file_path -> ExtractionResult, or the exception raised for that file.
+        """
+        outcomes: Dict[str, Any] = {}
+        pending = []
+        with ThreadPoolExecutor(max_workers=self.max_concurrency) as executor:
+            for file_path in file_paths:
+                try:
+                    data = self.load_document_qa(file_path)
+                    document_id = self._get_document_id_from_path(file_path)
+                    source_answers = self._collect_source_answers(data)
+                    if not source_answers:
+                        raise ValueError("No questions with IDs 1, 2, or 3 found in the document")
+                except Exception as e:
+                    outcomes[file_path] = e
+                    continue
+                with document(document_id):
+                    extract = bind_context(self.extract_entities_from_text)
+                futures = [
+                    executor.submit(extract, answer_text, question_id, document_id)
+                    for question_id, answer_text in source_answers.items()
+                ]
+                pending.append((file_path, data, source_answers, futures))
+            
+            for file_path, data, source_answers, futures in pending:
+                all_entities = []
+                try:
+                    for future in futures:
+                        all_entities.extend(future.result())
+                except Exception as e:
+                    outcomes[file_path] = e
+                    continue
+                outcomes[file_path] = self._build_extraction_result(file_path, data, source_answers, all_entities)
         
+        return {file_path: outcomes[file_path] for file_path in file_paths}
+
+    def extract_from_all_questions(self, file_path: str) -> ExtractionResult:
+        """Extract entities from all questions (1, 2, 3) in the auto_document_qa.json file."""
+        outcome = self.extract_from_files([file_path])[file_path]
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    def _build_extraction_result(self, file_path: str, data: Dict[str, Any], source_answers: Dict[int, str],
+                                 all_entities: List[ExtractedEntity]) -> ExtractionResult:
+        """Merge per-question entities of one document into an ExtractionResult."""
         # Remove duplicate entities (same name and type)
         unique_entities = self._deduplicate_entities(all_entities)
         
@@ -357,7 +412,7 @@ Text to analyze:
         
         return ExtractionResult(
             entities=unique_entities,
-            source_question_ids=sorted(processed_questions),
+            source_question_ids=sorted(source_answers.keys()),
             source_answers=source_answers,
             original_input_data=data,
             document_metadata=qa_document_metadata
@@ -429,35 +484,37 @@ def ensure_output_dir(output_dir: str) -> None:
     """Create output directory if it doesn't exist."""
     os.makedirs(output_dir, exist_ok=True)
 
+def save_and_report(extractor: FirstExtractor, result: ExtractionResult, input_file: str, output_file: str) -> None:
+    """Save an extraction result and print a short summary."""
+    # Ensure output directory exists
+    output_dir = os.path.dirname(output_file)
+    ensure_output_dir(output_dir)
+    
+    # Debug output for document_metadata
+    if result.document_metadata:
+        print(f"Document metadata found: {list(result.document_metadata.keys())}")
+    else:
+        print(f"Warning: No document metadata found in {input_file}")
+        
+    extractor.save_extraction_result(result, output_file)
+    
+    print(f"Successfully extracted {len(result.entities)} entities from questions {result.source_question_ids}")
+    print(f"Results saved to: {output_file}")
+    
+    # Print summary
+    entity_types = {}
+    for entity in result.entities:
+        entity_types[entity.type] = entity_types.get(entity.type, 0) + 1
+    
+    print("\nEntity types found:")
+    for etype, count in entity_types.items():
+        print(f"  {etype}: {count}")
+
 def process_single_file(extractor: FirstExtractor, input_file: str, output_file: str) -> None:
     """Process a single QA file and save the results."""
     try:
-        # Ensure output directory exists
-        output_dir = os.path.dirname(output_file)
-        ensure_output_dir(output_dir)
-        
         result = extractor.extract_from_all_questions(input_file)
-        
-        # Debug output for document_metadata
-        if result.document_metadata:
-            print(f"Document metadata found: {list(result.document_metadata.keys())}")
-        else:
-            print(f"Warning: No document metadata found in {input_file}")
-            
-        extractor.save_extraction_result(result, output_file)
-        
-        print(f"Successfully extracted {len(result.entities)} entities from questions {result.source_question_ids}")
-        print(f"Results saved to: {output_file}")
-        
-        # Print summary
-        entity_types = {}
-        for entity in result.entities:
-            entity_types[entity.type] = entity_types.get(entity.type, 0) + 1
-        
-        print("\nEntity types found:")
-        for etype, count in entity_types.items():
-            print(f"  {etype}: {count}")
-            
+        save_and_report(extractor, result, input_file, output_file)
     except Exception as e:
         print(f"Error processing {input_file}: {e}")
 
@@ -471,18 +528,26 @@ def process_all_files(extractor: FirstExtractor, input_dir: str, output_base_dir
     
     print(f"Found {len(qa_files)} QA files to process")
     
+    # Extract every (document, question) pair concurrently, then save per document
+    outcomes = extractor.extract_from_files([file_path for _, file_path in qa_files])
+    
     for document_name, file_path in qa_files:
         print(f"\nProcessing {document_name} from {file_path}")
         
         # Create output directory for this document in the documents folder
         output_dir = os.path.join("documents", document_name)
-        ensure_output_dir(output_dir)
         
         # Set output file path
         output_file = os.path.join(output_dir, "entities.json")
         
-        # Process the file
-        process_single_file(extractor, file_path, output_file)
+        outcome = outcomes[file_path]
+        if isinstance(outcome, Exception):
+            print(f"Error processing {file_path}: {outcome}")
+            continue
+        try:
+            save_and_report(extractor, outcome, file_path, output_file)
+        except Exception as e:
+            print(f"Error processing {file_path}: {e}")
 
 def main():
     """Main function to run the entity extractor."""
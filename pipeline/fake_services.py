@@ -0,0 +1,367 @@
+# Local stand-ins for the OpenAI, Voyage and Mistral OCR services
+# Used by benchmark_pipeline.py to run the whole pipeline offline. Each service has a configurable
+# latency per call (plus per 1k tokens) and counts its calls, so the pipeline's own overhead can be
+# measured independently of provider latency.
+#
+# - FakeAsyncOpenAI: chat.completions.create. Serves recorded responses from an LLM cache file
+#   (llm_cache.sqlite) when the request was recorded, otherwise synthesises a response: plain text,
+#   or a JSON instance of the request's json_schema response_format.
+# - FakeAsyncVoyage: contextualized_embed (deterministic hash vectors) and rerank (token overlap).
+# - FakeBatchOpenAI: the Batch API subset used by batch_runner.py (files.create / files.content,
+#   batches.create / retrieve / cancel); batch requests are answered by a FakeAsyncOpenAI.
+# - FakeOCRBackend: ocr_mistral backend that returns the pages of a known markdown text.
+
+import asyncio
+import hashlib
+import json
+import re
+import threading
+import time
+from collections import Counter
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from llm_cache import SQLiteResponseCache, request_cache_key
+
+
+class ServiceLatency:
+    """Simulated latency: `base` seconds per call plus `per_1k_tokens` seconds per 1000 tokens."""
+
+    def __init__(self, base: float = 0.0, per_1k_tokens: float = 0.0):
+        self.base = base
+        self.per_1k_tokens = per_1k_tokens
+
+    def seconds(self, tokens: int = 0) -> float:
+        return self.base + self.per_1k_tokens * tokens / 1000.0
+
+
+class CallCounter:
+    """Thread-safe call counts per service endpoint."""
+
+    def __init__(self):
+        self.counts: Counter = Counter()
+        self._lock = threading.Lock()
+
+    def add(self, name: str) -> None:
+        with self._lock:
+            self.counts[name] += 1
+
+    def snapshot(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self.counts)
+
+
+def _tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+def instance_from_schema(schema: Dict[str, Any], seed_words: Sequence[str], items_per_array: int = 3) -> Any:
+    """A deterministic JSON value matching a (simple) JSON schema.
+
+    Strings are built from seed_words; string properties named "*_id" reuse previously generated "id" values,
+    so generated relations point at generated nodes.
+    """
+    ids: List[str] = []
+    counter = [0]
+
+    def word() -> str:
+        counter[0] += 1
+        return seed_words[counter[0] % len(seed_words)] if seed_words else f"item{counter[0]}"
+
+    def build(node: Dict[str, Any], name: str = "") -> Any:
+        if "enum" in node:
+            counter[0] += 1
+            return node["enum"][counter[0] % len(node["enum"])]
+        kind = node.get("type", "string")
+        if isinstance(kind, list):
+            kind = next((k for k in kind if k != "null"), "string")
+        if kind == "object":
+            return {key: build(sub, key) for key, sub in (node.get("properties") or {}).items()}
+        if kind == "array":
+            n = min(max(items_per_array, node.get("minItems", 0)), node.get("maxItems", items_per_array))
+            items = [build(node.get("items") or {}, name) for _ in range(n)]
+            if node.get("uniqueItems"):
+                items = list(dict.fromkeys(items)) if all(isinstance(i, str) for i in items) else items
+            return items
+        if kind in ("number", "integer"):
+            low = node.get("minimum", 0.0)
+            high = node.get("maximum", 1.0)
+            value = low + (high - low) * 0.8
+            return int(value) if kind == "integer" else round(value, 2)
+        if kind == "boolean":
+            return True
+        if name == "id":
+            ids.append(f"n{len(ids) + 1}")
+            return ids[-1]
+        if name.endswith("_id") and ids:
+            counter[0] += 1
+            return ids[counter[0] % len(ids)]
+        return f"{word().capitalize()} {word()}"
+
+    return build(schema)
+
+
+class _FakeCompletions:
+    def __init__(self, owner: "FakeAsyncOpenAI"):
+        self._owner = owner
+
+    async def create(self, **kwargs):
+        return await self._owner.create_chat_completion(**kwargs)
+
+
+class FakeAsyncOpenAI:
+    """AsyncOpenAI stand-in for chat.completions.create."""
+
+    def __init__(self, latency: Optional[ServiceLatency] = None, recordings: Optional[str] = None,
+                 counter: Optional[CallCounter] = None, items_per_array: int = 3):
+        self.latency = latency or ServiceLatency()
+        self.recordings = SQLiteResponseCache(recordings) if recordings else None
+        self.counter = counter or CallCounter()
+        self.items_per_array = items_per_array
+        self.chat = SimpleNamespace(completions=_FakeCompletions(self))
+
+    async def create_chat_completion(self, **kwargs):
+        from openai.types.chat import ChatCompletion
+
+        self.counter.add("openai.chat")
+        prompt = "\n".join(str(m.get("content") or "") for m in kwargs.get("messages", []))
+        recorded = self.recordings.get(request_cache_key(kwargs)) if self.recordings else None
+        if recorded is not None:
+            self.counter.add("openai.chat.recorded")
+            response = ChatCompletion.model_validate(recorded)
+            completion_tokens = response.usage.completion_tokens if response.usage else 0
+        else:
+            content = self._synthesise(kwargs, prompt)
+            completion_tokens = _tokens(content)
+            response = ChatCompletion.model_validate({
+                "id": "chatcmpl-fake",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": kwargs.get("model", "fake"),
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": content}}],
+                "usage": {"prompt_tokens": _tokens(prompt), "completion_tokens": completion_tokens,
+                          "total_tokens": _tokens(prompt) + completion_tokens},
+            })
+        await asyncio.sleep(self.latency.seconds(_tokens(prompt) + completion_tokens))
+        return response
+
+    def _synthesise(self, kwargs: Dict[str, Any], prompt: str) -> str:
+        import json
+
+        # Capitalised words of the last user message make plausible entity names
+        last_user = next((str(m.get("content") or "") for m in reversed(kwargs.get("messages", []))
+                          if m.get("role") == "user"), prompt)
+        words = list(dict.fromkeys(re.findall(r"\b[A-Z][a-z]{3,}\b", last_user))) or ["Reynaert", "Isengrim"]
+        response_format = kwargs.get("response_format") or {}
+        if response_format.get("type") == "json_schema":
+            schema = response_format["json_schema"].get("schema", {})
+            return json.dumps(instance_from_schema(schema, words, self.items_per_array))
+        return " ".join(words[:40]) + "."
+
+
+class FakeAsyncVoyage:
+    """voyageai.AsyncClient stand-in for contextualized_embed and rerank."""
+
+    def __init__(self, latency: Optional[ServiceLatency] = None, counter: Optional[CallCounter] = None):
+        self.latency = latency or ServiceLatency()
+        self.counter = counter or CallCounter()
+
+    @staticmethod
+    def vector(text: str, dimension: int) -> List[float]:
+        seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+        v = np.random.default_rng(seed).standard_normal(dimension).astype("float32")
+        return (v / np.linalg.norm(v)).tolist()
+
+    async def contextualized_embed(self, inputs, model: str, input_type: Optional[str] = None,
+                                   output_dimension: Optional[int] = None, **kwargs):
+        self.counter.add("voyage.contextualized_embed")
+        dimension = output_dimension or 1024
+        documents = [doc if isinstance(doc, list) else [doc] for doc in inputs]
+        tokens = sum(_tokens(text) for doc in documents for text in doc)
+        await asyncio.sleep(self.latency.seconds(tokens))
+        return SimpleNamespace(
+            results=[SimpleNamespace(index=i, embeddings=[self.vector(text, dimension) for text in doc])
+                     for i, doc in enumerate(documents)],
+            total_tokens=tokens,
+        )
+
+    async def rerank(self, query: str, documents: List[str], model: str, top_k: Optional[int] = None, **kwargs):
+        self.counter.add("voyage.rerank")
+        query_words = set(re.findall(r"\w+", query.lower()))
+        scores = []
+        for doc in documents:
+            doc_words = set(re.findall(r"\w+", doc.lower()))
+            scores.append(len(query_words & doc_words) / (len(query_words) or 1))
+        tokens = _tokens(query) * len(documents) + sum(_tokens(doc) for doc in documents)
+        await asyncio.sleep(self.latency.seconds(tokens))
+        order = sorted(range(len(documents)), key=lambda i: -scores[i])[:top_k or len(documents)]
+        return SimpleNamespace(
+            results=[SimpleNamespace(index=i, relevance_score=scores[i], document=documents[i]) for i in order],
+            total_tokens=tokens,
+        )
+
+
+def split_pages(text: str, page_chars: int = 3000) -> List[str]:
+    """Split markdown into pages of about page_chars characters at paragraph boundaries."""
+    pages: List[str] = []
+    current = ""
+    for paragraph in text.split("\n\n"):
+        if current and len(current) + len(paragraph) > page_chars:
+            pages.append(current)
+            current = paragraph
+        else:
+            current = f"{current}\n\n{paragraph}" if current else paragraph
+    if current:
+        pages.append(current)
+    return pages
+
+
+def write_stub_pdf(path: str, page_count: int) -> None:
+    """A placeholder file whose page objects ocr_mistral.count_pdf_pages can count."""
+    with open(path, "wb") as f:
+        f.write(b"%PDF-1.4\n")
+        for i in range(page_count):
+            f.write(b"%d 0 obj << /Type /Page >> endobj\n" % (i + 3))
+
+
+class FakeOCRBackend:
+    """ocr_mistral backend returning the pages registered for a PDF (by file name without extension)."""
+
+    def __init__(self, pages: Dict[str, List[str]], latency: Optional[ServiceLatency] = None,
+                 counter: Optional[CallCounter] = None):
+        self.pages = pages
+        self.latency = latency or ServiceLatency()
+        self.counter = counter or CallCounter()
+
+    def open(self, pdf_path: str) -> Dict[str, Any]:
+        self.counter.add("mistral.files.upload")
+        import os
+        return {"name": os.path.splitext(os.path.basename(pdf_path))[0]}
+
+    def ocr_pages(self, document: Dict[str, Any], pages: List[int]) -> List[Tuple[int, str]]:
+        self.counter.add("mistral.ocr")
+        known = self.pages[document["name"]]
+        results = [(page, known[page]) for page in pages if page < len(known)]
+        time.sleep(self.latency.seconds(sum(_tokens(text) for _, text in results)))
+        return results
+
+
+class _FakeFiles:
+    def __init__(self, owner: "FakeBatchOpenAI"):
+        self._owner = owner
+
+    def create(self, file, purpose: str):
+        data = file.read() if hasattr(file, "read") else open(file, "rb").read()
+        return self._owner.add_file(data, purpose)
+
+    def content(self, file_id: str):
+        self._owner.counter.add("openai.files.content")
+        data = self._owner.stored_files[file_id]
+        return SimpleNamespace(content=data, text=data.decode("utf-8"), read=lambda: data)
+
+
+class _FakeBatches:
+    def __init__(self, owner: "FakeBatchOpenAI"):
+        self._owner = owner
+
+    def create(self, input_file_id: str, endpoint: str, completion_window: str, metadata: Optional[Dict[str, str]] = None):
+        return self._owner.create_batch(input_file_id, endpoint, completion_window, metadata)
+
+    def retrieve(self, batch_id: str):
+        return self._owner.poll_batch(batch_id)
+
+    def cancel(self, batch_id: str):
+        self._owner.counter.add("openai.batches.cancel")
+        with self._owner.lock:
+            self._owner.stored_batches[batch_id]["status"] = "cancelled"
+        return self._owner.batch_object(batch_id)
+
+
+class FakeBatchOpenAI:
+    """OpenAI client stand-in for the Batch API on /v1/chat/completions.
+
+    A batch reports in_progress for `polls_to_complete` retrieve calls; the next retrieve answers every request
+    with `chat` (recorded or synthesised responses) and completes it. With fail_every=n, every n-th request
+    gets a line in the error file instead of a response.
+    """
+
+    def __init__(self, chat: Optional[FakeAsyncOpenAI] = None, polls_to_complete: int = 1, fail_every: int = 0,
+                 counter: Optional[CallCounter] = None):
+        self.counter = counter or CallCounter()
+        self.chat_backend = chat or FakeAsyncOpenAI(counter=self.counter)
+        self.polls_to_complete = polls_to_complete
+        self.fail_every = fail_every
+        self.stored_files: Dict[str, bytes] = {}
+        self.stored_batches: Dict[str, Dict[str, Any]] = {}
+        self.lock = threading.Lock()
+        self.files = _FakeFiles(self)
+        self.batches = _FakeBatches(self)
+
+    def add_file(self, data: bytes, purpose: str):
+        self.counter.add("openai.files.create")
+        with self.lock:
+            file_id = f"file-fake{len(self.stored_files) + 1}"
+            self.stored_files[file_id] = data
+        return SimpleNamespace(id=file_id, bytes=len(data), purpose=purpose, object="file")
+
+    def create_batch(self, input_file_id: str, endpoint: str, completion_window: str,
+                     metadata: Optional[Dict[str, str]] = None):
+        self.counter.add("openai.batches.create")
+        lines = [line for line in self.stored_files[input_file_id].decode("utf-8").splitlines() if line.strip()]
+        with self.lock:
+            batch_id = f"batch_fake{len(self.stored_batches) + 1}"
+            self.stored_batches[batch_id] = {
+                "id": batch_id, "object": "batch", "endpoint": endpoint, "input_file_id": input_file_id,
+                "completion_window": completion_window, "created_at": int(time.time()), "status": "validating",
+                "metadata": metadata or {}, "polls": 0,
+                "request_counts": {"total": len(lines), "completed": 0, "failed": 0},
+            }
+        return self.batch_object(batch_id)
+
+    def poll_batch(self, batch_id: str):
+        self.counter.add("openai.batches.retrieve")
+        with self.lock:
+            batch = self.stored_batches[batch_id]
+            if batch["status"] in ("validating", "in_progress"):
+                batch["polls"] += 1
+                batch["status"] = "in_progress" if batch["polls"] <= self.polls_to_complete else "finalizing"
+        if batch["status"] == "finalizing":
+            self._complete(batch)
+        return self.batch_object(batch_id)
+
+    def batch_object(self, batch_id: str):
+        from openai.types import Batch
+
+        batch = self.stored_batches[batch_id]
+        return Batch.model_validate({key: value for key, value in batch.items() if key != "polls"})
+
+    def _complete(self, batch: Dict[str, Any]) -> None:
+        lines = [json.loads(line) for line in self.stored_files[batch["input_file_id"]].decode("utf-8").splitlines()
+                 if line.strip()]
+
+        async def answer_all():
+            return await asyncio.gather(*(self.chat_backend.create_chat_completion(**line["body"]) for line in lines))
+
+        responses = asyncio.run(answer_all())
+        output, errors = [], []
+        for i, (line, response) in enumerate(zip(lines, responses), start=1):
+            if self.fail_every and i % self.fail_every == 0:
+                errors.append({"id": f"batch_req_{i}", "custom_id": line["custom_id"], "response": None,
+                               "error": {"code": "server_error", "message": "Simulated batch request failure"}})
+                continue
+            output.append({"id": f"batch_req_{i}", "custom_id": line["custom_id"], "error": None,
+                           "response": {"status_code": 200, "request_id": f"req_{i}",
+                                        "body": response.model_dump(mode="json")}})
+        with self.lock:
+            for key, records in (("output_file_id", output), ("error_file_id", errors)):
+                if records:
+                    data = "".join(json.dumps(r, ensure_ascii=False) + "\n" for r in records).encode("utf-8")
+                    file_id = f"file-fake{len(self.stored_files) + 1}"
+                    self.stored_files[file_id] = data
+                    batch[key] = file_id
+            batch["request_counts"] = {"total": len(lines), "completed": len(output), "failed": len(errors)}
+            batch["status"] = "completed"
+            batch["completed_at"] = int(time.time())
@@ -1,39 +1,182 @@
+import json
+import math
+import os
+
 import faiss
 import numpy as np
-from typing import Optional
+from typing import Any, Dict, Optional
+
+
+# Index types built by create_hybrid_index; all use inner product on L2-normalised vectors (cosine)
+INDEX_TYPES = ("auto", "flat", "ivf", "hnsw", "ivfpq")
+
+# Collections up to this size get an exact Flat index with index_type="auto"
+FLAT_MAX_VECTORS = 1000
+
+# Search settings restored by load_index, stored next to the index as <index_path>.params.json
+PARAMS_SUFFIX = ".params.json"
+
+
+def normalize_embeddings(embeddings: np.ndarray) -> np.ndarray:
+    """Float32 copy of embeddings scaled to unit length, so inner product equals cosine similarity."""
+    vectors = np.array(embeddings, dtype='float32', copy=True)
+    if vectors.ndim == 1:
+        vectors = vectors[np.newaxis, :]
+    faiss.normalize_L2(vectors)
+    return vectors
+
 
+def default_nlist(n_vectors: int) -> int:
+    """Number of IVF lists: ~4*sqrt(n), with at least 39 training points per centroid."""
+    return max(1, min(int(4 * math.sqrt(n_vectors)), n_vectors // 39))
 
-def create_hybrid_index(embeddings: np.ndarray) -> faiss.Index:
-    """Create an optimized FAISS index for similarity search.
 
-    - Uses IVF for large collections, FlatIP for smaller ones.
-    - Assumes Voyage embeddings are normalized; Inner Product is appropriate.
+def create_hybrid_index(embeddings: np.ndarray, index_type: str = "auto",
+                        nlist: Optional[int] = None, nprobe: Optional[int] = None,
+                        hnsw_m: int = 32, ef_construction: int = 200, ef_search: int = 128,
+                        pq_m: int = 64, pq_bits: int = 8) -> faiss.Index:
+    """Create a FAISS index with cosine-similarity semantics.
+
+    - index_type "auto": Flat for up to FLAT_MAX_VECTORS vectors, IVF above.
+    - "flat": exact inner-product search.
+    - "ivf": IVF with inner-product quantizer; nprobe defaults to nlist / 4 (min 8).
+    - "hnsw": HNSW graph (M=hnsw_m), efSearch=ef_search.
+    - "ivfpq": IVF with product quantisation (pq_m sub-quantizers of pq_bits) for large corpora.
+    Embeddings are L2-normalised, so every type returns cosine similarities (higher is better).
     """
     if embeddings is None or len(embeddings) == 0:
         raise ValueError("Embeddings are empty; cannot create index")
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"Unknown index type '{index_type}'; expected one of {INDEX_TYPES}")
 
-    dim = embeddings.shape[1]
+    vectors = normalize_embeddings(embeddings)
+    n, dim = vectors.shape
 
-    if len(embeddings) > 1000:
-        nlist = min(100, len(embeddings) // 10)
-        index = faiss.IndexIVFFlat(
-            faiss.IndexFlatL2(dim), dim, nlist
-        )
-        index.train(embeddings)
-    else:
+    if index_type == "auto":
+        index_type = "flat" if n <= FLAT_MAX_VECTORS else "ivf"
+
+    if index_type == "flat":
         index = faiss.IndexFlatIP(dim)
+    elif index_type == "hnsw":
+        index = faiss.IndexHNSWFlat(dim, hnsw_m, faiss.METRIC_INNER_PRODUCT)
+        index.hnsw.efConstruction = ef_construction
+        index.hnsw.efSearch = ef_search
+    else:
+        nlist = nlist or default_nlist(n)
+        quantizer = faiss.IndexFlatIP(dim)
+        if index_type == "ivf":
+            index = faiss.IndexIVFFlat(quantizer, dim, nlist, faiss.METRIC_INNER_PRODUCT)
+        else:
+            if dim % pq_m:
+                raise ValueError(f"pq_m={pq_m} must divide the embedding dimension {dim}")
+            if n < 2 ** pq_bits:
+                raise ValueError(f"IVF-PQ needs at least {2 ** pq_bits} vectors to train, got {n}")
+            index = faiss.IndexIVFPQ(quantizer, dim, nlist, pq_m, pq_bits, faiss.METRIC_INNER_PRODUCT)
+        index.train(vectors)
+        index.nprobe = min(nlist, nprobe or max(8, nlist // 4))
 
-    index.add(embeddings)
+    index.add(vectors)
     return index
 
 
+def index_params(index: faiss.Index) -> Dict[str, Any]:
+    """Describe an index and its search settings (what load_index restores)."""
+    params: Dict[str, Any] = {
+        "metric": "ip" if index.metric_type == faiss.METRIC_INNER_PRODUCT else "l2",
+        "dimension": index.d,
+        "ntotal": index.ntotal,
+        "normalized": index.metric_type == faiss.METRIC_INNER_PRODUCT,
+    }
+    try:
+        ivf = faiss.extract_index_ivf(index)
+    except RuntimeError:
+        ivf = None
+    if ivf is not None:
+        ivf = faiss.downcast_index(ivf)
+        params["index_type"] = "ivfpq" if isinstance(ivf, faiss.IndexIVFPQ) else "ivf"
+        params["nlist"] = ivf.nlist
+        params["nprobe"] = ivf.nprobe
+        if isinstance(ivf, faiss.IndexIVFPQ):
+            params["pq_m"] = ivf.pq.M
+            params["pq_bits"] = ivf.pq.nbits
+    elif hasattr(index, "hnsw"):
+        params["index_type"] = "hnsw"
+        params["ef_search"] = index.hnsw.efSearch
+    else:
+        params["index_type"] = "flat"
+    return params
+
+
+def apply_search_params(index: faiss.Index, params: Dict[str, Any]) -> None:
+    """Restore search-time settings (nprobe / efSearch) on a loaded index."""
+    if params.get("nprobe"):
+        faiss.extract_index_ivf(index).nprobe = int(params["nprobe"])
+    if params.get("ef_search") and hasattr(index, "hnsw"):
+        index.hnsw.efSearch = int(params["ef_search"])
+
+
+def similarity_scores(index: faiss.Index, distances: np.ndarray) -> np.ndarray:
+    """Convert search results to cosine similarities.
+
+    Inner-product indexes already return them; legacy L2 indexes (squared distances
+    between normalised vectors) are mapped with cos = 1 - d / 2.
+    """
+    distances = np.asarray(distances, dtype='float32')
+    if index.metric_type == faiss.METRIC_INNER_PRODUCT:
+        return distances
+    return 1.0 - distances / 2.0
+
+
 def save_index(index: faiss.Index, path: str) -> None:
-    """Save the FAISS index to disk."""
+    """Save the FAISS index to disk, with its parameters in <path>.params.json."""
     if index is None:
         raise ValueError("Index is None; nothing to save")
     faiss.write_index(index, path)
+    with open(path + PARAMS_SUFFIX, 'w', encoding='utf-8') as f:
+        json.dump(index_params(index), f, indent=2)
+
+
+def _mmap_flags(index_type: Optional[str]) -> int:
+    """faiss.read_index flags that map an index of this type from disk instead of copying it into RAM."""
+    if index_type in ("ivf", "ivfpq"):
+        # Inverted lists become read-only views of the file
+        return faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY
+    # Flat / HNSW: map the stored vectors (IO_FLAG_MMAP_IFC, faiss >= 1.9)
+    return getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP)
+
+
+def load_index(index_path: str, mmap: bool = False) -> faiss.Index:
+    """Load a FAISS index from disk and restore its saved search settings.
+
+    With mmap=True the index data stays on disk and is paged in on demand; such an index is
+    read-only (search only, no add/train). Falls back to a normal load if mapping is unsupported.
+    """
+    params = {}
+    params_path = index_path + PARAMS_SUFFIX
+    if os.path.exists(params_path):
+        with open(params_path, 'r', encoding='utf-8') as f:
+            params = json.load(f)
+    index = None
+    if mmap:
+        try:
+            index = faiss.read_index(index_path, _mmap_flags(params.get("index_type")))
+        except RuntimeError as e:
+            print(f"Warning: Could not memory-map {index_path}, loading into RAM: {e}")
+    if index is None:
+        index = faiss.read_index(index_path)
+    apply_search_params(index, params)
+    return index
 
 
-def load_index(index_path: str) -> faiss.Index:
-    """Load a FAISS index from disk and return it."""
-    return faiss.read_index(index_path)
+def index_vectors(index: faiss.Index) -> np.ndarray:
+    """Return all vectors stored in an index (in id order), e.g. to merge per-document indexes."""
+    if index.ntotal == 0:
+        return np.zeros((0, index.d), dtype='float32')
+    try:
+        ivf = faiss.extract_index_ivf(index)
+    except RuntimeError:
+        ivf = None
+    if ivf is not None:
+        # IVF indexes need a direct map before vectors can be reconstructed
+        ivf.make_direct_map()
+    return index.reconstruct_n(0, index.ntotal).astype('float32')
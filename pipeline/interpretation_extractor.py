@@ -5,6 +5,9 @@ from dataclasses import dataclass, asdict
 
 from openai import OpenAI
 
+from llm_cache import cached_openai_client
+from tracing import traced
+
 # Controlled vocabularies provided by user
 ALLOWED_INTERPRETATION_TYPES = [
     "philological_interpretation",
@@ -79,7 +82,7 @@ class InterpretationResult:
 
 class InterpretationExtractor:
     def __init__(self, api_key: str = None):
-        self.client = OpenAI(api_key=api_key or os.getenv("OPENAI_API_KEY"))
+        self.client = cached_openai_client(api_key=api_key or os.getenv("OPENAI_API_KEY"))
 
     def _format_qa(self, qa_path: str) -> str:
         if not qa_path or not os.path.exists(qa_path):
@@ -187,8 +190,10 @@ Task:
 Return only a compact JSON with fields: interpretation_type (string), interpretation_criteria (array of strings), certainty (string), evidence_summary (string), notes (string, optional). Base your answer strictly on the context above.
 """.strip()
 
-    def extract(self, entities_path: str, relations_path: str, document_metadata_path: str, qa_path: Optional[str], summaries_path: Optional[str] = None) -> InterpretationResult:
-        metadata = self._load_json(document_metadata_path)
+    @traced
+    def extract(self, entities_path: str, relations_path: str, document_metadata_path: str, qa_path: Optional[str], summaries_path: Optional[str] = None, document_metadata: Optional[Dict[str, Any]] = None) -> InterpretationResult:
+        # An in-memory metadata dict (e.g. the input.json entry) takes precedence over the file
+        metadata = document_metadata if document_metadata is not None else self._load_json(document_metadata_path)
         qa_text = self._format_qa(qa_path) if qa_path else "No Q&A available."
         summaries_text = self._format_summaries(summaries_path) if summaries_path else "No summaries available."
         prompt = self._build_prompt(metadata, qa_text, summaries_text)
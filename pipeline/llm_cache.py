@@ -0,0 +1,220 @@
+# Persistent cache for OpenAI chat completions shared by all pipeline stages.
+# Responses are keyed on the full request (model, messages, response_format/tools,
+# temperature, ...) and stored in SQLite with size-based LRU eviction.
+#
+# Modes (LLM_CACHE_MODE env var or the `mode` argument):
+# - "readwrite": serve hits from the cache, call the API on misses and store the result
+# - "replay":    read-only; misses raise CacheMissError and the API is never called
+# - "off":       no caching, calls go straight to the API
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Any, Callable, Dict, Optional
+
+BASE_DIR = os.path.abspath(os.path.dirname(__file__))
+DEFAULT_CACHE_PATH = os.path.join(BASE_DIR, "llm_cache.sqlite")
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+CACHE_MODES = ("readwrite", "replay", "off")
+
+
+class CacheMissError(RuntimeError):
+    """Raised in replay mode when a request has no recorded response."""
+
+
+def request_cache_key(request: Dict[str, Any]) -> str:
+    """Stable hash of a chat.completions.create request."""
+    payload = json.dumps(request, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseCache(ABC):
+    """Interface for response cache backends."""
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        ...
+
+    @abstractmethod
+    def put(self, key: str, model: str, response: Dict[str, Any]) -> None:
+        ...
+
+
+class SQLiteResponseCache(ResponseCache):
+    """SQLite-backed response cache evicting least recently used entries above max_bytes."""
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                model TEXT,
+                response TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )"""
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_last_access ON responses(last_access)")
+        self._conn.commit()
+        # Running size of all responses, so a put does not have to sum the table
+        self._total_bytes = self._stored_bytes()
+
+    def _stored_bytes(self) -> int:
+        return self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute("SELECT response FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            self._conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (time.time(), key))
+            self._conn.commit()
+        return json.loads(row[0])
+
+    def put(self, key: str, model: str, response: Dict[str, Any]) -> None:
+        data = json.dumps(response, ensure_ascii=False)
+        size = len(data.encode("utf-8"))
+        now = time.time()
+        with self._lock:
+            replaced = self._conn.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, model, response, size, created_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, model, data, size, now, now),
+            )
+            self._total_bytes += size - (replaced[0] if replaced else 0)
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+            self._conn.commit()
+
+    def _evict(self, batch: int = 256) -> None:
+        # Other processes may share the file: recount before deleting anything (only when over the limit)
+        self._total_bytes = self._stored_bytes()
+        while self._total_bytes > self.max_bytes:
+            rows = self._conn.execute(
+                "SELECT key, size FROM responses ORDER BY last_access ASC LIMIT ?", (batch,)).fetchall()
+            if not rows:
+                break
+            for key, size in rows:
+                if self._total_bytes <= self.max_bytes:
+                    break
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._total_bytes -= size
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+def _response_to_dict(response: Any) -> Dict[str, Any]:
+    if hasattr(response, "model_dump"):
+        return response.model_dump(mode="json")
+    if hasattr(response, "to_dict"):
+        return response.to_dict()
+    return json.loads(json.dumps(response, default=lambda o: getattr(o, "__dict__", str(o))))
+
+
+def _response_from_dict(data: Dict[str, Any]) -> Any:
+    from openai.types.chat import ChatCompletion
+    return ChatCompletion.model_validate(data)
+
+
+class _CachedCompletions:
+    def __init__(self, owner: "CachedOpenAIClient"):
+        self._owner = owner
+
+    def create(self, **kwargs):
+        return self._owner.create_chat_completion(**kwargs)
+
+
+class _CachedChat:
+    def __init__(self, owner: "CachedOpenAIClient"):
+        self.completions = _CachedCompletions(owner)
+
+
+class CachedOpenAIClient:
+    """Drop-in stand-in for an OpenAI client whose chat.completions.create goes through a cache.
+
+    The real client is only built on the first cache miss, so replay mode works without an API key.
+    Other attributes are forwarded to the underlying client.
+    """
+
+    def __init__(self, client_factory: Callable[[], Any], cache: Optional[ResponseCache] = None, mode: str = "readwrite"):
+        if mode not in CACHE_MODES:
+            raise ValueError(f"Unknown LLM cache mode '{mode}'; expected one of {CACHE_MODES}")
+        self._client_factory = client_factory
+        self._client = None
+        self._client_lock = threading.Lock()
+        self.cache = cache
+        self.mode = mode
+        self.chat = _CachedChat(self)
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def client(self):
+        with self._client_lock:
+            if self._client is None:
+                self._client = self._client_factory()
+        return self._client
+
+    def create_chat_completion(self, **kwargs):
+        if self.mode == "off" or self.cache is None:
+            return self.client.chat.completions.create(**kwargs)
+        key = request_cache_key(kwargs)
+        cached = self.cache.get(key)
+        if cached is not None:
+            self.hits += 1
+            return _response_from_dict(cached)
+        self.misses += 1
+        if self.mode == "replay":
+            raise CacheMissError(f"No recorded response for {kwargs.get('model')} request {key[:12]}")
+        response = self.client.chat.completions.create(**kwargs)
+        self.cache.put(key, kwargs.get("model", ""), _response_to_dict(response))
+        return response
+
+    def __getattr__(self, name):
+        return getattr(self.client, name)
+
+
+_shared_caches: Dict[str, SQLiteResponseCache] = {}
+_shared_lock = threading.Lock()
+
+
+def get_shared_cache(path: Optional[str] = None, max_bytes: Optional[int] = None) -> SQLiteResponseCache:
+    """Return the process-wide cache for a path (one SQLite connection per file)."""
+    path = os.path.abspath(path or os.getenv("LLM_CACHE_PATH") or DEFAULT_CACHE_PATH)
+    if max_bytes is None:
+        max_bytes = int(os.getenv("LLM_CACHE_MAX_BYTES") or DEFAULT_MAX_BYTES)
+    with _shared_lock:
+        if path not in _shared_caches:
+            _shared_caches[path] = SQLiteResponseCache(path, max_bytes=max_bytes)
+        return _shared_caches[path]
+
+
+def cached_openai_client(api_key: Optional[str] = None, mode: Optional[str] = None,
+                         cache_path: Optional[str] = None) -> Any:
+    """Build an OpenAI client wrapped with the shared response cache.
+
+    Mode and location default to the LLM_CACHE_MODE / LLM_CACHE_PATH environment variables.
+    """
+    mode = (mode or os.getenv("LLM_CACHE_MODE") or "readwrite").lower()
+
+    def factory():
+        # Shared rate limiter and retry policy for every stage
+        from api_clients import openai_client
+        return openai_client(api_key=api_key)
+
+    if mode == "off":
+        return factory()
+    return CachedOpenAIClient(factory, cache=get_shared_cache(cache_path), mode=mode)
@@ -9,6 +9,9 @@ from typing import Any, Dict, List, Set
 from rdflib import ConjunctiveGraph, Namespace, URIRef, Literal
 from rdflib.namespace import RDF, RDFS, XSD
 
+from trig_writer import render_graph_block
+from tracing import traced
+
 EX = Namespace("http://example.org/")
 PROV = Namespace("http://www.w3.org/ns/prov#")
 HICO = Namespace("http://purl.org/emmedi/hico/")
@@ -159,21 +162,9 @@ def emit_provenance(cg: ConjunctiveGraph, doc_id: str, relations_payload: Dict[s
             g.add((act, HICO.hasInterpretationCriterion, EX[c]))
 
 
-def _extract_named_graph_block(trig_text: str, graph_iri: str) -> str:
-    # naive extraction: find 'graph {' until matching closing '}' on its own line
-    anchor = f"{graph_iri} {{"
-    start = trig_text.find(anchor)
-    if start == -1:
-        return ""
-    # find closing '}' after start
-    close = trig_text.find("\n}\n", start)
-    if close == -1:
-        # try end of text
-        close = len(trig_text)
-    return trig_text[start:close+3].strip()
-
-
-def generate_nanopub_trig(doc_dir: str, file_id: str, input_entry: Dict[str, Any], relations_payload: Dict[str, Any]) -> tuple[str, str]:
+@traced
+def build_nanopub_graph(file_id: str, input_entry: Dict[str, Any], relations_payload: Dict[str, Any]) -> ConjunctiveGraph:
+    """Build the pubInfo and provenance named graphs (ex:pubInfo_<doc_id>, ex:provenance_<doc_id>)."""
     doc_id = slug(file_id)
     model_name = ((input_entry.get("automated_process_metadata", {}) or {}).get("llm_model_version"))
     authors = (input_entry.get("document_metadata", {}) or {}).get("authors_list") or []
@@ -193,8 +184,13 @@ def generate_nanopub_trig(doc_dir: str, file_id: str, input_entry: Dict[str, Any
     emit_pubinfo_first(cg, doc_id, model_name)
     # 2) provenance referring to ex:<doc_id> and consistent FOAF persons
     emit_provenance(cg, doc_id, relations_payload, authors=authors)
-    # Serialize and extract named graphs as text blocks
-    trig_text = cg.serialize(format="trig")
-    prov_block = _extract_named_graph_block(trig_text, f"ex:provenance_{doc_id}")
-    pubinfo_block = _extract_named_graph_block(trig_text, f"ex:pubInfo_{doc_id}")
+    return cg
+
+
+def generate_nanopub_trig(doc_dir: str, file_id: str, input_entry: Dict[str, Any], relations_payload: Dict[str, Any]) -> tuple[str, str]:
+    """Provenance and pubInfo as TriG text blocks (digital_hermeneutics_generator streams the graphs instead)."""
+    doc_id = slug(file_id)
+    cg = build_nanopub_graph(file_id, input_entry, relations_payload)
+    prov_block = render_graph_block(cg, EX[f"provenance_{doc_id}"])
+    pubinfo_block = render_graph_block(cg, EX[f"pubInfo_{doc_id}"])
     return prov_block, pubinfo_block
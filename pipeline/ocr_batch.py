@@ -0,0 +1,140 @@
+# Batch OCR of every input.json entry whose source markdown is missing from pipeline/data
+# PDFs are taken from the entry's "pdf_path" (top level or in document_metadata), else from
+# pdfs/<name>.pdf, where <name> is the basename of the entry's markdown file_path.
+# Identical PDFs (same sha256) are OCR'd once and the markdown is copied to the other entries.
+# Up to --max-workers PDFs are OCR'd at the same time; each one resumes from its page checkpoint.
+# A manifest with per-document status, page counts and timings is written at the end.
+
+import argparse
+import json
+import os
+import shutil
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+from ocr_mistral import (
+    ocr_pdf, make_backend, file_sha256, load_checkpoint,
+    BACKENDS, DATA_DIR, CHECKPOINT_DIR, DEFAULT_BATCH_SIZE,
+)
+
+BASE_DIR = os.path.abspath(os.path.dirname(__file__))
+INPUT_FILE = os.path.join(BASE_DIR, "input.json")
+PDF_DIR = os.path.join(BASE_DIR, "pdfs")
+MANIFEST_PATH = os.path.join(CHECKPOINT_DIR, "manifest.json")
+
+
+def load_entries(input_file: str = INPUT_FILE) -> List[Dict[str, Any]]:
+    with open(input_file, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    return data["files"] if isinstance(data.get("files"), list) else [data]
+
+
+def markdown_name(entry: Dict[str, Any]) -> Optional[str]:
+    """Output name (without .md) of an entry: the basename of its declared markdown file_path."""
+    doc_meta = entry.get("document_metadata") or {}
+    declared_path = entry.get("file_path") or doc_meta.get("file_path")
+    if not declared_path:
+        return None
+    return os.path.splitext(os.path.basename(declared_path))[0]
+
+
+def pdf_source(entry: Dict[str, Any], name: str, pdf_dir: str = PDF_DIR) -> Optional[str]:
+    doc_meta = entry.get("document_metadata") or {}
+    pdf_path = entry.get("pdf_path") or doc_meta.get("pdf_path")
+    if pdf_path:
+        return pdf_path if os.path.isabs(pdf_path) else os.path.join(BASE_DIR, pdf_path)
+    candidate = os.path.join(pdf_dir, f"{name}.pdf")
+    return candidate if os.path.exists(candidate) else None
+
+
+def needs_ocr(name: str, data_dir: str = DATA_DIR, checkpoint_dir: str = CHECKPOINT_DIR) -> bool:
+    """True if the markdown is missing or an OCR run for it has not completed."""
+    if not os.path.exists(os.path.join(data_dir, f"{name}.md")):
+        return True
+    checkpoint = load_checkpoint(os.path.join(checkpoint_dir, f"{name}.json"))
+    return checkpoint is not None and not checkpoint.get("complete")
+
+
+def run_batch(entries: List[Dict[str, Any]], backend, max_workers: int = 4, batch_size: int = DEFAULT_BATCH_SIZE,
+              data_dir: str = DATA_DIR, checkpoint_dir: str = CHECKPOINT_DIR, pdf_dir: str = PDF_DIR,
+              manifest_path: Optional[str] = MANIFEST_PATH) -> Dict[str, Any]:
+    """OCR the entries that need it and write the manifest; returns the manifest."""
+    started = time.perf_counter()
+    documents: Dict[str, Dict[str, Any]] = {}
+    by_hash: Dict[str, List[str]] = {}
+
+    for entry in entries:
+        name = markdown_name(entry)
+        if not name or name in documents:
+            continue
+        if not needs_ocr(name, data_dir, checkpoint_dir):
+            documents[name] = {"file_id": name, "status": "present"}
+            continue
+        source = pdf_source(entry, name, pdf_dir)
+        if not source or not os.path.exists(source):
+            print(f"Warning: No PDF for {name} (set pdf_path or add {name}.pdf to {pdf_dir})")
+            documents[name] = {"file_id": name, "status": "missing_pdf", "source": source}
+            continue
+        sha256 = file_sha256(source)
+        documents[name] = {"file_id": name, "status": "pending", "source": source, "sha256": sha256}
+        by_hash.setdefault(sha256, []).append(name)
+
+    def run(names: List[str]) -> None:
+        primary = names[0]
+        record = documents[primary]
+        try:
+            checkpoint = ocr_pdf(record["source"], file_id=primary, backend=backend, batch_size=batch_size,
+                                 data_dir=data_dir, checkpoint_dir=checkpoint_dir, source_hash=record["sha256"])
+        except Exception as e:
+            print(f"Error OCR'ing {primary}: {e}")
+            for name in names:
+                documents[name].update(status="error", error=str(e))
+            return
+        if checkpoint is None:
+            record["status"] = "present"
+            return
+        if not checkpoint["complete"]:
+            # Pages missing from an OCR reply; the next run resumes from the checkpoint
+            record.update(status="incomplete", pages=checkpoint["pages_done"], seconds=checkpoint["seconds"])
+            return
+        record.update(status="ocr", pages=checkpoint["pages_done"], seconds=checkpoint["seconds"])
+        for name in names[1:]:
+            shutil.copyfile(os.path.join(data_dir, f"{primary}.md"), os.path.join(data_dir, f"{name}.md"))
+            documents[name].update(status="duplicate", duplicate_of=primary, pages=checkpoint["pages_done"])
+            print(f"{name}: same PDF as {primary}, copied its markdown")
+
+    pending = list(by_hash.values())
+    print(f"{len(documents)} documents, {sum(len(n) for n in pending)} to OCR "
+          f"({len(pending)} unique PDFs, {max(1, max_workers)} at a time)")
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        list(executor.map(run, pending))
+
+    manifest = {
+        "documents": list(documents.values()),
+        "unique_pdfs": len(pending),
+        "pages": sum(d.get("pages", 0) for d in documents.values() if d["status"] == "ocr"),
+        "max_workers": max(1, max_workers),
+        "wall_seconds": round(time.perf_counter() - started, 3),
+    }
+    if manifest_path:
+        os.makedirs(os.path.dirname(manifest_path), exist_ok=True)
+        with open(manifest_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+        print(f"Manifest saved to {manifest_path}")
+    return manifest
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="OCR every input.json entry whose markdown is missing from pipeline/data")
+    parser.add_argument("--input", default=INPUT_FILE, help="Path to input.json")
+    parser.add_argument("--pdf-dir", default=PDF_DIR, help="Directory with <name>.pdf files (default: pipeline/pdfs)")
+    parser.add_argument("--backend", choices=BACKENDS, default="mistral", help="OCR backend (default: mistral)")
+    parser.add_argument("--max-workers", type=int, default=4, help="PDFs OCR'd concurrently (default: 4)")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE,
+                        help=f"Pages per OCR request (default: {DEFAULT_BATCH_SIZE})")
+    parser.add_argument("--manifest", default=MANIFEST_PATH, help="Manifest output path")
+    args = parser.parse_args()
+
+    run_batch(load_entries(args.input), make_backend(args.backend), max_workers=args.max_workers,
+              batch_size=max(1, args.batch_size), pdf_dir=args.pdf_dir, manifest_path=args.manifest)
@@ -0,0 +1,255 @@
+# Streaming OCR of PDFs into pipeline/data/<file_id>.md
+# Pages are OCR'd in batches and each page's markdown is appended to the output as soon as it
+# arrives. A checkpoint in ocr_checkpoints/<file_id>.json records the completed pages (and the
+# output size at that point), so an interrupted run resumes after the last completed page.
+#
+# Backends:
+# - "mistral": Mistral OCR (mistral-ocr-latest); the PDF is uploaded once, then OCR'd per page batch
+# - "stub":    local placeholder text per page, for running the flow offline
+#
+# Page counts come from pypdf (pip install pypdf). Without it the PDF is scanned for page objects, which misses
+# pages kept in compressed object streams; the page count is then unknown and the run ends at the first batch
+# that comes back short, or at the first page the backend reports as out of range.
+# A reply that skips a requested page stops the run without marking it complete, so a re-run resumes there.
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+BASE_DIR = os.path.abspath(os.path.dirname(__file__))
+DATA_DIR = os.path.join(BASE_DIR, "data")
+CHECKPOINT_DIR = os.path.join(BASE_DIR, "ocr_checkpoints")
+
+OCR_MODEL = "mistral-ocr-latest"
+DEFAULT_BATCH_SIZE = 8
+BACKENDS = ("mistral", "stub")
+
+# Separator between pages in the markdown output
+PAGE_SEPARATOR = "\n\n"
+
+# Page objects in an uncompressed PDF ("/Type /Page", not "/Type /Pages")
+_PDF_PAGE = re.compile(rb"/Type\s*/Page(?![a-zA-Z])")
+
+
+class PageOutOfRange(Exception):
+    """The backend was asked for a page past the end of the document."""
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def count_pdf_pages(pdf_path: str) -> Optional[int]:
+    """Page count via pypdf when installed, else by scanning for page objects; None if unknown."""
+    try:
+        from pypdf import PdfReader
+        return len(PdfReader(pdf_path).pages)
+    except ImportError:
+        pass
+    with open(pdf_path, "rb") as f:
+        count = len(_PDF_PAGE.findall(f.read()))
+    # Page objects inside compressed object streams are not visible to the scan
+    return count or None
+
+
+class MistralOCRBackend:
+    """Mistral OCR API."""
+
+    def __init__(self, api_key: Optional[str] = None, model: str = OCR_MODEL):
+        from mistralai import Mistral
+        self.client = Mistral(api_key=api_key or os.environ.get("MISTRAL_API_KEY"))
+        self.model = model
+
+    def open(self, pdf_path: str) -> Dict[str, Any]:
+        """Upload the PDF once; returns the document reference used for every page batch."""
+        with open(pdf_path, "rb") as f:
+            uploaded = self.client.files.upload(
+                file={"file_name": os.path.basename(pdf_path), "content": f},
+                purpose="ocr",
+            )
+        return {"type": "file", "file_id": uploaded.id}
+
+    def ocr_pages(self, document: Dict[str, Any], pages: List[int]) -> List[Tuple[int, str]]:
+        """(page index, markdown) for the requested 0-based pages that exist."""
+        try:
+            response = self.client.ocr.process(
+                model=self.model,
+                document=document,
+                pages=pages,
+                include_image_base64=False,
+            )
+        except Exception as e:
+            # The API rejects page indexes past the end of the document with a 4xx error about the pages
+            if getattr(e, "status_code", None) in (400, 422) and "page" in str(e).lower():
+                raise PageOutOfRange(str(e)) from e
+            raise
+        return [(page.index, page.markdown) for page in response.pages]
+
+
+class StubOCRBackend:
+    """Offline backend: placeholder markdown per page. fail_at_page simulates an OCR failure."""
+
+    def __init__(self, page_count: Optional[int] = None, fail_at_page: Optional[int] = None):
+        self.page_count = page_count
+        self.fail_at_page = fail_at_page
+        self.calls: List[List[int]] = []
+
+    def open(self, pdf_path: str) -> Dict[str, Any]:
+        pages = self.page_count or count_pdf_pages(pdf_path) or 1
+        return {"name": os.path.splitext(os.path.basename(pdf_path))[0], "pages": pages}
+
+    def ocr_pages(self, document: Dict[str, Any], pages: List[int]) -> List[Tuple[int, str]]:
+        self.calls.append(list(pages))
+        results = []
+        for page in pages:
+            if page >= document["pages"]:
+                break
+            if page == self.fail_at_page:
+                raise RuntimeError(f"Stub OCR failure on page {page + 1}")
+            results.append((page, f"Page {page + 1} of {document['name']} (stub OCR)."))
+        return results
+
+
+def make_backend(name: str = "mistral", **kwargs):
+    if name == "mistral":
+        return MistralOCRBackend(**kwargs)
+    if name == "stub":
+        return StubOCRBackend(**kwargs)
+    raise ValueError(f"Unknown OCR backend '{name}'; expected one of {BACKENDS}")
+
+
+def _ocr_batch(backend, document: Dict[str, Any], requested: List[int]) -> List[Tuple[int, str]]:
+    """The requested pages from the backend; on an out-of-range error, page by page up to the end of the document."""
+    try:
+        return sorted(backend.ocr_pages(document, requested))
+    except PageOutOfRange:
+        if len(requested) == 1:
+            return []
+    pages = []
+    for page in requested:
+        try:
+            pages.extend(backend.ocr_pages(document, [page]))
+        except PageOutOfRange:
+            break
+    return sorted(pages)
+
+
+def load_checkpoint(path: str) -> Optional[Dict[str, Any]]:
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _save_checkpoint(path: str, checkpoint: Dict[str, Any]) -> None:
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(checkpoint, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+
+
+def ocr_pdf(pdf_path: str, file_id: Optional[str] = None, backend=None, batch_size: int = DEFAULT_BATCH_SIZE,
+            data_dir: str = DATA_DIR, checkpoint_dir: str = CHECKPOINT_DIR, force: bool = False,
+            source_hash: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """
+    OCR a PDF into data_dir/<file_id>.md, page batch by page batch, resuming from the checkpoint.
+    Returns the final checkpoint (file_id, source, sha256, pages_done, page_count, complete, seconds),
+    or None when the markdown already exists without a checkpoint.
+    """
+    file_id = file_id or os.path.splitext(os.path.basename(pdf_path))[0]
+    backend = backend or make_backend("mistral")
+    os.makedirs(data_dir, exist_ok=True)
+    os.makedirs(checkpoint_dir, exist_ok=True)
+    md_path = os.path.join(data_dir, f"{file_id}.md")
+    checkpoint_path = os.path.join(checkpoint_dir, f"{file_id}.json")
+    sha256 = source_hash or file_sha256(pdf_path)
+
+    checkpoint = None if force else load_checkpoint(checkpoint_path)
+    if checkpoint is None and os.path.exists(md_path) and not force:
+        # Never overwrite markdown that was not produced by this OCR run (e.g. hand-corrected text)
+        print(f"{file_id}: {md_path} exists without an OCR checkpoint, skipping (use --force to overwrite)")
+        return None
+    if checkpoint and checkpoint.get("sha256") != sha256:
+        print(f"{file_id}: source PDF changed since the last run, starting over")
+        checkpoint = None
+    if checkpoint and checkpoint.get("complete") and os.path.exists(md_path):
+        print(f"{file_id}: already OCR'd ({checkpoint['pages_done']} pages)")
+        return checkpoint
+    if checkpoint is None or not os.path.exists(md_path):
+        checkpoint = {
+            "file_id": file_id,
+            "source": os.path.abspath(pdf_path),
+            "sha256": sha256,
+            "pages_done": 0,
+            "md_bytes": 0,
+            "page_count": count_pdf_pages(pdf_path),
+            "complete": False,
+            "seconds": 0.0,
+        }
+    elif checkpoint["pages_done"]:
+        print(f"{file_id}: resuming after page {checkpoint['pages_done']}")
+
+    started = time.perf_counter()
+    seconds_before = checkpoint.get("seconds", 0.0)
+    page_count = checkpoint.get("page_count")
+    document = backend.open(pdf_path)
+
+    with open(md_path, "ab") as md:
+        # Drop anything written after the last checkpoint (e.g. a page cut off by a crash)
+        md.truncate(checkpoint["md_bytes"])
+        md.seek(checkpoint["md_bytes"])
+        while not checkpoint["complete"]:
+            first = checkpoint["pages_done"]
+            last = first + batch_size if page_count is None else min(first + batch_size, page_count)
+            requested = list(range(first, last))
+            pages = _ocr_batch(backend, document, requested) if requested else []
+            received = [index for index, _ in pages]
+            # Only a leading run of the requested pages can be appended; anything after a gap would misplace text
+            contiguous = 0
+            while contiguous < len(received) and received[contiguous] == requested[contiguous]:
+                contiguous += 1
+            for index, markdown in pages[:contiguous]:
+                text = (PAGE_SEPARATOR if checkpoint["md_bytes"] else "") + markdown
+                md.write(text.encode("utf-8"))
+                md.flush()
+                checkpoint["pages_done"] = index + 1
+                checkpoint["md_bytes"] = md.tell()
+                checkpoint["seconds"] = round(seconds_before + time.perf_counter() - started, 3)
+                _save_checkpoint(checkpoint_path, checkpoint)
+            if received != requested[:contiguous] or (page_count is not None and contiguous < len(requested)):
+                print(f"{file_id}: OCR reply for pages {first + 1}-{last} returned pages "
+                      f"{[index + 1 for index in received]}, stopping after page {checkpoint['pages_done']} "
+                      f"(run incomplete, re-run to resume)")
+                break
+            if contiguous < len(requested) or checkpoint["pages_done"] == page_count or not requested:
+                checkpoint["complete"] = True
+                checkpoint["page_count"] = checkpoint["pages_done"]
+            print(f"{file_id}: {checkpoint['pages_done']}/{page_count or '?'} pages")
+
+    checkpoint["seconds"] = round(seconds_before + time.perf_counter() - started, 3)
+    _save_checkpoint(checkpoint_path, checkpoint)
+    status = "" if checkpoint["complete"] else ", incomplete"
+    print(f"Saved OCR markdown to: {md_path} ({checkpoint['pages_done']} pages{status})")
+    return checkpoint
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="OCR a PDF into pipeline/data/<file_id>.md with page checkpoints")
+    parser.add_argument("pdf", help="PDF to OCR")
+    parser.add_argument("--file-id", default=None, help="Output name (default: PDF file name without extension)")
+    parser.add_argument("--backend", choices=BACKENDS, default="mistral", help="OCR backend (default: mistral)")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE,
+                        help=f"Pages per OCR request (default: {DEFAULT_BATCH_SIZE})")
+    parser.add_argument("--force", action="store_true", help="Ignore the checkpoint and OCR from the first page")
+    args = parser.parse_args()
+
+    ocr_pdf(args.pdf, file_id=args.file_id, backend=make_backend(args.backend),
+            batch_size=max(1, args.batch_size), force=args.force)
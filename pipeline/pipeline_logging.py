@@ -0,0 +1,126 @@
+# Logging for the pipeline modules
+# get_logger(name) returns a logger under the "pipeline" hierarchy that writes plain lines to stdout, like the
+# print() calls it replaces (DEBUG and WARNING lines keep a "DEBUG: " / "WARNING: " prefix). Messages take
+# %-style arguments and are only formatted when their level is enabled; in hot loops, check
+# logger.isEnabledFor(logging.DEBUG) once and skip building the arguments altogether.
+#
+# The level comes from PIPELINE_LOG_LEVEL (DEBUG, INFO, WARNING, ...; default INFO) or from
+# configure_logging(), which the CLIs call for -v / -q. silent_logger() gives components that must never
+# write anything (e.g. cidoc_events.CidocEventGenerator) a logger that drops every message.
+#
+# Usage:
+#   PIPELINE_LOG_LEVEL=DEBUG python run_pipeline.py --stages cidoc
+#   python run_pipeline.py -q
+
+import argparse
+import logging
+import os
+import sys
+import threading
+from typing import Optional, Union
+
+LOG_LEVEL_ENV = "PIPELINE_LOG_LEVEL"
+ROOT_LOGGER = "pipeline"
+
+_configured = False
+_configure_lock = threading.Lock()
+
+
+class _StdoutHandler(logging.StreamHandler):
+    """StreamHandler writing to the current sys.stdout, so contextlib.redirect_stdout still captures it."""
+
+    @property
+    def stream(self):
+        return sys.stdout
+
+    @stream.setter
+    def stream(self, value):
+        pass
+
+
+class _PlainFormatter(logging.Formatter):
+    """INFO lines as bare messages; other levels prefixed with the level name, like the old DEBUG: prints."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        message = super().format(record)
+        if record.levelno == logging.INFO:
+            return message
+        return f"{record.levelname}: {message}"
+
+
+def _parse_level(level: Union[int, str, None]) -> int:
+    if level is None:
+        return logging.INFO
+    if isinstance(level, int):
+        return level
+    text = level.strip().upper()
+    if text.isdigit():
+        return int(text)
+    value = logging.getLevelName(text)
+    if not isinstance(value, int):
+        print(f"Warning: unknown {LOG_LEVEL_ENV} value {level!r}, using INFO")
+        return logging.INFO
+    return value
+
+
+def _ensure_configured() -> None:
+    global _configured
+    if _configured:
+        return
+    with _configure_lock:
+        if _configured:
+            return
+        root = logging.getLogger(ROOT_LOGGER)
+        handler = _StdoutHandler()
+        handler.setFormatter(_PlainFormatter("%(message)s"))
+        root.addHandler(handler)
+        root.setLevel(_parse_level(os.getenv(LOG_LEVEL_ENV)))
+        # Pipeline messages are shown once, by our handler, even if an application configured the root logger
+        root.propagate = False
+        _configured = True
+
+
+def get_logger(name: str) -> logging.Logger:
+    """The pipeline logger for a module (pass the module's file stem, e.g. "cidoc_group_generator")."""
+    _ensure_configured()
+    return logging.getLogger(f"{ROOT_LOGGER}.{name}")
+
+
+def configure_logging(level: Union[int, str, None] = None, verbosity: Optional[int] = None) -> int:
+    """Set the level of all pipeline loggers and return it.
+
+    verbosity is the CLI form: negative for quiet (WARNING), 0 for INFO, positive for DEBUG.
+    An explicit level wins over verbosity; with neither, PIPELINE_LOG_LEVEL (or INFO) is used.
+    """
+    _ensure_configured()
+    if level is not None:
+        resolved = _parse_level(level)
+    elif verbosity is not None:
+        resolved = logging.WARNING if verbosity < 0 else logging.DEBUG if verbosity > 0 else logging.INFO
+    else:
+        resolved = _parse_level(os.getenv(LOG_LEVEL_ENV))
+    logging.getLogger(ROOT_LOGGER).setLevel(resolved)
+    return resolved
+
+
+def silent_logger(name: str) -> logging.Logger:
+    """A logger that drops every message; isEnabledFor() is False at all levels, so guarded debug code is skipped."""
+    _ensure_configured()
+    logger = logging.getLogger(f"{ROOT_LOGGER}.silent.{name}")
+    logger.disabled = True
+    return logger
+
+
+def add_logging_arguments(parser: argparse.ArgumentParser) -> None:
+    """Add -v/--verbose and -q/--quiet to a CLI; pass the parsed args to configure_logging_from_args()."""
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument("-v", "--verbose", action="store_true", help="Show debug messages")
+    group.add_argument("-q", "--quiet", action="store_true", help="Only show warnings and errors")
+
+
+def configure_logging_from_args(args: argparse.Namespace) -> int:
+    if getattr(args, "verbose", False):
+        return configure_logging(verbosity=1)
+    if getattr(args, "quiet", False):
+        return configure_logging(verbosity=-1)
+    return configure_logging()
@@ -1,24 +1,52 @@
 import faiss
-import voyageai
 import numpy as np
+from collections import OrderedDict
 from typing import List, Dict, Tuple, Optional
 import hashlib
 import json
 import os
 import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
 # Import indexing helpers
 from indexer import (
     create_hybrid_index as build_faiss_index,
     save_index as save_faiss_index,
     load_index as load_faiss_index,
+    normalize_embeddings,
+    similarity_scores,
+    INDEX_TYPES,
 )
 
+# Memory-mapped chunk texts
+from chunk_store import ChunkStore, has_chunk_store, write_chunk_store, OFFSETS_FILE
+
+# Lexical index fused with dense retrieval
+from bm25_index import BM25Index, BM25_FILE, reciprocal_rank_fusion
+
+# Second-stage rerankers (Voyage API or local cross-encoder) and the adaptive rerank policy
+from rerankers import make_reranker, rerank_window, DEFAULT_RERANK_MARGIN, RERANKERS
+
+# Corpus-wide index over all documents
+from corpus_index import CorpusIndex, CORPUS_DIR
+
+# Shared LLM response cache
+from llm_cache import cached_openai_client
+from api_clients import voyage_client
+from tracing import bind_context, traced
+
 # Import utilities
 from utils import (
     extract_sections_with_footnotes,
     create_paragraph_chunks_with_footnotes,
     add_overlap_to_chunks,
+    group_chunks_for_embedding,
+    get_token_counter,
+    DEFAULT_CHUNK_TOKENS,
+    DEFAULT_OVERLAP_TOKENS,
+    MAX_SECTION_TOKENS,
+    MAX_REQUEST_TOKENS,
     load_few_shot_examples,
     load_questions_and_metadata,
     build_document_metadata_string,
@@ -26,76 +54,188 @@ from utils import (
 
 BASE_DIR = os.path.abspath(os.path.dirname(__file__))
 PIPE_DATA_DIR = os.path.join(BASE_DIR, "data")
+EMBEDDINGS_CACHE_DIR = os.path.join(BASE_DIR, "embeddings_cache")
+
+# Voyage embedding settings (shared by documents and queries)
+EMBEDDING_MODEL = "voyage-context-3"
+EMBEDDING_DIMENSION = 1024
+
+# Concurrent background retrievals in ask_sequential
+MAX_PREFETCH_WORKERS = 8
 
 class SimpleRAGPipeline:
-    def __init__(self, openai_client, voyage_api_key: Optional[str] = None):
+    def __init__(self, openai_client, voyage_api_key: Optional[str] = None,
+                 embeddings_cache_dir: Optional[str] = EMBEDDINGS_CACHE_DIR,
+                 query_cache_size: int = 256, persist_query_embeddings: bool = True,
+                 index_params: Optional[Dict] = None, mmap_index: bool = True,
+                 hybrid_retrieval: bool = True, rrf_k: int = 60,
+                 reranker: str = "voyage", reranker_model: Optional[str] = None,
+                 adaptive_rerank: bool = True, rerank_margin: float = DEFAULT_RERANK_MARGIN):
         """
         Initialize the RAG pipeline with Voyage embeddings (no summarization).
         
         Args:
             openai_client: OpenAI client for generation
             voyage_api_key: Your Voyage AI API key (if None, uses VOYAGE_API_KEY env var)
+            embeddings_cache_dir: Directory for the on-disk section embedding cache (None disables it)
+            query_cache_size: Maximum number of query vectors kept in the in-memory LRU
+            persist_query_embeddings: Also store query vectors in embeddings_cache_dir
+            index_params: Keyword arguments for indexer.create_hybrid_index (e.g. {"index_type": "hnsw"})
+            mmap_index: Memory-map loaded indexes and chunk stores instead of reading them into RAM
+            hybrid_retrieval: Fuse BM25 with dense results (reciprocal-rank fusion) before reranking
+            rrf_k: Rank constant of the reciprocal-rank fusion
+            reranker: Reranking backend, "voyage" (rerank-2 API) or "cross-encoder" (local, CPU)
+            reranker_model: Model of the reranking backend (default: the backend's default model)
+            adaptive_rerank: Skip or shrink reranking where the first-stage scores are well separated
+            rerank_margin: Score gap, as a fraction of the candidates' score spread, counted as well separated
         """
-        self.voyage_client = voyageai.Client(api_key=voyage_api_key or os.getenv("VOYAGE_API_KEY"))
+        # Shared rate-limited client (see api_clients.py); same interface as voyageai.Client
+        self.voyage_client = voyage_client(api_key=voyage_api_key or os.getenv("VOYAGE_API_KEY"))
         self.openai_client = openai_client
         self.chunks = []
         self.chunk_metadata = []
         self.index = None
+        self.index_params = dict(index_params or {})
+        self.mmap_index = mmap_index
+        self.bm25 = None
+        self.hybrid_retrieval = hybrid_retrieval
+        self.rrf_k = rrf_k
+        # Candidates per requested chunk sent to the reranker; fusion gives better recall, so fewer are needed
+        self.rerank_pool_factor = 2 if hybrid_retrieval else 3
+        self.reranker = make_reranker(reranker, self.voyage_client, reranker_model)
+        self.adaptive_rerank = adaptive_rerank
+        self.rerank_margin = rerank_margin
+        self.corpus_index = None
         self.embeddings_cache = {}
+        self.embeddings_cache_dir = embeddings_cache_dir
+        self.query_cache = OrderedDict()
+        self.query_cache_size = query_cache_size
+        self._query_cache_lock = threading.Lock()
+        self.persist_query_embeddings = persist_query_embeddings
         self.full_document_text = ""
         self.document_sections = []
         
-    def smart_chunk_document(self, text: str, target_chunk_size: int = 800, 
-                        overlap: int = 100) -> List[Dict]:
+    @traced
+    def smart_chunk_document(self, text: str, target_tokens: int = DEFAULT_CHUNK_TOKENS,
+                             overlap_tokens: int = DEFAULT_OVERLAP_TOKENS) -> List[Dict]:
+        """Chunk a document into chunks of at most target_tokens (EMBEDDING_MODEL tokens) plus overlap."""
+        count_tokens = get_token_counter(EMBEDDING_MODEL)
+        
         # Extract sections with their footnotes
         self.document_sections = extract_sections_with_footnotes(text)
         
         # Create paragraph-based chunks
         chunks_with_metadata = create_paragraph_chunks_with_footnotes(
-            self.document_sections, 
-            min_chunk_size=target_chunk_size // 4
+            self.document_sections,
+            target_tokens=target_tokens,
+            count_tokens=count_tokens,
         )
         
-        # Add overlap between chunks if needed
-        if overlap > 0:
-            chunks_with_metadata = add_overlap_to_chunks(chunks_with_metadata, overlap)
+        # Add sentence-boundary overlap between chunks if needed
+        if overlap_tokens > 0:
+            chunks_with_metadata = add_overlap_to_chunks(chunks_with_metadata, overlap_tokens, count_tokens)
         
         return chunks_with_metadata
     
+    def _embedding_cache_key(self, texts: List[str], input_type: str) -> str:
+        """Content hash of an embedding request: model settings plus the section's chunk texts."""
+        payload = json.dumps(
+            [EMBEDDING_MODEL, EMBEDDING_DIMENSION, input_type, texts],
+            ensure_ascii=False,
+        )
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def _load_cached_embeddings(self, key: str, remember: bool = True) -> Optional[np.ndarray]:
+        """Look up cached embeddings in memory first, then on disk."""
+        if key in self.embeddings_cache:
+            return self.embeddings_cache[key]
+        if not self.embeddings_cache_dir:
+            return None
+        path = os.path.join(self.embeddings_cache_dir, f"{key}.npy")
+        if not os.path.exists(path):
+            return None
+        try:
+            embeddings = np.load(path)
+        except Exception as e:
+            print(f"Warning: Ignoring unreadable embedding cache entry {path}: {e}")
+            return None
+        if remember:
+            self.embeddings_cache[key] = embeddings
+        return embeddings
+
+    def _store_cached_embeddings(self, key: str, embeddings: np.ndarray, remember: bool = True):
+        """Keep embeddings in memory and persist them to the cache directory."""
+        if remember:
+            self.embeddings_cache[key] = embeddings
+        if not self.embeddings_cache_dir:
+            return
+        os.makedirs(self.embeddings_cache_dir, exist_ok=True)
+        path = os.path.join(self.embeddings_cache_dir, f"{key}.npy")
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            np.save(f, embeddings)
+        os.replace(tmp_path, path)
+
+    @traced
     def create_contextualized_embeddings(self, chunks_with_metadata: List[Dict]) -> np.ndarray:
-        """Create Voyage contextualized embeddings that preserve document structure."""
+        """Create Voyage contextualized embeddings that preserve document structure.
+
+        Sections are cached by content, so only sections whose chunks changed are re-embedded.
+        Sections over the model's per-document token limit are embedded in parts, and requests
+        are split to stay under the per-request token limit.
+        """
+        count_tokens = get_token_counter(EMBEDDING_MODEL)
+        
         # Group chunks by section for better context preservation
-        sections_chunks = {}
-        for chunk in chunks_with_metadata:
-            section_number = chunk['section_number']
-            if section_number not in sections_chunks:
-                sections_chunks[section_number] = []
-            sections_chunks[section_number].append(chunk['text'])
+        section_groups = group_chunks_for_embedding(chunks_with_metadata, MAX_SECTION_TOKENS, count_tokens)
         
         # Prepare inputs for contextualized embeddings
-        inputs_for_voyage = list(sections_chunks.values())
+        inputs_for_voyage = [[chunk['text'] for chunk in group] for group in section_groups]
+        group_tokens = [
+            sum(chunk.get('token_count') or count_tokens(chunk['text']) for chunk in group)
+            for group in section_groups
+        ]
         
-        print(f"Creating contextualized embeddings for {len(inputs_for_voyage)} document sections...")
+        # Reuse cached sections; only the remaining ones go to Voyage
+        cache_keys = [self._embedding_cache_key(texts, "document") for texts in inputs_for_voyage]
+        section_embeddings = [self._load_cached_embeddings(key) for key in cache_keys]
+        missing = [i for i, emb in enumerate(section_embeddings) if emb is None]
         
-        # Use voyage-context-3 for best quality with context preservation
-        embeddings_obj = self.voyage_client.contextualized_embed(
-            inputs=inputs_for_voyage,
-            model="voyage-context-3",
-            input_type="document",
-            output_dimension=1024
-        )
+        print(f"Creating contextualized embeddings for {len(inputs_for_voyage)} document sections "
+              f"({len(inputs_for_voyage) - len(missing)} cached, {len(missing)} to embed)...")
         
-        # Flatten embeddings while maintaining order
-        all_embeddings = []
-        for result in embeddings_obj.results:
-            all_embeddings.extend(result.embeddings)
+        # Split the missing sections into requests within the per-request token limit
+        batches = []
+        batch_tokens = 0
+        for i in missing:
+            if not batches or batch_tokens + group_tokens[i] > MAX_REQUEST_TOKENS:
+                batches.append([])
+                batch_tokens = 0
+            batches[-1].append(i)
+            batch_tokens += group_tokens[i]
+        
+        for batch in batches:
+            # Use voyage-context-3 for best quality with context preservation
+            embeddings_obj = self.voyage_client.contextualized_embed(
+                inputs=[inputs_for_voyage[i] for i in batch],
+                model=EMBEDDING_MODEL,
+                input_type="document",
+                output_dimension=EMBEDDING_DIMENSION
+            )
+            for i, result in zip(batch, embeddings_obj.results):
+                embeddings = np.array(result.embeddings).astype('float32')
+                self._store_cached_embeddings(cache_keys[i], embeddings)
+                section_embeddings[i] = embeddings
         
-        return np.array(all_embeddings).astype('float32')
+        # Flatten embeddings while maintaining order
+        return np.vstack(section_embeddings).astype('float32')
     
     def create_hybrid_index(self, embeddings: np.ndarray):
-        """Wrapper to build the FAISS index via indexer.py"""
-        self.index = build_faiss_index(embeddings)
+        """Wrapper to build the FAISS index via indexer.py (plus the BM25 index over self.chunks)"""
+        self.index = build_faiss_index(embeddings, **self.index_params)
+        self.bm25 = BM25Index.build([c['text'] for c in self.chunks]) if self.chunks else None
 
+    @traced
     def process_document(self, file_path: str):
         """Process a document through the RAG pipeline."""
         print(f"Processing document: {file_path}")
@@ -105,6 +245,7 @@ class SimpleRAGPipeline:
             self.full_document_text = f.read()
         
         # Create smart chunks
+        self.close_chunk_store()
         self.chunks = self.smart_chunk_document(self.full_document_text)
         print(f"Created {len(self.chunks)} chunks from {len(self.document_sections)} sections")
         
@@ -117,47 +258,149 @@ class SimpleRAGPipeline:
         
         # Note: Index and metadata saving will be handled by caller with proper output directory
         
-    def enhanced_retrieval(self, query: str, k: int = 5, 
-                          use_reranking: bool = True) -> List[Dict]:
-        """Retrieve relevant chunks with optional reranking."""
-        # Embed query using contextualized embeddings
-        query_embedding = self.voyage_client.contextualized_embed(
-            inputs=[[query]],
-            model="voyage-context-3",
-            input_type="query",
-            output_dimension=1024
-        ).results[0].embeddings[0]
-        
-        query_embedding = np.array([query_embedding]).astype('float32')
-        
-        # Search in FAISS
-        if use_reranking:
-            # Retrieve more candidates for reranking
-            distances, indices = self.index.search(query_embedding, k * 3)
-            candidates = [self.chunks[i] for i in indices[0]]
-            
-            # Use Voyage reranker for better accuracy
-            rerank_results = self.voyage_client.rerank(
-                query=query,
-                documents=[c['text'] for c in candidates],
-                model="rerank-2",
-                top_k=k
+    @traced
+    def embed_queries(self, queries: List[str]) -> np.ndarray:
+        """Embed queries in one Voyage call, serving repeated questions from the LRU and disk cache."""
+        keys = [self._embedding_cache_key([query], "query") for query in queries]
+        vectors: Dict[str, np.ndarray] = {}
+        missing: Dict[str, str] = {}
+        for key, query in zip(keys, queries):
+            if key in vectors or key in missing:
+                continue
+            with self._query_cache_lock:
+                cached = self.query_cache.get(key)
+            if cached is not None:
+                vectors[key] = cached
+                continue
+            # Disk hits live in the bounded LRU only, not in the section cache
+            cached = self._load_cached_embeddings(key, remember=False) if self.persist_query_embeddings else None
+            if cached is not None:
+                vectors[key] = cached[0]
+            else:
+                missing[key] = query
+        
+        if missing:
+            embeddings_obj = self.voyage_client.contextualized_embed(
+                inputs=[[query] for query in missing.values()],
+                model=EMBEDDING_MODEL,
+                input_type="query",
+                output_dimension=EMBEDDING_DIMENSION
             )
-            
-            # Get reranked chunks
-            retrieved_chunks = []
-            for result in rerank_results.results:
-                chunk = candidates[result.index]
-                chunk['relevance_score'] = result.relevance_score
-                retrieved_chunks.append(chunk)
-        else:
-            distances, indices = self.index.search(query_embedding, k)
-            retrieved_chunks = [self.chunks[i] for i in indices[0]]
-            for chunk, dist in zip(retrieved_chunks, distances[0]):
-                chunk['relevance_score'] = float(1 / (1 + dist))
+            for key, result in zip(missing.keys(), embeddings_obj.results):
+                vector = np.array(result.embeddings[0]).astype('float32')
+                if self.persist_query_embeddings:
+                    self._store_cached_embeddings(key, vector[np.newaxis, :], remember=False)
+                vectors[key] = vector
+        
+        # Refresh the LRU with everything used in this batch
+        with self._query_cache_lock:
+            for key in keys:
+                self.query_cache[key] = vectors[key]
+                self.query_cache.move_to_end(key)
+            while len(self.query_cache) > self.query_cache_size:
+                self.query_cache.popitem(last=False)
+        
+        return np.vstack([vectors[key] for key in keys]).astype('float32')
+    
+    @traced
+    def batch_retrieve(self, queries: List[str], k: int = 5,
+                       use_reranking: bool = True) -> List[List[Dict]]:
+        """Retrieve relevant chunks for several queries with one embedding call and one FAISS search.
+
+        With hybrid_retrieval, dense and BM25 rankings are fused (RRF) and the fused score replaces
+        the cosine similarity as first-stage score.
+        """
+        if not queries:
+            return []
+        query_embeddings = normalize_embeddings(self.embed_queries(queries))
+        
+        # Retrieve more candidates for reranking
+        n_candidates = k * self.rerank_pool_factor if use_reranking else k
+        distances, indices = self.index.search(query_embeddings, n_candidates)
+        scores = similarity_scores(self.index, distances)
+        bm25 = self.lexical_index() if self.hybrid_retrieval else None
+        
+        all_retrieved = []
+        for query, row_scores, row_indices in zip(queries, scores, indices):
+            ranked = [(int(i), float(score)) for i, score in zip(row_indices, row_scores) if i >= 0]
+            if bm25 is not None:
+                lexical_ids, _ = bm25.search(query, n_candidates)
+                ranked = reciprocal_rank_fusion([[i for i, _ in ranked], lexical_ids], k=self.rrf_k)[:n_candidates]
+            # Copy chunks so scores of one query do not leak into another
+            candidates = [(dict(self.chunks[i]), score) for i, score in ranked]
+            all_retrieved.append(self._rank_candidates(query, candidates, k, use_reranking, fused=bm25 is not None))
         
+        return all_retrieved
+    
+    def _rank_candidates(self, query: str, candidates: List[Tuple[Dict, float]], k: int,
+                         use_reranking: bool, fused: bool = False) -> List[Dict]:
+        """Rerank (or score) first-stage (chunk, score) candidates for one query.
+
+        Candidates are best first. With adaptive_rerank, only the window of candidates whose order the
+        reranker could still change is reranked (see rerankers.rerank_window). With fused (RRF) scores no
+        candidate is dropped before reranking, so BM25-only hits still reach the reranker.
+
+        Every chunk gets its first-stage score (cosine or RRF) as 'first_stage_score'; reranked chunks
+        also get 'rerank_score'. The two are on different scales and are never compared.
+        """
+        fixed, end = 0, len(candidates)
+        if use_reranking and self.adaptive_rerank:
+            fixed, end = rerank_window([score for _, score in candidates], k, self.rerank_margin,
+                                       drop_tail=not fused)
+        
+        for chunk, score in candidates:
+            chunk['first_stage_score'] = score
+        retrieved_chunks = [chunk for chunk, _ in (candidates[:fixed] if use_reranking else candidates)]
+        
+        if use_reranking and len(retrieved_chunks) < k and fixed < end:
+            window = candidates[fixed:end]
+            ranked = self.reranker.rerank(query, [c['text'] for c, _ in window], top_k=k - fixed)
+            for index, rerank_score in ranked:
+                chunk = window[index][0]
+                chunk['rerank_score'] = rerank_score
+                retrieved_chunks.append(chunk)
         return retrieved_chunks
     
+    def lexical_index(self) -> Optional[BM25Index]:
+        """BM25 index of the loaded document, built from the chunks if none was saved with the index."""
+        if self.bm25 is None and len(self.chunks):
+            self.bm25 = BM25Index.build([chunk['text'] for chunk in self.chunks])
+        return self.bm25
+    
+    def load_corpus_index(self, corpus_dir: str = CORPUS_DIR, documents_dir: Optional[str] = None):
+        """Load the corpus-wide index built by corpus_index.py."""
+        if documents_dir is None:
+            documents_dir = os.path.join(BASE_DIR, "documents")
+        if self.corpus_index is not None:
+            self.corpus_index.close()
+        self.corpus_index = CorpusIndex.load(corpus_dir, documents_dir=documents_dir, mmap=self.mmap_index)
+    
+    def corpus_retrieve(self, queries: List[str], k: int = 5, file_ids=None,
+                        use_reranking: bool = True) -> List[List[Dict]]:
+        """Retrieve chunks across all documents with one search per document filter.
+
+        file_ids restricts retrieval to some documents: one list for every query, or one list (or None) per query.
+        Retrieved chunks carry 'file_id' and 'chunk_id'.
+        """
+        if self.corpus_index is None:
+            raise ValueError("Corpus index not loaded; call load_corpus_index() first")
+        if not queries:
+            return []
+        query_embeddings = self.embed_queries(queries)
+        n_candidates = k * self.rerank_pool_factor if use_reranking else k
+        scores, indices = self.corpus_index.search(query_embeddings, n_candidates, file_ids=file_ids)
+        return [
+            self._rank_candidates(query, self.corpus_index.hits(row_indices, row_scores), k, use_reranking)
+            for query, row_scores, row_indices in zip(queries, scores, indices)
+        ]
+    
+    @traced
+    def enhanced_retrieval(self, query: str, k: int = 5, 
+                          use_reranking: bool = True) -> List[Dict]:
+        """Retrieve relevant chunks with optional reranking."""
+        return self.batch_retrieve([query], k=k, use_reranking=use_reranking)[0]
+    
+    @traced
     def ask_sequential(
         self,
         document_metadata: str,
@@ -166,29 +409,50 @@ class SimpleRAGPipeline:
         few_shot_path: Optional[str] = None,
         few_shot_examples: Optional[List[Dict]] = None,
         metadata_dict: Optional[Dict] = None,
+        prefetch_retrieval: bool = True,
     ) -> List[str]:
-        """Answer questions sequentially, using previous answers as context."""
+        """Answer questions sequentially, using previous answers as context.
+
+        Retrieval depends only on the question text, so with prefetch_retrieval=True all
+        retrievals and reranks run in the background while answers are generated in order.
+        """
         answers = []
         previous_context = ""
         
+        # Embed all questions in one call; the per-question retrievals below hit the query cache
+        self.embed_queries(questions)
+        
+        prefetch_executor = None
+        retrieval_futures = []
+        if prefetch_retrieval and len(questions) > 1:
+            # Each prefetch makes its own rerank call; cap the concurrency
+            prefetch_executor = ThreadPoolExecutor(max_workers=min(len(questions), MAX_PREFETCH_WORKERS))
+            retrieval_futures = [
+                prefetch_executor.submit(bind_context(self.enhanced_retrieval), question, k)
+                for question in questions
+            ]
         
-        for idx, question in enumerate(questions):
-            # Retrieve relevant chunks for this question
-            retrieved_chunks = self.enhanced_retrieval(question, k=k)
+        try:
+            for idx, question in enumerate(questions):
+                # Retrieve relevant chunks for this question
+                if retrieval_futures:
+                    retrieved_chunks = retrieval_futures[idx].result()
+                else:
+                    retrieved_chunks = self.enhanced_retrieval(question, k=k)
             
-            # Build context with metadata
-            context_parts = []
-            for i, chunk in enumerate(retrieved_chunks, 1):
-                section = chunk.get('section', 'Unknown Section')
-                score = chunk.get('relevance_score', 0)
-                context_parts.append(
-                    f"[Source {i} - {section} (Relevance: {score:.3f})]\n{chunk['text']}\n"
-                )
-            context = "\n---\n".join(context_parts)
+                # Build context with metadata; sources are listed best first. No score is shown: chunks
+                # placed by the first stage and reranked chunks have scores on different scales.
+                context_parts = []
+                for i, chunk in enumerate(retrieved_chunks, 1):
+                    section = chunk.get('section', 'Unknown Section')
+                    context_parts.append(
+                        f"[Source {i} - {section}]\n{chunk['text']}\n"
+                    )
+                context = "\n---\n".join(context_parts)
             
-            # Build prompt with previous answers as context
-            if previous_context:
-                target_prompt = f"""
+                # Build prompt with previous answers as context
+                if previous_context:
+                    target_prompt = f"""
 {document_metadata}
 
 Previous Analysis:
@@ -206,8 +470,8 @@ Building on the previous analysis, please structure your response as a single, c
 4. If the context doesn't fully answer the question, acknowledge what information is missing
 
 Answer:"""
-            else:
-                target_prompt = f"""
+                else:
+                    target_prompt = f"""
 {document_metadata}
 
 Context:
@@ -223,57 +487,61 @@ Please structure your response as a single, clear and concise paragraph followin
 
 Answer:"""
             
-            # Build chat messages with optional few-shot examples
-            messages = [
-                {
-                    "role": "system",
-                    "content": (
-                        "You are an expert Question-Answering agent that answers literary questions based on an author's publication. "
-                        "Given a source and some snippets of it as context given through RAG, solve the task at hand. "
-                        "Be precise, avoid metaphors and ambiguity, and keep a clear, explicative and factual style."
-                    ),
-                }
-            ]
+                # Build chat messages with optional few-shot examples
+                messages = [
+                    {
+                        "role": "system",
+                        "content": (
+                            "You are an expert Question-Answering agent that answers literary questions based on an author's publication. "
+                            "Given a source and some snippets of it as context given through RAG, solve the task at hand. "
+                            "Be precise, avoid metaphors and ambiguity, and keep a clear, explicative and factual style."
+                        ),
+                    }
+                ]
             
-            # Load examples if a path is provided and in-memory examples not set
-            if few_shot_examples is None and few_shot_path:
-                try:
-                    few_shot_examples = load_few_shot_examples(few_shot_path)
-                except Exception as e:
-                    print(f"Warning: Failed to load few-shot examples from {few_shot_path}: {e}")
-                    few_shot_examples = None
+                # Load examples if a path is provided and in-memory examples not set
+                if few_shot_examples is None and few_shot_path:
+                    try:
+                        few_shot_examples = load_few_shot_examples(few_shot_path)
+                    except Exception as e:
+                        print(f"Warning: Failed to load few-shot examples from {few_shot_path}: {e}")
+                        few_shot_examples = None
             
-            # Add few-shot examples (as user/assistant pairs)
-            if few_shot_examples:
-                for ex in few_shot_examples:
-                    ex_context = ex.get("context", "").strip()
-                    ex_question = ex.get("question", "").strip()
-                    ex_answer = ex.get("expected_answer", "").strip()
-                    if ex_context and ex_question and ex_answer:
-                        messages.append({
-                            "role": "user",
-                            "content": f"Context:\n{ex_context}\n\nQuestion: {ex_question}\nAnswer as per the guidelines.",
-                        })
-                        messages.append({
-                            "role": "assistant",
-                            "content": ex_answer,
-                        })
+                # Add few-shot examples (as user/assistant pairs)
+                if few_shot_examples:
+                    for ex in few_shot_examples:
+                        ex_context = ex.get("context", "").strip()
+                        ex_question = ex.get("question", "").strip()
+                        ex_answer = ex.get("expected_answer", "").strip()
+                        if ex_context and ex_question and ex_answer:
+                            messages.append({
+                                "role": "user",
+                                "content": f"Context:\n{ex_context}\n\nQuestion: {ex_question}\nAnswer as per the guidelines.",
+                            })
+                            messages.append({
+                                "role": "assistant",
+                                "content": ex_answer,
+                            })
             
-            # Add the actual target question
-            messages.append({"role": "user", "content": target_prompt})
+                # Add the actual target question
+                messages.append({"role": "user", "content": target_prompt})
             
-            response = self.openai_client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=messages,
-                temperature=0.3,
-                max_tokens=10000, 
-            )
+                response = self.openai_client.chat.completions.create(
+                    model="gpt-4o-mini",
+                    messages=messages,
+                    temperature=0.3,
+                    max_tokens=10000, 
+                )
             
-            answer = response.choices[0].message.content
-            answers.append(answer)
+                answer = response.choices[0].message.content
+                answers.append(answer)
             
-            # Update previous context for next question
-            previous_context += f"Q{idx+1}: {question}\nA{idx+1}: {answer}\n\n"
+                # Update previous context for next question
+                previous_context += f"Q{idx+1}: {question}\nA{idx+1}: {answer}\n\n"
+        finally:
+            if prefetch_executor is not None:
+                # Also on errors: cancel queued retrievals and wait for the running ones
+                prefetch_executor.shutdown(wait=True, cancel_futures=True)
             
         return answers
 
@@ -321,6 +589,8 @@ Answer:"""
         # Ensure directory exists
         os.makedirs(os.path.dirname(path), exist_ok=True)
         save_faiss_index(self.index, path)
+        if self.bm25 is not None:
+            self.bm25.save(os.path.join(os.path.dirname(path), BM25_FILE))
         print(f"Index saved to {path}")
     
     def save_metadata(self, path: str):
@@ -328,29 +598,177 @@ Answer:"""
         # Ensure directory exists
         os.makedirs(os.path.dirname(path), exist_ok=True)
         data_to_save = {
-            'chunks': self.chunks,
+            'chunks': list(self.chunks),
             'sections': self.document_sections
         }
         with open(path, 'w', encoding='utf-8') as f:
             json.dump(data_to_save, f, ensure_ascii=False, indent=2)
+        # Offset-indexed copy of the chunks for memory-mapped loading
+        write_chunk_store(data_to_save['chunks'], os.path.dirname(path))
         print(f"Metadata saved to {path}")
     
     def load_index(self, path: str):
         """Load the FAISS index from disk via indexer.py"""
-        self.index = load_faiss_index(path)
+        self.index = load_faiss_index(path, mmap=self.mmap_index)
+        bm25_path = os.path.join(os.path.dirname(path), BM25_FILE)
+        self.bm25 = BM25Index.load(bm25_path) if os.path.exists(bm25_path) else None
     
     def load_metadata(self, path: str):
-        """Load chunks and metadata from disk."""
+        """Load chunks and metadata from disk.
+
+        If an up-to-date chunk store sits next to the JSON file (and mmap_index is set), chunks are
+        read lazily from it and the section texts are not loaded at all.
+        """
+        directory = os.path.dirname(path)
+        self.close_chunk_store()
+        if (self.mmap_index and has_chunk_store(directory)
+                and os.path.getmtime(os.path.join(directory, OFFSETS_FILE)) >= os.path.getmtime(path)):
+            self.chunks = ChunkStore(directory)
+            self.document_sections = []
+            print(f"Metadata loaded from {directory} (memory-mapped chunk store)")
+            return
         with open(path, 'r', encoding='utf-8') as f:
             data = json.load(f)
         self.chunks = data.get('chunks', [])
         self.document_sections = data.get('sections', [])
         print(f"Metadata loaded from {path}")
+
+    def close_chunk_store(self):
+        """Close the memory-mapped chunk store loaded by load_metadata, if any."""
+        if isinstance(self.chunks, ChunkStore):
+            self.chunks.close()
+            self.chunks = []
+    
+
+def resolve_source_path(file_config: Dict) -> Optional[str]:
+    """Source markdown for an input.json entry, forced to pipeline/data/<basename>."""
+    doc_meta_dict = file_config.get('document_metadata') or {}
+    declared_path = file_config.get('file_path') or doc_meta_dict.get('file_path')
+    if not declared_path:
+        return None
+    return os.path.join(PIPE_DATA_DIR, os.path.basename(declared_path))
+
+
+def resolve_few_shot_path(file_config: Dict, default_few_shot: Optional[str] = None) -> Optional[str]:
+    """Few-shot path: per-file override or default in pipeline."""
+    few_shot_path = file_config.get('few_shot_examples_path') or default_few_shot
+    if few_shot_path and not os.path.isabs(few_shot_path):
+        few_shot_path = os.path.join(BASE_DIR, few_shot_path)
+    return few_shot_path
+
+
+@traced
+def build_document_index(rag: SimpleRAGPipeline, file_path: str, output_dir: str):
+    """Chunk, embed and index a source document, saving index and chunk metadata to output_dir."""
+    rag.process_document(file_path)
+    rag.save_index(os.path.join(output_dir, "document_index.faiss"))
+    rag.save_metadata(os.path.join(output_dir, "document_metadata.json"))
+
+
+@traced
+def answer_document_questions(rag: SimpleRAGPipeline, file_config: Dict, output_dir: str,
+                              few_shot_path: Optional[str] = None) -> List[Dict]:
+    """Answer an entry's questions over the loaded index and save rag_document_qa.json."""
+    file_id = file_config.get('file_id', os.path.basename(output_dir))
+    user_questions = file_config.get('questions') or None
+    doc_meta_dict = file_config.get('document_metadata') or {}
+    document_metadata = build_document_metadata_string(doc_meta_dict)
+    
+    if not user_questions:
+        print(f"Warning: No questions found for {file_id}")
+        return []
     
+    print("\n" + "="*80)
+    print(f"DOCUMENT-WIDE AUTOMATED QUESTION-ANSWER SESSION ({file_id})")
+    print("="*80 + "\n")
+    
+    answers = rag.ask_sequential(
+        document_metadata,
+        user_questions,
+        k=5,
+        few_shot_path=few_shot_path,
+        metadata_dict=doc_meta_dict,
+    )
+    
+    results = []
+    for idx, (question, answer) in enumerate(zip(user_questions, answers), start=1):
+        print(f"\n[{file_id}] Q{idx}: {question}")
+        print("-" * 40)
+        print(f"Answer: {answer}\n")
+        results.append({
+            'question': question,
+            'answer': answer,
+            'section_title': 'Document-wide',
+            'section_number': None,
+            'question_id': idx,
+        })
+    
+    output_filename = os.path.join(output_dir, "rag_document_qa.json")
+    rag.save_qa_results(results, output_filename, 'rag_only', document_metadata=doc_meta_dict)
+    return results
+
+
+def process_file_config(file_idx: int, total_files: int, file_config: Dict, openai_client,
+                        documents_base: str, default_few_shot: Optional[str] = None,
+                        index_params: Optional[Dict] = None,
+                        reranker: str = "voyage") -> List[Dict]:
+    """Run the RAG stage for one input.json entry with its own pipeline state.
+
+    Returns the QA results for the document (empty on skip or error).
+    """
+    file_id = file_config.get('file_id', f'file_{file_idx}')
+    print(f"\n{'='*80}")
+    print(f"PROCESSING {file_id.upper()} ({file_idx}/{total_files})")
+    print(f"{'='*80}")
+    
+    # One pipeline per document: chunks/index are mutable per-document state
+    rag = SimpleRAGPipeline(openai_client, index_params=index_params, reranker=reranker)
+    
+    # Output directory inside pipeline/documents
+    output_dir = os.path.join(documents_base, file_id)
+    os.makedirs(output_dir, exist_ok=True)
+    
+    few_shot_path = resolve_few_shot_path(file_config, default_few_shot)
+    file_path = resolve_source_path(file_config)
+    if not file_path:
+        print(f"Error: No file_path specified for {file_id}")
+        return []
+    if not os.path.exists(file_path):
+        print(f"Error: Source file not found in pipeline/data: {os.path.basename(file_path)}")
+        return []
+    
+    try:
+        index_path = os.path.join(output_dir, "document_index.faiss")
+        metadata_path = os.path.join(output_dir, "document_metadata.json")
+        
+        if os.path.exists(index_path) and os.path.exists(metadata_path):
+            print(f"Loading existing index and metadata for {file_id}...")
+            rag.load_index(index_path)
+            rag.load_metadata(metadata_path)
+        else:
+            build_document_index(rag, file_path, output_dir)
+        
+        return answer_document_questions(rag, file_config, output_dir, few_shot_path)
+    except Exception as e:
+        print(f"Error processing {file_id}: {str(e)}")
+        return []
+
 
 # Main execution (fixed process-all mode)
 if __name__ == "__main__":
-    import openai
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Run the RAG question-answering stage over input.json")
+    parser.add_argument("--max-workers", type=int, default=4,
+                        help="Number of documents processed concurrently (default: 4)")
+    parser.add_argument("--index-type", choices=INDEX_TYPES, default="auto",
+                        help="FAISS index type for new document indexes (default: auto)")
+    parser.add_argument("--nprobe", type=int, default=None,
+                        help="IVF lists probed per query (default: nlist / 4, at least 8)")
+    parser.add_argument("--reranker", choices=RERANKERS, default="voyage",
+                        help="Reranking backend: Voyage rerank-2 API or a local CPU cross-encoder (default: voyage)")
+    args = parser.parse_args()
+    index_params = {"index_type": args.index_type, "nprobe": args.nprobe}
     
     ROOT_DIR = os.path.abspath(os.path.join(BASE_DIR, os.pardir))
     input_file = os.path.join(BASE_DIR, "input.json")
@@ -370,100 +788,27 @@ if __name__ == "__main__":
         files_to_process = [input_data]
         print("Using legacy single file format from input.json")
     
-    # Initialize OpenAI client and pipeline
-    openai_client = openai.OpenAI()
-    rag = SimpleRAGPipeline(openai_client)
+    # Shared OpenAI client; each document gets its own pipeline in process_file_config
+    openai_client = cached_openai_client()
     
-    all_results = []
     # Default few-shot examples path in the pipeline folder
     default_few_shot = os.path.join(BASE_DIR, "few_shot_examples.json")
     if not os.path.exists(default_few_shot):
         default_few_shot = None
     
-    for file_idx, file_config in enumerate(files_to_process, 1):
-        file_id = file_config.get('file_id', f'file_{file_idx}')
-        print(f"\n{'='*80}")
-        print(f"PROCESSING {file_id.upper()} ({file_idx}/{len(files_to_process)})")
-        print(f"{'='*80}")
-        
-        # Output directory inside pipeline/documents
-        output_dir = os.path.join(documents_base, file_id)
-        os.makedirs(output_dir, exist_ok=True)
-        
-        # Config
-        user_questions = file_config.get('questions') or None
-        doc_meta_dict = file_config.get('document_metadata') or {}
-        document_metadata = build_document_metadata_string(doc_meta_dict)
-        # Few-shot path: per-file override or default in pipeline
-        few_shot_path = file_config.get('few_shot_examples_path') or default_few_shot
-        if few_shot_path and not os.path.isabs(few_shot_path):
-            few_shot_path = os.path.join(BASE_DIR, few_shot_path)
-        # Force source path to pipeline/data/<basename>
-        declared_path = file_config.get('file_path') or doc_meta_dict.get('file_path')
-        if not declared_path:
-            print(f"Error: No file_path specified for {file_id}")
-            continue
-        filename = os.path.basename(declared_path)
-        file_path = os.path.join(PIPE_DATA_DIR, filename)
-        
-        if not os.path.exists(file_path):
-            print(f"Error: Source file not found in pipeline/data: {filename}")
-            continue
-        
-        try:
-            index_path = os.path.join(output_dir, "document_index.faiss")
-            metadata_path = os.path.join(output_dir, "document_metadata.json")
-            
-            if os.path.exists(index_path) and os.path.exists(metadata_path):
-                print(f"Loading existing index and metadata for {file_id}...")
-                rag.load_index(index_path)
-                rag.load_metadata(metadata_path)
-            else:
-                print(f"Processing document: {file_path}")
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    rag.full_document_text = f.read()
-                rag.chunks = rag.smart_chunk_document(rag.full_document_text)
-                print(f"Created {len(rag.chunks)} chunks from {len(rag.document_sections)} sections")
-                embeddings = rag.create_contextualized_embeddings(rag.chunks)
-                rag.create_hybrid_index(embeddings)
-                print("Index created successfully")
-                rag.save_index(index_path)
-                rag.save_metadata(metadata_path)
-            
-            if not user_questions:
-                print(f"Warning: No questions found for {file_id}")
-                continue
-            
-            print("\n" + "="*80)
-            print("DOCUMENT-WIDE AUTOMATED QUESTION-ANSWER SESSION")
-            print("="*80 + "\n")
-            
-            answers = rag.ask_sequential(
-                document_metadata,
-                user_questions,
-                k=5,
-                few_shot_path=few_shot_path,
-                metadata_dict=doc_meta_dict,
+    # Documents are network-bound (Voyage/OpenAI), so run them on a thread pool
+    with ThreadPoolExecutor(max_workers=max(1, args.max_workers)) as executor:
+        futures = [
+            executor.submit(
+                process_file_config, file_idx, len(files_to_process), file_config,
+                openai_client, documents_base, default_few_shot, index_params, args.reranker,
             )
-            
-            results = []
-            for idx, (question, answer) in enumerate(zip(user_questions, answers), start=1):
-                print(f"\nQ{idx}: {question}")
-                print("-" * 40)
-                print(f"Answer: {answer}\n")
-                results.append({
-                    'question': question,
-                    'answer': answer,
-                    'section_title': 'Document-wide',
-                    'section_number': None,
-                    'question_id': idx,
-                })
-            
-            output_filename = os.path.join(output_dir, "rag_document_qa.json")
-            rag.save_qa_results(results, output_filename, 'rag_only', document_metadata=doc_meta_dict)
-            all_results.extend(results)
-        except Exception as e:
-            print(f"Error processing {file_id}: {str(e)}")
+            for file_idx, file_config in enumerate(files_to_process, 1)
+        ]
+        # Collect in input order so the combined file stays deterministic
+        all_results = []
+        for future in futures:
+            all_results.extend(future.result())
     
     if len(files_to_process) > 1:
         comb_path = os.path.join(BASE_DIR, "rag_qa_combined.json")
@@ -4,12 +4,20 @@
 # 2. Opinionated graph: describes the work and author using opinionated/interpretative data
 
 import json
+import logging
 import os
 from typing import Dict, List, Any, Optional
 from dataclasses import dataclass, asdict
 from enum import Enum
 from openai import OpenAI
 
+from llm_cache import CacheMissError, cached_openai_client
+from api_clients import API_ERRORS
+from pipeline_logging import get_logger
+from tracing import traced
+
+logger = get_logger("relationship_extractor")
+
 # Define entity types for type checking and relation extraction
 # Imported from entity_extractor.py but excluding methodology and reference for relation extraction
 ENTITY_TYPES = [
@@ -66,7 +74,7 @@ class WorkSchemaGenerator:
     """
     
     def __init__(self, api_key: str = None):
-        self.client = OpenAI(api_key=api_key or os.getenv("OPENAI_API_KEY"))
+        self.client = cached_openai_client(api_key=api_key or os.getenv("OPENAI_API_KEY"))
         
 
     def load_entity_extraction_result(self, file_path: str) -> Dict[str, Any]:
@@ -111,6 +119,7 @@ class WorkSchemaGenerator:
         return "\n\n".join(formatted_qa)
 
 
+    @traced
     def generate_interpretation_layer(self, entities: List[Dict[str, Any]], source_answers: Dict[int, str], document_metadata: Dict[str, Any], original_data: Dict[str, Any] = None, few_shot_path: Optional[str] = None, few_shot_examples: Optional[List[Dict[str, Any]]] = None) -> WorkGraph:
         """Generate interpretation layer using existing entities from entity_extractor.py."""
         
@@ -442,11 +451,16 @@ Use ONLY the relationship types listed above with ONLY the given entities.
                 metadata={"generation_method": "entity_based_interpretation", "source_entities_count": len(entities)}
             )
             
+        except (CacheMissError, *API_ERRORS):
+            # Rate limits and transient errors were already retried, and replay misses must fail loudly;
+            # don't save an empty graph
+            raise
         except Exception as e:
             print(f"Error generating interpretation layer: {e}")
             print(f"Response content: {response.choices[0].message.content if 'response' in locals() else 'No response received'}")
             return WorkGraph("interpretation_layer", [], [], {"error": str(e)})
 
+    @traced
     def generate_work_schemas(self, entity_extraction_file: str, few_shot_path: Optional[str] = None) -> WorkSchemaResult:
         """Generate both factual and opinionated work schemas from entity extraction results."""
         
@@ -461,7 +475,7 @@ Use ONLY the relationship types listed above with ONLY the given entities.
         if "extraction_metadata" in data and "entities" in data["extraction_metadata"]:
             entities = data["extraction_metadata"]["entities"]
         else:
-            print(f"Warning: No entities found in {entity_extraction_file}")
+            logger.warning("No entities found in %s", entity_extraction_file)
             # Try to find entities in other locations
             if "entities" in data:
                 entities = data["entities"]
@@ -470,7 +484,7 @@ Use ONLY the relationship types listed above with ONLY the given entities.
         if "extraction_metadata" in data and "source_answers" in data["extraction_metadata"]:
             source_answers = data["extraction_metadata"]["source_answers"]
         else:
-            print(f"Warning: No source answers found in extraction_metadata for {entity_extraction_file}")
+            logger.warning("No source answers found in extraction_metadata for %s", entity_extraction_file)
             # Try to find source answers in other locations
             if "source_answers" in data:
                 source_answers = data["source_answers"]
@@ -490,11 +504,11 @@ Use ONLY the relationship types listed above with ONLY the given entities.
         
         # First try to get metadata from document_metadata (this is the primary location)
         if "document_metadata" in data:
-            print(f"Found document metadata in 'document_metadata' key")
+            logger.debug("Found document metadata in 'document_metadata' key")
             document_metadata.update(data["document_metadata"])
         # If not found, try other possible locations
         elif "metadata" in data and any(k in data["metadata"] for k in ["title", "authors", "date"]):
-            print(f"Found document metadata in 'metadata' key")
+            logger.debug("Found document metadata in 'metadata' key")
             # Only update with relevant fields
             for field in ["title", "authors", "date"]:
                 if field in data["metadata"]:
@@ -505,13 +519,13 @@ Use ONLY the relationship types listed above with ONLY the given entities.
             base_filename = os.path.basename(entity_extraction_file)
             document_metadata["title"] = os.path.splitext(base_filename)[0]
             
-        print(f"Document metadata: {document_metadata}")
+        logger.debug("Document metadata: %s", document_metadata)
 
         
-        # Debug print statements
-        print(f"Found {len(entities)} entities and {len(source_answers)} source answers")
+        # Debug messages
+        logger.info("Found %d entities and %d source answers", len(entities), len(source_answers))
         if source_answers:
-            print(f"Sample source answer keys: {list(source_answers.keys())[:5]}")
+            logger.debug("Sample source answer keys: %s", list(source_answers.keys())[:5])
         
         # Format Q&A for debugging (full output)
         formatted_qa = self._format_questions_and_answers(data, source_answers)
@@ -521,11 +535,12 @@ Use ONLY the relationship types listed above with ONLY the given entities.
         try:
             with open(qa_file, "w", encoding="utf-8") as fqa:
                 fqa.write(formatted_qa)
-            print(f"Saved full Q&A to {qa_file}")
+            logger.debug("Saved full Q&A to %s", qa_file)
         except Exception as e:
-            print(f"Could not write full Q&A file: {e}")
-        # Print the full Q&A to console
-        print("\nFULL Q&A:\n" + formatted_qa + "\n")
+            logger.warning("Could not write full Q&A file: %s", e)
+        # Print the full Q&A to console (it is in debug/full_qa.txt as well)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("FULL Q&A:\n%s\n", formatted_qa)
         
         if few_shot_path is None:
             default_fs = os.path.join(os.path.dirname(__file__), "few_shot_examples_relations.json")
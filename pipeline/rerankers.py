@@ -0,0 +1,106 @@
+# Second-stage rerankers for the RAG retriever
+# VoyageReranker calls the Voyage rerank API; CrossEncoderReranker scores (query, chunk) pairs locally
+# on CPU with a sentence-transformers cross-encoder (optional dependency, imported on first use).
+# Both return [(candidate position, relevance score)] best first.
+#
+# rerank_window decides from the first-stage scores which part of a candidate list reranking can
+# still change, so rerank calls are only made (and only paid for) where they matter.
+
+import threading
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+RERANKERS = ("voyage", "cross-encoder")
+VOYAGE_RERANK_MODEL = "rerank-2"
+DEFAULT_CROSS_ENCODER = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+
+# Gap (as a fraction of the candidates' score spread) treated as a clear separation
+DEFAULT_RERANK_MARGIN = 0.15
+
+
+class VoyageReranker:
+    """Voyage rerank API."""
+
+    def __init__(self, client, model: str = VOYAGE_RERANK_MODEL):
+        self.client = client
+        self.model = model
+
+    def rerank(self, query: str, documents: Sequence[str], top_k: int) -> List[Tuple[int, float]]:
+        results = self.client.rerank(query=query, documents=list(documents), model=self.model, top_k=top_k)
+        return [(result.index, result.relevance_score) for result in results.results]
+
+
+class CrossEncoderReranker:
+    """Local cross-encoder on CPU; the model is loaded on first use and shared between threads."""
+
+    def __init__(self, model_name: str = DEFAULT_CROSS_ENCODER, batch_size: int = 32):
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self._model = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        with self._lock:
+            if self._model is None:
+                try:
+                    from sentence_transformers import CrossEncoder
+                except ImportError as e:
+                    raise ImportError(
+                        "The cross-encoder reranker needs sentence-transformers "
+                        "(pip install sentence-transformers)"
+                    ) from e
+                self._model = CrossEncoder(self.model_name, device="cpu")
+        return self._model
+
+    def rerank(self, query: str, documents: Sequence[str], top_k: int) -> List[Tuple[int, float]]:
+        model = self._load()
+        with self._lock:
+            scores = np.asarray(model.predict([(query, doc) for doc in documents], batch_size=self.batch_size))
+        order = np.argsort(-scores, kind='stable')[:top_k]
+        return [(int(i), float(scores[i])) for i in order]
+
+
+def make_reranker(name: str = "voyage", voyage_client=None, model: Optional[str] = None):
+    """Reranker by name ("voyage" or "cross-encoder"); model overrides the default model of the backend."""
+    if name == "voyage":
+        return VoyageReranker(voyage_client, model=model or VOYAGE_RERANK_MODEL)
+    if name == "cross-encoder":
+        return CrossEncoderReranker(model_name=model or DEFAULT_CROSS_ENCODER)
+    raise ValueError(f"Unknown reranker '{name}'; expected one of {RERANKERS}")
+
+
+def rerank_window(scores: Sequence[float], k: int, margin: float = DEFAULT_RERANK_MARGIN,
+                  drop_tail: bool = True) -> Tuple[int, int]:
+    """Part of a first-stage ranking (scores best first) that reranking could still change.
+
+    Gaps are compared with margin * (best - worst score), so the policy works the same for cosine
+    similarities and fused RRF scores. Returns (fixed, end):
+    - candidates[:fixed] keep their first-stage order: each one is separated by more than the
+      margin from every candidate below it;
+    - candidates[fixed:end] are reranked for the remaining k - fixed places;
+    - candidates[end:] score more than the margin below the k-th candidate and are dropped.
+    fixed == min(k, len(scores)) means the first-stage top-k is final and no rerank is needed.
+
+    With drop_tail=False, end is always len(scores). Use it for fused (RRF) scores: a chunk found by only
+    one retriever scores low after fusion even when it is that retriever's best hit, so it must stay
+    in the window for the reranker to judge.
+    """
+    n = len(scores)
+    k = min(k, n)
+    if k == 0:
+        return 0, 0
+    s = np.asarray(scores, dtype='float64')
+    spread = s[0] - s[-1]
+    if spread <= 0:
+        return 0, n
+    threshold = margin * spread
+
+    fixed = 0
+    while fixed < k and fixed + 1 < n and s[fixed] - s[fixed + 1] > threshold:
+        fixed += 1
+    end = max(k, int(np.count_nonzero(s >= s[k - 1] - threshold))) if drop_tail else n
+    if end - fixed <= 1:
+        # At most one candidate left for the remaining place: nothing to reorder
+        fixed = k
+    return fixed, end
@@ -0,0 +1,452 @@
+# Incremental pipeline runner
+# Runs rag-retriever -> entity_extractor -> relationship_extractor -> interpretation_extractor
+# -> digital_hermeneutics_generator per document, like make: each stage records a content
+# fingerprint of its inputs in documents/<file_id>/stage_fingerprints.json and is only
+# re-executed when that fingerprint changes or one of its outputs is missing.
+#
+# Stages and the inputs they are fingerprinted on:
+# - index:          source markdown, embedding model settings
+# - qa:             chunk index, questions, bibliographic string, few-shot answers
+# - entities:       rag_document_qa.json, metadata used in the extraction prompt
+# - relations:      entities.json, few-shot relations
+# - interpretation: entities.json, relations.json, rag_document_qa.json, title/authors/date
+# - nanopub:        relations.json, interpretation.json, the full input.json entry
+
+import argparse
+import hashlib
+import importlib.util
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from pipeline_logging import add_logging_arguments, configure_logging_from_args
+from tracing import (bind_context, configure_tracing, document, get_tracer, load_trace, print_trace_summary, span,
+                     summarize_trace)
+from utils import build_document_metadata_string
+
+BASE_DIR = os.path.abspath(os.path.dirname(__file__))
+DOCUMENTS_DIR = os.path.join(BASE_DIR, "documents")
+INPUT_FILE = os.path.join(BASE_DIR, "input.json")
+DATA_DIR = os.path.join(BASE_DIR, "data")
+FINGERPRINTS_FILE = "stage_fingerprints.json"
+
+STAGES = ["index", "qa", "entities", "relations", "interpretation", "nanopub"]
+
+# Output files of each stage, relative to documents/<file_id>/
+STAGE_OUTPUTS = {
+    "index": ["document_index.faiss", "document_metadata.json"],
+    "qa": ["rag_document_qa.json"],
+    "entities": ["entities.json"],
+    "relations": ["relations.json"],
+    "interpretation": ["interpretation.json"],
+    "nanopub": ["nanopub.trig"],
+}
+
+# Bump a stage's version to invalidate its outputs after a code change
+STAGE_VERSIONS = {stage: 1 for stage in STAGES}
+
+
+def hash_file(path: Optional[str]) -> Optional[str]:
+    """sha256 of a file's bytes, or None if it does not exist."""
+    if not path or not os.path.exists(path):
+        return None
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def fingerprint(stage: str, inputs: Dict[str, Any]) -> str:
+    payload = json.dumps({"stage": stage, "version": STAGE_VERSIONS[stage], "inputs": inputs},
+                         sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def load_fingerprints(doc_dir: str) -> Dict[str, Any]:
+    path = os.path.join(doc_dir, FINGERPRINTS_FILE)
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except Exception as e:
+        print(f"Warning: Ignoring unreadable {path}: {e}")
+        return {}
+
+
+def save_fingerprints(doc_dir: str, records: Dict[str, Any]) -> None:
+    path = os.path.join(doc_dir, FINGERPRINTS_FILE)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(records, f, indent=2, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def _load_rag_module():
+    """Import rag-retriever.py (its file name is not a valid module name)."""
+    spec = importlib.util.spec_from_file_location("rag_retriever", os.path.join(BASE_DIR, "rag-retriever.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+class PipelineRunner:
+    """Plans and runs the stages whose input fingerprints changed."""
+
+    def __init__(self, input_file: str = INPUT_FILE, documents_dir: str = DOCUMENTS_DIR,
+                 force: bool = False, dry_run: bool = False, adopt_existing: bool = False,
+                 max_workers: int = 4, data_dir: str = DATA_DIR, rag_options: Optional[Dict[str, Any]] = None):
+        with open(input_file, "r", encoding="utf-8") as f:
+            input_data = json.load(f)
+        self.input_file = input_file
+        self.entries = input_data.get("files") if isinstance(input_data.get("files"), list) else [input_data]
+        self.documents_dir = documents_dir
+        self.force = force
+        self.dry_run = dry_run
+        self.adopt_existing = adopt_existing
+        self.max_workers = max(1, max_workers)
+        self.data_dir = data_dir
+        # Extra SimpleRAGPipeline arguments (e.g. embeddings_cache_dir)
+        self.rag_options = dict(rag_options or {})
+        self._rag_module = None
+        self._openai_client = None
+        self._entity_extractor = None
+        default_few_shot = os.path.join(BASE_DIR, "few_shot_examples.json")
+        self.default_few_shot = default_few_shot if os.path.exists(default_few_shot) else None
+        self.few_shot_relations = os.path.join(BASE_DIR, "few_shot_examples_relations.json")
+
+    # ---------------------------
+    # Lazily built stage helpers
+    # ---------------------------
+
+    @property
+    def rag_module(self):
+        if self._rag_module is None:
+            self._rag_module = _load_rag_module()
+        return self._rag_module
+
+    @property
+    def openai_client(self):
+        if self._openai_client is None:
+            from llm_cache import cached_openai_client
+            self._openai_client = cached_openai_client()
+        return self._openai_client
+
+    @property
+    def entity_extractor(self):
+        if self._entity_extractor is None:
+            from entity_extractor import FirstExtractor
+            self._entity_extractor = FirstExtractor(input_metadata_file=self.input_file)
+        return self._entity_extractor
+
+    def doc_dir(self, entry: Dict[str, Any]) -> str:
+        return os.path.join(self.documents_dir, entry["file_id"])
+
+    def source_path(self, entry: Dict[str, Any]) -> Optional[str]:
+        meta = entry.get("document_metadata") or {}
+        declared = entry.get("file_path") or meta.get("file_path")
+        return os.path.join(self.data_dir, os.path.basename(declared)) if declared else None
+
+    # ---------------------------
+    # Stage inputs
+    # ---------------------------
+
+    def stage_inputs(self, stage: str, entry: Dict[str, Any]) -> Dict[str, Any]:
+        ddir = self.doc_dir(entry)
+        meta = entry.get("document_metadata") or {}
+        if stage == "index":
+            return {
+                "source": hash_file(self.source_path(entry)),
+                "embedding": [self.rag_module.EMBEDDING_MODEL, self.rag_module.EMBEDDING_DIMENSION],
+                "chunking": [self.rag_module.DEFAULT_CHUNK_TOKENS, self.rag_module.DEFAULT_OVERLAP_TOKENS],
+                "index_params": self.rag_options.get("index_params") or {},
+            }
+        if stage == "qa":
+            few_shot = self.rag_module.resolve_few_shot_path(entry, self.default_few_shot)
+            return {
+                "index": hash_file(os.path.join(ddir, "document_index.faiss")),
+                "chunks": hash_file(os.path.join(ddir, "document_metadata.json")),
+                "questions": entry.get("questions") or [],
+                "bibliographic_string": build_document_metadata_string(meta),
+                "few_shot": hash_file(few_shot),
+            }
+        if stage == "entities":
+            return {
+                "qa": hash_file(os.path.join(ddir, "rag_document_qa.json")),
+                "prompt": self.entity_extractor._format_extraction_prompt(entry["file_id"]),
+            }
+        if stage == "relations":
+            return {
+                "entities": hash_file(os.path.join(ddir, "entities.json")),
+                "few_shot": hash_file(self.few_shot_relations),
+            }
+        if stage == "interpretation":
+            return {
+                "entities": hash_file(os.path.join(ddir, "entities.json")),
+                "relations": hash_file(os.path.join(ddir, "relations.json")),
+                "qa": hash_file(os.path.join(ddir, "rag_document_qa.json")),
+                "metadata": {key: meta.get(key) for key in ("title", "authors", "authors_list", "date")},
+            }
+        if stage == "nanopub":
+            return {
+                "relations": hash_file(os.path.join(ddir, "relations.json")),
+                "interpretation": hash_file(os.path.join(ddir, "interpretation.json")),
+                "entry": entry,
+            }
+        raise ValueError(f"Unknown stage: {stage}")
+
+    def outputs_exist(self, stage: str, entry: Dict[str, Any]) -> bool:
+        ddir = self.doc_dir(entry)
+        return all(os.path.exists(os.path.join(ddir, name)) for name in STAGE_OUTPUTS[stage])
+
+    # ---------------------------
+    # Stage execution
+    # ---------------------------
+
+    # Each _run_<stage> returns the file_ids whose stage succeeded; a failure in one document does not stop the others
+
+    def _run_index(self, entries: List[Dict[str, Any]]) -> List[str]:
+        rag_module = self.rag_module
+
+        def run(entry):
+            rag = rag_module.SimpleRAGPipeline(self.openai_client, **self.rag_options)
+            rag_module.build_document_index(rag, self.source_path(entry), self.doc_dir(entry))
+
+        return self._run_concurrently(run, entries)
+
+    def _run_qa(self, entries: List[Dict[str, Any]]) -> List[str]:
+        rag_module = self.rag_module
+
+        def run(entry):
+            ddir = self.doc_dir(entry)
+            rag = rag_module.SimpleRAGPipeline(self.openai_client, **self.rag_options)
+            rag.load_index(os.path.join(ddir, "document_index.faiss"))
+            rag.load_metadata(os.path.join(ddir, "document_metadata.json"))
+            few_shot = rag_module.resolve_few_shot_path(entry, self.default_few_shot)
+            rag_module.answer_document_questions(rag, entry, ddir, few_shot)
+
+        return self._run_concurrently(run, entries)
+
+    def _run_entities(self, entries: List[Dict[str, Any]]) -> List[str]:
+        from entity_extractor import save_and_report
+        extractor = self.entity_extractor
+        qa_paths = {e["file_id"]: os.path.join(self.doc_dir(e), "rag_document_qa.json") for e in entries}
+        outcomes = extractor.extract_from_files(list(qa_paths.values()))
+
+        def run(entry):
+            qa_path = qa_paths[entry["file_id"]]
+            outcome = outcomes[qa_path]
+            if isinstance(outcome, Exception):
+                raise outcome
+            save_and_report(extractor, outcome, qa_path, os.path.join(self.doc_dir(entry), "entities.json"))
+
+        return self._run_sequentially(run, entries)
+
+    def _run_relations(self, entries: List[Dict[str, Any]]) -> List[str]:
+        from relationship_extractor import WorkSchemaGenerator
+        generator = WorkSchemaGenerator()
+
+        def run(entry):
+            ddir = self.doc_dir(entry)
+            result = generator.generate_work_schemas(os.path.join(ddir, "entities.json"))
+            generator.save_work_schemas(result, os.path.join(ddir, "relations.json"))
+
+        return self._run_sequentially(run, entries)
+
+    def interpretation_arguments(self, entry: Dict[str, Any]) -> Dict[str, Any]:
+        """Keyword arguments of InterpretationExtractor.extract for a document."""
+        ddir = self.doc_dir(entry)
+        return {
+            "entities_path": os.path.join(ddir, "entities.json"),
+            "relations_path": os.path.join(ddir, "relations.json"),
+            "document_metadata_path": os.path.join(ddir, "document_metadata.json"),
+            "qa_path": os.path.join(ddir, "rag_document_qa.json"),
+            "document_metadata": entry.get("document_metadata") or {},
+        }
+
+    def _run_interpretation(self, entries: List[Dict[str, Any]]) -> List[str]:
+        from interpretation_extractor import InterpretationExtractor
+        extractor = InterpretationExtractor()
+
+        def run(entry):
+            result = extractor.extract(**self.interpretation_arguments(entry))
+            with open(os.path.join(self.doc_dir(entry), "interpretation.json"), "w", encoding="utf-8") as f:
+                json.dump({"hico": result.to_dict()}, f, indent=2, ensure_ascii=False)
+
+        return self._run_sequentially(run, entries)
+
+    def _run_nanopub(self, entries: List[Dict[str, Any]]) -> List[str]:
+        from digital_hermeneutics_generator import generate_document_trig
+
+        def run(entry):
+            generate_document_trig(self.doc_dir(entry), entry["file_id"], entry)
+
+        return self._run_sequentially(run, entries)
+
+    def _run_sequentially(self, fn: Callable[[Dict[str, Any]], None], entries: List[Dict[str, Any]]) -> List[str]:
+        succeeded = []
+        for entry in entries:
+            try:
+                with document(entry["file_id"]):
+                    fn(entry)
+            except Exception as e:
+                print(f"Error in {entry['file_id']}: {e}")
+            else:
+                succeeded.append(entry["file_id"])
+        return succeeded
+
+    def _run_concurrently(self, fn: Callable[[Dict[str, Any]], None], entries: List[Dict[str, Any]]) -> List[str]:
+        def run_entry(entry):
+            with document(entry["file_id"]):
+                fn(entry)
+
+        # Worker threads keep the stage span as parent of their spans
+        run_entry = bind_context(run_entry)
+        succeeded = []
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = [(entry, executor.submit(run_entry, entry)) for entry in entries]
+            for entry, future in futures:
+                try:
+                    future.result()
+                except Exception as e:
+                    print(f"Error in {entry['file_id']}: {e}")
+                else:
+                    succeeded.append(entry["file_id"])
+        return succeeded
+
+    # ---------------------------
+    # Planning
+    # ---------------------------
+
+    def select_entries(self, document_ids: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        return [e for e in self.entries if e.get("file_id") and (not document_ids or e["file_id"] in document_ids)]
+
+    def plan_stage(self, stage: str, entries: List[Dict[str, Any]],
+                   records: Dict[str, Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], Dict[str, str]]:
+        """Entries whose stage must run, and the current fingerprint of every considered entry."""
+        dirty = []
+        current = {}
+        for entry in entries:
+            file_id = entry["file_id"]
+            if stage == "index" and not os.path.exists(self.source_path(entry) or ""):
+                print(f"[{stage}] {file_id}: source markdown missing, skipping")
+                continue
+            fp = fingerprint(stage, self.stage_inputs(stage, entry))
+            current[file_id] = fp
+            recorded = (records[file_id].get(stage) or {}).get("fingerprint")
+            outputs_ok = self.outputs_exist(stage, entry)
+            if recorded is None and outputs_ok and self.adopt_existing and not self.force:
+                print(f"[{stage}] {file_id}: adopting existing outputs")
+                self._record(entry, stage, fp, records)
+            elif self.force or recorded != fp or not outputs_ok:
+                dirty.append(entry)
+            else:
+                print(f"[{stage}] {file_id}: up to date")
+        return dirty, current
+
+    def pending(self, stage: str, document_ids: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        """Entries the next run(stage) would execute (batch_runner collects their requests first)."""
+        entries = self.select_entries(document_ids)
+        records = {e["file_id"]: load_fingerprints(self.doc_dir(e)) for e in entries}
+        return self.plan_stage(stage, entries, records)[0]
+
+    def run(self, stages: List[str], document_ids: Optional[List[str]] = None) -> Dict[str, List[str]]:
+        """Run the selected stages in order; returns the file_ids executed per stage.
+
+        Only documents whose stage succeeded get its fingerprint recorded; documents that failed a stage are
+        left out of the later stages of this run, so they never build on stale outputs.
+        """
+        entries = self.select_entries(document_ids)
+        records = {e["file_id"]: load_fingerprints(self.doc_dir(e)) for e in entries}
+        executed: Dict[str, List[str]] = {}
+
+        for stage in [s for s in STAGES if s in stages]:
+            dirty, current = self.plan_stage(stage, entries, records)
+            executed[stage] = [e["file_id"] for e in dirty]
+            if not dirty:
+                continue
+            print(f"[{stage}] running for: {', '.join(executed[stage])}")
+            if self.dry_run:
+                continue
+
+            started = time.time()
+            succeeded = set()
+            try:
+                with span(f"stage.{stage}", kind="stage", documents=executed[stage]):
+                    succeeded.update(getattr(self, f"_run_{stage}")(dirty))
+            except Exception as e:
+                print(f"[{stage}] failed: {e}")
+            print(f"[{stage}] finished in {time.time() - started:.1f}s")
+
+            failed = []
+            for entry in dirty:
+                if entry["file_id"] not in succeeded:
+                    # Its outputs, if any, are from an earlier run and do not match the current inputs
+                    failed.append(entry["file_id"])
+                elif self.outputs_exist(stage, entry):
+                    # Upstream outputs are final now, so the fingerprint taken before running still holds
+                    self._record(entry, stage, current[entry["file_id"]], records)
+                else:
+                    print(f"[{stage}] {entry['file_id']}: outputs missing after run, not recording")
+                    failed.append(entry["file_id"])
+            if failed:
+                print(f"[{stage}] failed for: {', '.join(failed)}; skipping their later stages")
+                entries = [e for e in entries if e["file_id"] not in failed]
+
+        return executed
+
+    def _record(self, entry: Dict[str, Any], stage: str, fp: str, records: Dict[str, Dict[str, Any]]) -> None:
+        file_id = entry["file_id"]
+        records[file_id][stage] = {
+            "fingerprint": fp,
+            "outputs": STAGE_OUTPUTS[stage],
+            "completed_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        }
+        save_fingerprints(self.doc_dir(entry), records[file_id])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Incrementally run the digital hermeneutics pipeline")
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=STAGES,
+                        help="Stages to consider (default: all, in pipeline order)")
+    parser.add_argument("--documents", nargs="+", default=None,
+                        help="Restrict to these file_ids from input.json")
+    parser.add_argument("--input", default=INPUT_FILE, help="Path to input.json")
+    parser.add_argument("--force", action="store_true", help="Re-run selected stages regardless of fingerprints")
+    parser.add_argument("--dry-run", action="store_true", help="Only print which stages would run")
+    parser.add_argument("--adopt-existing", action="store_true",
+                        help="Record fingerprints for existing outputs that have none instead of re-running")
+    parser.add_argument("--max-workers", type=int, default=4, help="Concurrent documents for RAG stages")
+    parser.add_argument("--trace", default=None,
+                        help="Write tracing spans to this JSONL file and print a summary (default: PIPELINE_TRACE)")
+    add_logging_arguments(parser)
+    args = parser.parse_args()
+    configure_logging_from_args(args)
+
+    if args.trace:
+        configure_tracing(args.trace)
+
+    runner = PipelineRunner(
+        input_file=args.input,
+        force=args.force,
+        dry_run=args.dry_run,
+        adopt_existing=args.adopt_existing,
+        max_workers=args.max_workers,
+    )
+    executed = runner.run(args.stages, args.documents)
+    ran = {stage: ids for stage, ids in executed.items() if ids}
+    print("\nNothing to do." if not ran else "\nExecuted: " + "; ".join(f"{s}={len(ids)}" for s, ids in ran.items()))
+    if ran and not args.dry_run:
+        from api_clients import shared_api_layer
+        shared_api_layer().print_metrics()
+    tracer = get_tracer()
+    if tracer is not None:
+        print(f"\nTrace written to {tracer.path} (run {tracer.run_id})")
+        print_trace_summary(summarize_trace(load_trace(tracer.path, tracer.run_id), top=10))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+# Synthetic interpretation layers for scaling tests
+# Generates relations.json-shaped payloads (work_schema_metadata.interpretation_layer.nodes / relations)
+# of any size, with the node-type and relation-type mix of the real documents/*/relations.json files.
+# Every relation type handled by CidocEventGroupGenerator occurs, so all event clusters are exercised.
+# Sources are drawn with a Zipf-like skew: as in the real graphs, a few hub works and persons take part in
+# many relations, which gives the large event groups that quadratic code paths trip over.
+#
+# Usage:
+#   python synthetic_graph.py --nodes 10000 --relations 100000 --output synthetic_relations.json
+
+import argparse
+import itertools
+import json
+import random
+from typing import Any, Dict, List, Tuple
+
+# Relative frequency of node types (from the real relations.json files)
+NODE_TYPE_WEIGHTS: Dict[str, float] = {
+    "concept": 37, "work": 11, "date": 11, "person": 10, "place": 10, "organization": 7, "methodology": 4,
+    "group": 3, "characteristic": 2, "historical_context": 2, "genre": 2, "language": 2, "role": 2, "reference": 1,
+}
+
+# relation_type: (relative frequency, source types, target types)
+# Frequencies follow the real files; types they lack (e.g. date_of_death) get a small weight.
+RELATION_SPECS: Dict[str, Tuple[float, Tuple[str, ...], Tuple[str, ...]]] = {
+    "has_theme": (26, ("work",), ("concept",)),
+    "refers_to": (9, ("work", "person"), ("work", "person", "concept", "place", "reference")),
+    "influenced_by": (9, ("work", "person", "concept"), ("person", "work", "concept", "historical_context", "organization")),
+    "has_characteristic": (7, ("work",), ("characteristic", "concept")),
+    "created_during": (5, ("work",), ("date", "historical_context")),
+    "created_by": (4, ("work",), ("person",)),
+    "has_occupation": (3, ("person",), ("role", "concept")),
+    "has_genre": (2, ("work",), ("genre",)),
+    "lived_in": (2, ("person",), ("place",)),
+    "created_at": (2, ("work",), ("place",)),
+    "created_in": (1, ("work",), ("place",)),
+    "speaks_language": (1, ("person",), ("language",)),
+    "has_expertise_in": (1, ("person",), ("concept", "language", "genre")),
+    "associated_with": (1, ("person", "work"), ("organization", "group", "concept")),
+    "has_role": (1, ("person",), ("role",)),
+    "place_of_birth": (1, ("person",), ("place",)),
+    "date_of_birth": (1, ("person",), ("date",)),
+    "place_of_death": (1, ("person",), ("place",)),
+    "date_of_death": (0.5, ("person",), ("date",)),
+    "located_in_time": (1, ("work", "person"), ("date",)),
+    "located_in_space": (1, ("work", "person"), ("place",)),
+}
+
+# Share of relations that are established facts (the rest are authorial arguments)
+ESTABLISHED_FACT_SHARE = 0.08
+
+_SYLLABLES = ["rey", "naert", "isen", "grim", "bruun", "tiece", "lijn", "cant", "ecleer", "gent", "brugge",
+              "wil", "lem", "aer", "nout", "bou", "delo", "ver", "meer", "hulst", "mar", "tijn", "cister", "ciën"]
+_CERTAINTY = ["high", "medium", "low"]
+_EVIDENCE = ["TextualAnalysis", "HistoricalRecord", "LinguisticEvidence", "CodicologicalEvidence"]
+
+
+def _name(rng: random.Random, node_type: str, index: int) -> str:
+    word = "".join(rng.choice(_SYLLABLES) for _ in range(rng.randint(2, 3))).capitalize()
+    if node_type == "date":
+        return str(1100 + index % 400) if index < 400 else f"{1100 + index % 400} ({index})"
+    return f"{word} {node_type.replace('_', ' ')} {index}"
+
+
+def _zipf_weights(n: int, exponent: float) -> List[float]:
+    """Cumulative weights of ranks 1..n for random.choices (cum_weights)."""
+    return list(itertools.accumulate(1.0 / (rank ** exponent) for rank in range(1, n + 1)))
+
+
+def synthetic_interpretation_layer(n_nodes: int = 10_000, n_relations: int = 100_000, seed: int = 0,
+                                   hub_exponent: float = 1.0) -> Dict[str, Any]:
+    """A relations.json-shaped payload with n_nodes nodes and n_relations relations (deterministic per seed).
+
+    hub_exponent sets the Zipf skew of relation sources (0: uniform; 1: a few hubs dominate).
+    """
+    rng = random.Random(seed)
+    types = list(NODE_TYPE_WEIGHTS)
+    type_cum = list(itertools.accumulate(NODE_TYPE_WEIGHTS[t] for t in types))
+
+    # Every type that relations need gets at least one node
+    needed = sorted({t for _, sources, targets in RELATION_SPECS.values() for t in sources + targets})
+    node_types = needed + rng.choices(types, cum_weights=type_cum, k=max(0, n_nodes - len(needed)))
+    nodes: List[Dict[str, Any]] = []
+    by_type: Dict[str, List[str]] = {}
+    for i, node_type in enumerate(node_types[:max(n_nodes, len(needed))]):
+        node_id = f"{node_type}_{i}"
+        nodes.append({"id": node_id, "type": node_type, "name": _name(rng, node_type, i),
+                      "confidence": round(rng.uniform(0.5, 1.0), 2)})
+        by_type.setdefault(node_type, []).append(node_id)
+
+    # Candidates (and their Zipf weights) per tuple of allowed types, shared between relation types
+    pools: Dict[Tuple[str, ...], Tuple[List[str], List[float]]] = {}
+
+    def pool(allowed: Tuple[str, ...], exponent: float) -> Tuple[List[str], List[float]]:
+        key = allowed + (str(exponent),)
+        if key not in pools:
+            ids = [node_id for t in allowed for node_id in by_type.get(t, [])]
+            rng.shuffle(ids)
+            pools[key] = (ids, _zipf_weights(len(ids), exponent))
+        return pools[key]
+
+    relation_types = list(RELATION_SPECS)
+    relation_cum = list(itertools.accumulate(RELATION_SPECS[r][0] for r in relation_types))
+    relations: List[Dict[str, Any]] = []
+    for relation_type in rng.choices(relation_types, cum_weights=relation_cum, k=n_relations):
+        _, source_types, target_types = RELATION_SPECS[relation_type]
+        sources, source_cum = pool(source_types, hub_exponent)
+        targets, target_cum = pool(target_types, hub_exponent / 2)
+        source_id = rng.choices(sources, cum_weights=source_cum)[0]
+        target_id = rng.choices(targets, cum_weights=target_cum)[0]
+        properties = {"asserted_by": "Synthetic", "certainty": rng.choice(_CERTAINTY)}
+        if rng.random() < 0.4:
+            properties["evidence_type"] = rng.choice(_EVIDENCE)
+        relations.append({
+            "source_id": source_id,
+            "target_id": target_id,
+            "relation_type": relation_type,
+            "properties": properties,
+            "confidence": round(rng.uniform(0.5, 1.0), 2),
+            "claim_type": "established_fact" if rng.random() < ESTABLISHED_FACT_SHARE else "authorial_argument",
+        })
+
+    return {
+        "work_schema_metadata": {
+            "interpretation_layer": {"nodes": nodes, "relations": relations},
+            "generation_summary": {"synthetic": True, "seed": seed, "nodes": len(nodes), "relations": len(relations)},
+        }
+    }
+
+
+def synthetic_input_entry(file_id: str = "synthetic") -> Dict[str, Any]:
+    """An input.json entry to go with a synthetic payload (for generate_cidoc_trig / nanopub generation)."""
+    return {
+        "file_id": file_id,
+        "document_metadata": {
+            "type": "journal_article",
+            "title": "Synthetic interpretation layer",
+            "authors": [{"family_name": "Synthetic", "given_name": "S."}],
+            "date": "2024",
+            "container": {"type": "journal", "title": "Tiecelijn", "volume": "1"},
+        },
+        "automated_process_metadata": {"person_name": "benchmark", "llm_model_version": "synthetic"},
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write a synthetic relations.json-shaped interpretation layer")
+    parser.add_argument("--nodes", type=int, default=10_000, help="Number of nodes (default: 10000)")
+    parser.add_argument("--relations", type=int, default=100_000, help="Number of relations (default: 100000)")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed (default: 0)")
+    parser.add_argument("--hub-exponent", type=float, default=1.0, help="Zipf skew of relation sources (default: 1.0)")
+    parser.add_argument("--output", default="synthetic_relations.json", help="Output file")
+    args = parser.parse_args()
+
+    payload = synthetic_interpretation_layer(args.nodes, args.relations, seed=args.seed, hub_exponent=args.hub_exponent)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(payload, f, ensure_ascii=False, indent=2)
+    print(f"Wrote {args.nodes} nodes and {args.relations} relations to {args.output}")
@@ -0,0 +1,35 @@
+# Tests for the adaptive rerank window (rerankers.rerank_window)
+# Run from the pipeline directory: python -m pytest -q test_rerankers.py
+
+from bm25_index import reciprocal_rank_fusion
+from rerankers import rerank_window
+
+
+def _fused_repro():
+    # Chunks 0..8 are in both rankings; chunk 100 is only found by BM25, as its rank 1 (a rare proper name)
+    dense = list(range(10))
+    lexical = [100] + list(range(9))
+    return reciprocal_rank_fusion([dense, lexical], k=60)
+
+
+def test_fused_window_drops_bm25_only_hit_when_tail_is_dropped():
+    fused = _fused_repro()
+    ids = [doc_id for doc_id, _ in fused]
+    fixed, end = rerank_window([score for _, score in fused], k=5)
+    assert (fixed, end) == (0, 9)
+    assert 100 not in ids[fixed:end]
+
+
+def test_fused_window_keeps_bm25_only_hit_for_reranking():
+    fused = _fused_repro()
+    ids = [doc_id for doc_id, _ in fused]
+    fixed, end = rerank_window([score for _, score in fused], k=5, drop_tail=False)
+    assert end == len(fused)
+    assert 100 in ids[fixed:end]
+
+
+def test_clear_leader_is_fixed_and_far_tail_dropped():
+    scores = [0.95, 0.60, 0.58, 0.57, 0.56, 0.55, 0.10, 0.05]
+    fixed, end = rerank_window(scores, k=3)
+    assert fixed == 1
+    assert end == 6
@@ -0,0 +1,304 @@
+# Tracing spans for pipeline stages, functions and API calls
+# span() / @traced time a block and write one JSON line per finished span to a trace file, with its parent
+# span, the document being processed, duration, status and attributes (model, tokens, retries, cost, ...).
+# API calls get their spans from api_clients.APIClientLayer, so every OpenAI / Voyage request is attributed
+# to the stage and document that made it.
+#
+# Tracing is off unless PIPELINE_TRACE=<path.jsonl> is set or configure_tracing(path) is called; when off,
+# span() and @traced only check a global and cost next to nothing.
+#
+# Report of a trace (slowest spans, time per span name with self time, time and cost per document):
+#   python tracing.py trace.jsonl --top 20
+
+import argparse
+import contextvars
+import functools
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+TRACE_ENV = "PIPELINE_TRACE"
+
+_current_span: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar("current_span", default=None)
+_current_document: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("current_document", default=None)
+
+
+class Span:
+    """An open span; attributes set on it are written when it finishes."""
+
+    __slots__ = ("name", "kind", "span_id", "parent_id", "document_id", "attributes", "start", "_started")
+
+    def __init__(self, name: str, kind: str, parent: Optional["Span"], document_id: Optional[str],
+                 attributes: Dict[str, Any]):
+        self.name = name
+        self.kind = kind
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent.span_id if parent else None
+        self.document_id = document_id
+        self.attributes = attributes
+        self.start = time.time()
+        self._started = time.perf_counter()
+
+    def set(self, **attributes) -> None:
+        self.attributes.update(attributes)
+
+    def add(self, key: str, value: float = 1) -> None:
+        self.attributes[key] = self.attributes.get(key, 0) + value
+
+
+class _NullSpan:
+    """Stand-in yielded by span() while tracing is off."""
+
+    def set(self, **attributes) -> None:
+        pass
+
+    def add(self, key: str, value: float = 1) -> None:
+        pass
+
+
+NULL_SPAN = _NullSpan()
+
+
+class Tracer:
+    """Appends finished spans to a JSONL file; all spans of one Tracer share a run_id."""
+
+    def __init__(self, path: str, run_id: Optional[str] = None):
+        self.path = path
+        self.run_id = run_id or time.strftime("%Y%m%dT%H%M%S") + "-" + uuid.uuid4().hex[:6]
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._file = open(path, "a", encoding="utf-8")
+        self._lock = threading.Lock()
+
+    def write(self, record: Dict[str, Any]) -> None:
+        line = json.dumps(record, ensure_ascii=False, default=str)
+        with self._lock:
+            self._file.write(line + "\n")
+            self._file.flush()
+
+    def close(self) -> None:
+        with self._lock:
+            self._file.close()
+
+
+_tracer: Optional[Tracer] = None
+_tracer_checked = False
+_tracer_lock = threading.Lock()
+
+
+def configure_tracing(path: Optional[str], run_id: Optional[str] = None) -> Optional[Tracer]:
+    """Start writing spans to path (None stops tracing); returns the new tracer."""
+    global _tracer, _tracer_checked
+    with _tracer_lock:
+        if _tracer is not None:
+            _tracer.close()
+        _tracer = Tracer(path, run_id) if path else None
+        _tracer_checked = True
+        return _tracer
+
+
+def get_tracer() -> Optional[Tracer]:
+    """The active tracer; on first use it is created from PIPELINE_TRACE if set."""
+    global _tracer, _tracer_checked
+    if not _tracer_checked:
+        with _tracer_lock:
+            if not _tracer_checked:
+                path = os.getenv(TRACE_ENV)
+                _tracer = Tracer(path) if path else None
+                _tracer_checked = True
+    return _tracer
+
+
+@contextmanager
+def span(name: str, kind: str = "function", document_id: Optional[str] = None, **attributes) -> Iterator[Any]:
+    """Time the enclosed block as a child of the current span. Yields the Span (or NULL_SPAN when off)."""
+    tracer = get_tracer()
+    if tracer is None:
+        yield NULL_SPAN
+        return
+    document_id = document_id or _current_document.get()
+    current = Span(name, kind, _current_span.get(), document_id, attributes)
+    span_token = _current_span.set(current)
+    document_token = _current_document.set(document_id)
+    status, error = "ok", None
+    try:
+        yield current
+    except BaseException as e:
+        status, error = "error", f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        _current_document.reset(document_token)
+        _current_span.reset(span_token)
+        record = {
+            "run_id": tracer.run_id,
+            "span_id": current.span_id,
+            "parent_id": current.parent_id,
+            "name": current.name,
+            "kind": current.kind,
+            "document_id": current.document_id,
+            "start": round(current.start, 6),
+            "duration": round(time.perf_counter() - current._started, 6),
+            "status": status,
+        }
+        if error:
+            record["error"] = error[:500]
+        if current.attributes:
+            record["attributes"] = current.attributes
+        tracer.write(record)
+
+
+def traced(name: Optional[Any] = None, kind: str = "function"):
+    """Decorator running the function inside span(name or its qualified name). Usable as @traced or @traced(...)."""
+    def decorate(fn: Callable) -> Callable:
+        span_name = name if isinstance(name, str) else fn.__qualname__
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if get_tracer() is None:
+                return fn(*args, **kwargs)
+            with span(span_name, kind=kind):
+                return fn(*args, **kwargs)
+        return wrapper
+
+    if callable(name):
+        return decorate(name)
+    return decorate
+
+
+@contextmanager
+def document(document_id: Optional[str]) -> Iterator[None]:
+    """Attribute the spans opened inside the block to document_id."""
+    token = _current_document.set(document_id)
+    try:
+        yield
+    finally:
+        _current_document.reset(token)
+
+
+def bind_context(fn: Callable) -> Callable:
+    """fn, run in a copy of the caller's context: use for work handed to thread pools, so spans keep their parent."""
+    context = contextvars.copy_context()
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        return context.copy().run(fn, *args, **kwargs)
+    return wrapper
+
+
+async def carry_context(coro, parent: Optional[Span] = None, document_id: Optional[str] = None):
+    """Await coro with the given span and document as current (for coroutines run on another thread's loop)."""
+    _current_span.set(parent)
+    _current_document.set(document_id)
+    return await coro
+
+
+def current_context() -> Dict[str, Any]:
+    """Keyword arguments for carry_context() that reproduce the caller's span and document."""
+    return {"parent": _current_span.get(), "document_id": _current_document.get()}
+
+
+# ---------------------------
+# Report
+# ---------------------------
+
+def load_trace(path: str, run_id: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Spans of one run from a trace file (default: the last run in the file)."""
+    spans = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                try:
+                    spans.append(json.loads(line))
+                except json.JSONDecodeError:
+                    continue
+    if not spans:
+        return []
+    run_id = run_id or spans[-1]["run_id"]
+    return [s for s in spans if s["run_id"] == run_id]
+
+
+def summarize_trace(spans: List[Dict[str, Any]], top: int = 20) -> Dict[str, Any]:
+    """Slowest spans, totals per span name (with self time: duration minus children) and per document."""
+    child_time: Dict[str, float] = {}
+    for s in spans:
+        if s.get("parent_id"):
+            child_time[s["parent_id"]] = child_time.get(s["parent_id"], 0.0) + s["duration"]
+
+    by_name: Dict[str, Dict[str, Any]] = {}
+    by_document: Dict[str, Dict[str, Any]] = {}
+    for s in spans:
+        attributes = s.get("attributes") or {}
+        # Children of a span can overlap (thread pools), so self time is clipped at zero
+        self_time = max(0.0, s["duration"] - child_time.get(s["span_id"], 0.0))
+        entry = by_name.setdefault(s["name"], {"name": s["name"], "kind": s["kind"], "count": 0, "errors": 0,
+                                               "total": 0.0, "self": 0.0, "max": 0.0, "tokens": 0, "cost_usd": 0.0})
+        entry["count"] += 1
+        entry["errors"] += s["status"] != "ok"
+        entry["total"] += s["duration"]
+        entry["self"] += self_time
+        entry["max"] = max(entry["max"], s["duration"])
+        entry["tokens"] += attributes.get("total_tokens", 0) or 0
+        entry["cost_usd"] += attributes.get("cost_usd", 0.0) or 0.0
+
+        doc = by_document.setdefault(s.get("document_id") or "-", {"document_id": s.get("document_id") or "-",
+                                                                    "api_calls": 0, "api_seconds": 0.0,
+                                                                    "retries": 0, "tokens": 0, "cost_usd": 0.0})
+        if s["kind"] == "api":
+            doc["api_calls"] += 1
+            doc["api_seconds"] += s["duration"]
+            doc["retries"] += attributes.get("retries", 0)
+            doc["tokens"] += attributes.get("total_tokens", 0) or 0
+            doc["cost_usd"] += attributes.get("cost_usd", 0.0) or 0.0
+
+    roots = [s for s in spans if not s.get("parent_id")]
+    return {
+        "run_id": spans[0]["run_id"] if spans else None,
+        "spans": len(spans),
+        "wall_seconds": (max(s["start"] + s["duration"] for s in roots) - min(s["start"] for s in roots)) if roots else 0.0,
+        "slowest": sorted(spans, key=lambda s: -s["duration"])[:top],
+        "by_name": sorted(by_name.values(), key=lambda e: -e["self"]),
+        "by_document": sorted(by_document.values(), key=lambda e: -e["api_seconds"]),
+    }
+
+
+def print_trace_summary(summary: Dict[str, Any]) -> None:
+    print(f"Run {summary['run_id']}: {summary['spans']} spans, {summary['wall_seconds']:.2f}s wall")
+
+    print("\nSlowest spans:")
+    for s in summary["slowest"]:
+        attributes = s.get("attributes") or {}
+        details = ", ".join(f"{key}={attributes[key]}" for key in ("model", "total_tokens", "retries") if key in attributes)
+        print(f"  {s['duration']:9.3f}s  {s['name']:<50} {s.get('document_id') or '-':<24} {details}"
+              + (" [error]" if s["status"] != "ok" else ""))
+
+    print("\nTime by span (self = not spent in child spans):")
+    print(f"  {'name':<50}{'kind':>9}{'count':>7}{'total s':>10}{'self s':>10}{'max s':>9}{'tokens':>10}{'cost $':>9}")
+    for e in summary["by_name"]:
+        print(f"  {e['name']:<50}{e['kind']:>9}{e['count']:>7}{e['total']:>10.2f}{e['self']:>10.2f}"
+              f"{e['max']:>9.2f}{e['tokens']:>10}{e['cost_usd']:>9.4f}")
+
+    print("\nAPI time by document:")
+    for d in summary["by_document"]:
+        if d["api_calls"]:
+            print(f"  {d['document_id']:<30} {d['api_calls']:>5} calls {d['api_seconds']:>9.2f}s "
+                  f"{d['retries']:>4} retries {d['tokens']:>9} tokens ${d['cost_usd']:.4f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Summarise a pipeline trace (JSONL written with PIPELINE_TRACE)")
+    parser.add_argument("trace", help="Trace file")
+    parser.add_argument("--run", default=None, help="run_id to report (default: the last run in the file)")
+    parser.add_argument("--top", type=int, default=20, help="Number of slowest spans to list")
+    parser.add_argument("--json", action="store_true", help="Print the summary as JSON")
+    args = parser.parse_args()
+
+    summary = summarize_trace(load_trace(args.trace, args.run), top=args.top)
+    if args.json:
+        print(json.dumps(summary, indent=2, ensure_ascii=False))
+    else:
+        print_trace_summary(summary)
@@ -0,0 +1,127 @@
+# Streaming TriG / N-Quads writer for the nanopublication output
+# Writes each named graph (facts, assertion, provenance, pubInfo, head) straight to a file handle,
+# instead of serialising a whole ConjunctiveGraph and slicing graph blocks back out of the text.
+
+import io
+import re
+from typing import Dict, Iterable, List, TextIO, Tuple
+
+from rdflib import Graph, Literal, Namespace, URIRef
+from rdflib.namespace import RDF, NamespaceManager
+
+from tracing import traced
+
+NP = Namespace("http://www.nanopub.org/nschema#")
+
+# Prefixes written at the top of nanopub.trig (same order as the former hand-written header)
+NANOPUB_PREFIXES: List[Tuple[str, str]] = [
+    ("ex", "http://example.org/"),
+    ("np", "http://www.nanopub.org/nschema#"),
+    ("prov", "http://www.w3.org/ns/prov#"),
+    ("dcterms", "http://purl.org/dc/terms/"),
+    ("foaf", "http://xmlns.com/foaf/0.1/"),
+    ("fabio", "http://purl.org/spar/fabio/"),
+    ("frbr", "http://purl.org/vocab/frbr/core#"),
+    ("prism", "http://prismstandard.org/namespaces/basic/2.0/"),
+    ("crm", "http://www.cidoc-crm.org/cidoc-crm/"),
+    ("rdfs", "http://www.w3.org/2000/01/rdf-schema#"),
+    ("hico", "http://purl.org/emmedi/hico/"),
+    ("cwrc", "http://sparql.cwrc.ca/ontologies/cwrc#"),
+    ("xsd", "http://www.w3.org/2001/XMLSchema#"),
+]
+
+FORMATS = ("trig", "nquads")
+
+# Local names that can be written as prefix:local without escaping
+_LOCAL_NAME = re.compile(r"^[A-Za-z0-9_][A-Za-z0-9_\-]*$")
+
+Triple = Tuple[URIRef, URIRef, object]
+
+
+class TrigStreamWriter:
+    """Write named graphs one at a time to an open text file.
+
+    fmt="trig" groups triples by subject with prefixed names; fmt="nquads" writes one quad per line.
+    """
+
+    def __init__(self, out: TextIO, prefixes: List[Tuple[str, str]] = None, fmt: str = "trig"):
+        if fmt not in FORMATS:
+            raise ValueError(f"Unknown output format '{fmt}'; expected one of {FORMATS}")
+        self.out = out
+        self.fmt = fmt
+        self.prefixes = list(prefixes or NANOPUB_PREFIXES)
+        # Longest namespace first so nested namespaces pick the most specific prefix
+        self._by_namespace = sorted(((ns, p) for p, ns in self.prefixes), key=lambda x: -len(x[0]))
+        self._nm = NamespaceManager(Graph(), bind_namespaces="none")
+        for prefix, ns in self.prefixes:
+            self._nm.bind(prefix, ns, override=True)
+
+    def write_prefixes(self) -> None:
+        if self.fmt != "trig":
+            return
+        for prefix, ns in self.prefixes:
+            self.out.write(f"@prefix {prefix}: <{ns}> .\n")
+        self.out.write("\n")
+
+    def term(self, node) -> str:
+        if self.fmt == "nquads":
+            return node.n3()
+        if isinstance(node, Literal):
+            return node.n3(self._nm)
+        uri = str(node)
+        for ns, prefix in self._by_namespace:
+            if uri.startswith(ns) and _LOCAL_NAME.match(uri[len(ns):]):
+                return f"{prefix}:{uri[len(ns):]}"
+        return f"<{uri}>"
+
+    def write_graph(self, graph_iri: URIRef, triples: Iterable[Triple]) -> None:
+        """Write one named graph; an empty graph is still written (as an empty block in TriG)."""
+        if self.fmt == "nquads":
+            g = graph_iri.n3()
+            for s, p, o in triples:
+                self.out.write(f"{s.n3()} {p.n3()} {o.n3()} {g} .\n")
+            return
+
+        by_subject: Dict[object, Dict[object, List[object]]] = {}
+        for s, p, o in triples:
+            by_subject.setdefault(s, {}).setdefault(p, []).append(o)
+
+        self.out.write(f"{self.term(graph_iri)} {{\n")
+        for i, s in enumerate(sorted(by_subject, key=str)):
+            if i:
+                self.out.write("\n")
+            predicates = by_subject[s]
+            # rdf:type first, then the remaining predicates in a stable order
+            ordered = sorted(predicates, key=lambda p: (p != RDF.type, str(p)))
+            for j, p in enumerate(ordered):
+                pred = "a" if p == RDF.type else self.term(p)
+                objs = " ,\n            ".join(self.term(o) for o in sorted(predicates[p], key=str))
+                end = " ." if j == len(ordered) - 1 else " ;"
+                if j == 0:
+                    self.out.write(f"    {self.term(s)} {pred} {objs}{end}\n")
+                else:
+                    self.out.write(f"        {pred} {objs}{end}\n")
+        self.out.write("}\n\n")
+
+    @traced
+    def write_context(self, cg, graph_iri: URIRef) -> None:
+        """Write a named graph taken from a ConjunctiveGraph/Dataset."""
+        self.write_graph(graph_iri, cg.get_context(graph_iri).triples((None, None, None)))
+
+
+def render_graph_block(cg, graph_iri: URIRef, prefixes: List[Tuple[str, str]] = None) -> str:
+    """TriG text of a single named graph ("<iri> { ... }"), for callers that still want text blocks."""
+    buf = io.StringIO()
+    TrigStreamWriter(buf, prefixes=prefixes).write_context(cg, graph_iri)
+    return buf.getvalue().strip()
+
+
+def head_triples(ex: Namespace, doc_id: str) -> List[Triple]:
+    """Nanopublication head: links the pub node to its assertion, provenance and pubInfo graphs."""
+    pub = ex[f"pub_{doc_id}"]
+    return [
+        (pub, RDF.type, NP.Nanopublication),
+        (pub, NP.hasAssertion, ex[f"assertion_{doc_id}"]),
+        (pub, NP.hasProvenance, ex[f"provenance_{doc_id}"]),
+        (pub, NP.hasPublicationInfo, ex[f"pubInfo_{doc_id}"]),
+    ]
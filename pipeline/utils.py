@@ -1,76 +1,150 @@
-from typing import List, Dict, Optional, Tuple
+from typing import Callable, Iterable, Iterator, List, Dict, Optional, Tuple
+import io
 import os
 import json
 import re
+import threading
 
 # ---------------------------
 # Parsing and chunking utils
 # ---------------------------
 
-def extract_sections_with_footnotes(text: str) -> List[Dict]:
-    """
-    Extract sections based on markdown-style titles (# Title) and group footnotes with their sections.
-    Returns a list of section dicts with title, content, footnotes, and metadata.
-    """
-    sections: List[Dict] = []
+# Footnote references ([^12]) and definitions ([^12]: text)
+FOOTNOTE_REF_PATTERN = re.compile(r"\[\^(\d+)\]")
+FOOTNOTE_DEF_PATTERN = re.compile(r"\[\^(\d+)\]:")
 
-    # Extract all footnote definitions
-    footnote_pattern = r"\[\^(\d+)\]:\s*(.+?)(?=\n\[\^|\n\n|\Z)"
-    footnotes: Dict[int, str] = {}
-    for match in re.finditer(footnote_pattern, text, re.DOTALL):
-        footnote_num = int(match.group(1))
-        footnote_content = match.group(2).strip()
-        footnotes[footnote_num] = footnote_content
+PREAMBLE_TITLE = "Introduction/Preamble"
 
-    # Remove footnote definitions from main text
-    text_without_footnote_defs = re.sub(footnote_pattern, "", text, flags=re.DOTALL)
 
-    lines = text_without_footnote_defs.split("\n")
-    current_section: Optional[str] = None
-    current_content: List[str] = []
+def iter_document_events(lines: Iterable[str]) -> Iterator[Tuple]:
+    """
+    Parse markdown lines in a single pass, yielding events in document order:
+    ('section', title) when a section starts (at a '# Title' line, or at the first text before any title),
+    ('paragraph', text, refs) for each paragraph, with the footnote numbers it references,
+    ('footnote', number, text) for each footnote definition.
+    A footnote definition runs until a blank line or a line starting with '[^'; it is not part of any paragraph.
+    """
+    note_number: Optional[int] = None
+    note_lines: List[str] = []
+    paragraph: List[str] = []
+    started = False
 
     for line in lines:
-        if line.strip().startswith('# ') and len(line.strip()) > 2:
-            if current_section is not None:
-                section_content = '\n'.join(current_content).strip()
-                section_footnotes = extract_section_footnotes(section_content, footnotes)
-                sections.append({
-                    'title': current_section,
-                    'content': section_content,
-                    'footnotes': section_footnotes,
-                    'section_number': len(sections),
-                    'word_count': len(section_content.split()),
-                })
-            current_section = line.strip()[2:].strip()
-            current_content = [line]
-        else:
-            if current_section is not None:
-                current_content.append(line)
+        line = line.rstrip("\n")
+
+        if note_number is not None:
+            if note_lines and (line == "" or line.startswith("[^")):
+                yield ('footnote', note_number, "\n".join(note_lines).strip())
+                note_number = None
             else:
-                if not current_section and line.strip():
-                    if not sections:
-                        current_section = "Introduction/Preamble"
-                        current_content = [line]
+                # Leading whitespace (and blank lines) before the definition text is skipped
+                if note_lines or line.strip():
+                    note_lines.append(line)
+                continue
+
+        match = FOOTNOTE_DEF_PATTERN.search(line)
+        if match:
+            note_number = int(match.group(1))
+            rest = line[match.end():].strip()
+            note_lines = [rest] if rest else []
+            line = line[:match.start()]
+
+        stripped = line.strip()
+        if stripped.startswith('# ') and len(stripped) > 2:
+            if paragraph:
+                text = "\n".join(paragraph).strip()
+                yield ('paragraph', text, [int(ref) for ref in FOOTNOTE_REF_PATTERN.findall(text)])
+            started = True
+            yield ('section', stripped[2:].strip())
+            paragraph = [line]
+        elif not stripped:
+            if paragraph:
+                text = "\n".join(paragraph).strip()
+                yield ('paragraph', text, [int(ref) for ref in FOOTNOTE_REF_PATTERN.findall(text)])
+                paragraph = []
+        else:
+            if not started:
+                started = True
+                yield ('section', PREAMBLE_TITLE)
+            paragraph.append(line)
+
+    if note_number is not None:
+        yield ('footnote', note_number, "\n".join(note_lines).strip())
+    if paragraph:
+        text = "\n".join(paragraph).strip()
+        yield ('paragraph', text, [int(ref) for ref in FOOTNOTE_REF_PATTERN.findall(text)])
+
+
+def _iter_sections(events: Iterable[Tuple], footnotes: Dict[int, str],
+                   collect_footnotes: bool = True) -> Iterator[Tuple[Dict, List[int]]]:
+    """Group parse events into (section dict without footnotes, referenced footnote numbers)."""
+    title: Optional[str] = None
+    paragraphs: List[str] = []
+    refs: Dict[int, None] = {}
+    section_number = 0
+
+    def finish() -> Tuple[Dict, List[int]]:
+        content = "\n\n".join(paragraphs)
+        section = {
+            'title': title,
+            'content': content,
+            'footnotes': {},
+            'section_number': section_number,
+            'word_count': len(content.split()),
+        }
+        return section, list(refs)
+
+    for event in events:
+        kind = event[0]
+        if kind == 'section':
+            if title is not None:
+                yield finish()
+                section_number += 1
+            title, paragraphs, refs = event[1], [], {}
+        elif kind == 'paragraph':
+            paragraphs.append(event[1])
+            refs.update(dict.fromkeys(event[2]))
+        elif collect_footnotes:
+            footnotes[event[1]] = event[2]
+
+    if title is not None:
+        yield finish()
+
+
+def collect_footnotes(lines: Iterable[str]) -> Dict[int, str]:
+    """Footnote definitions (number -> text) of a document, e.g. as a first pass over a large file."""
+    return {event[1]: event[2] for event in iter_document_events(lines) if event[0] == 'footnote'}
+
+
+def iter_sections_with_footnotes(lines: Iterable[str], footnotes: Optional[Dict[int, str]] = None) -> Iterator[Dict]:
+    """
+    Yield section dicts one at a time while reading lines (e.g. an open file).
+    Without footnotes, definitions are picked up while parsing, so a section only gets the definitions
+    that precede its end; for documents with endnotes pass footnotes=collect_footnotes(...) from a first pass.
+    """
+    known = footnotes if footnotes is not None else {}
+    for section, refs in _iter_sections(iter_document_events(lines), known, collect_footnotes=footnotes is None):
+        section['footnotes'] = {ref: known[ref] for ref in refs if ref in known}
+        yield section
 
-    if current_section is not None:
-        section_content = '\n'.join(current_content).strip()
-        section_footnotes = extract_section_footnotes(section_content, footnotes)
-        sections.append({
-            'title': current_section,
-            'content': section_content,
-            'footnotes': section_footnotes,
-            'section_number': len(sections),
-            'word_count': len(section_content.split()),
-        })
 
-    return sections
+def extract_sections_with_footnotes(text: str) -> List[Dict]:
+    """
+    Extract sections based on markdown-style titles (# Title) and group footnotes with their sections.
+    Returns a list of section dicts with title, content, footnotes, and metadata.
+    """
+    footnotes: Dict[int, str] = {}
+    sections = list(_iter_sections(iter_document_events(io.StringIO(text)), footnotes))
+    # Endnotes are only known at the end of the document
+    for section, refs in sections:
+        section['footnotes'] = {ref: footnotes[ref] for ref in refs if ref in footnotes}
+    return [section for section, _ in sections]
 
 
 def extract_section_footnotes(section_content: str, all_footnotes: Dict[int, str]) -> Dict[int, str]:
     """Extract footnotes referenced in a specific section."""
     section_footnotes: Dict[int, str] = {}
-    footnote_refs = re.findall(r"\[\^(\d+)\]", section_content)
-    for ref in footnote_refs:
+    for ref in FOOTNOTE_REF_PATTERN.findall(section_content):
         footnote_num = int(ref)
         if footnote_num in all_footnotes:
             section_footnotes[footnote_num] = all_footnotes[footnote_num]
@@ -80,98 +154,261 @@ def extract_section_footnotes(section_content: str, all_footnotes: Dict[int, str
 def extract_paragraph_footnotes(paragraph: str, section_footnotes: Dict[int, str]) -> Dict[int, str]:
     """Extract footnotes referenced in a specific paragraph."""
     paragraph_footnotes: Dict[int, str] = {}
-    footnote_refs = re.findall(r"\[\^(\d+)\]", paragraph)
-    for ref in footnote_refs:
+    for ref in FOOTNOTE_REF_PATTERN.findall(paragraph):
         footnote_num = int(ref)
         if footnote_num in section_footnotes:
             paragraph_footnotes[footnote_num] = section_footnotes[footnote_num]
     return paragraph_footnotes
 
 
-def create_paragraph_chunks_with_footnotes(sections: List[Dict], min_chunk_size: int = 200) -> List[Dict]:
+# ---------------------------
+# Token counting
+# ---------------------------
+
+# voyage-context-3 input limits: tokens per document (here: the chunks of one section) and per request
+MAX_SECTION_TOKENS = 32000
+MAX_REQUEST_TOKENS = 120000
+DEFAULT_CHUNK_TOKENS = 256
+DEFAULT_OVERLAP_TOKENS = 48
+# Seconds to wait for the Hugging Face hub before falling back to estimated token counts
+TOKENIZER_HUB_TIMEOUT = 5
+
+_token_counters: Dict[str, Callable[[str], int]] = {}
+_token_counters_lock = threading.Lock()
+
+
+def estimate_tokens(text: str) -> int:
+    """Conservative token estimate (about one token per 3 characters) when no tokenizer is available."""
+    return (len(text) + 2) // 3
+
+
+def _tokenizer_file(model: str) -> str:
+    """
+    Path of a Voyage model's tokenizer.json: from the local Hugging Face cache, else (unless
+    HF_HUB_OFFLINE is set) downloaded within TOKENIZER_HUB_TIMEOUT seconds. Raises if neither works.
+    """
+    from huggingface_hub import hf_hub_download
+    repo_id = f"voyageai/{model}"
+    try:
+        return hf_hub_download(repo_id, "tokenizer.json", local_files_only=True)
+    except Exception:
+        if os.getenv("HF_HUB_OFFLINE", "").strip().lower() in ("1", "true", "yes", "on"):
+            raise
+    # The hub client retries unreachable hosts for a long time; don't block chunking on it
+    result: Dict[str, object] = {}
+
+    def download():
+        try:
+            result["path"] = hf_hub_download(repo_id, "tokenizer.json", etag_timeout=TOKENIZER_HUB_TIMEOUT)
+        except Exception as e:
+            result["error"] = e
+
+    thread = threading.Thread(target=download, daemon=True)
+    thread.start()
+    thread.join(TOKENIZER_HUB_TIMEOUT)
+    if "path" in result:
+        return result["path"]
+    raise result.get("error") or TimeoutError(f"no answer from the Hugging Face hub in {TOKENIZER_HUB_TIMEOUT}s")
+
+
+def get_token_counter(model: str = "voyage-context-3") -> Callable[[str], int]:
+    """
+    Token counter for a Voyage model: its Hugging Face tokenizer (the one voyageai uses for
+    count_tokens) when it can be loaded, otherwise estimate_tokens. See _tokenizer_file for how
+    the tokenizer is found; set HF_HUB_OFFLINE=1 to never touch the network.
+    """
+    with _token_counters_lock:
+        if model not in _token_counters:
+            try:
+                from tokenizers import Tokenizer
+                tokenizer = Tokenizer.from_file(_tokenizer_file(model))
+                _token_counters[model] = lambda text: len(tokenizer.encode(text, add_special_tokens=False).ids)
+            except Exception as e:
+                print(f"Warning: No tokenizer for {model} ({type(e).__name__}), estimating token counts")
+                _token_counters[model] = estimate_tokens
+        return _token_counters[model]
+
+
+# Sentence end: punctuation, closing quotes/brackets and footnote references, followed by whitespace
+_SENTENCE_END = re.compile(r"[.!?…]+[\"'”’»)\]]*(?:\[\^\d+\])*(?=\s)")
+
+
+def split_sentences(text: str) -> List[str]:
+    """Split text into sentences; footnote references stay with the sentence they follow."""
+    sentences: List[str] = []
+    start = 0
+    for match in _SENTENCE_END.finditer(text):
+        sentence = text[start:match.end()].strip()
+        if sentence:
+            sentences.append(sentence)
+        start = match.end()
+    tail = text[start:].strip()
+    if tail:
+        sentences.append(tail)
+    return sentences
+
+
+def _split_words(text: str, max_tokens: int, count_tokens: Callable[[str], int]) -> List[str]:
+    """Split text without usable sentence ends (tables, lists) into pieces of at most max_tokens."""
+    pieces: List[str] = []
+    current = ""
+    for word in text.split():
+        # Count the joined text, separators included; token counts of separate strings do not add up exactly
+        if current and count_tokens(f"{current} {word}") > max_tokens:
+            pieces.append(current)
+            current = ""
+        current = f"{current} {word}" if current else word
+    if current:
+        pieces.append(current)
+    return pieces
+
+
+def _chunk_units(paragraphs: List[str], max_tokens: int,
+                 count_tokens: Callable[[str], int]) -> List[Tuple[str, int, bool]]:
+    """(text, tokens, starts paragraph) units of at most max_tokens: paragraphs, else sentences, else word runs."""
+    units: List[Tuple[str, int, bool]] = []
+    for paragraph in paragraphs:
+        tokens = count_tokens(paragraph)
+        if tokens <= max_tokens:
+            units.append((paragraph, tokens, True))
+            continue
+        first = True
+        for sentence in split_sentences(paragraph):
+            sentence_tokens = count_tokens(sentence)
+            pieces = [sentence] if sentence_tokens <= max_tokens else _split_words(sentence, max_tokens, count_tokens)
+            for piece in pieces:
+                units.append((piece, sentence_tokens if len(pieces) == 1 else count_tokens(piece), first))
+                first = False
+    return units
+
+
+# ---------------------------
+# Token-aware chunking
+# ---------------------------
+
+def create_paragraph_chunks_with_footnotes(sections: List[Dict], target_tokens: int = DEFAULT_CHUNK_TOKENS,
+                                           min_tokens: Optional[int] = None,
+                                           count_tokens: Optional[Callable[[str], int]] = None) -> List[Dict]:
     """
-    Create paragraph-based chunks while preserving footnote associations.
+    Create paragraph-based chunks of at most target_tokens while preserving footnote associations.
+    Paragraphs are packed whole; longer paragraphs are split at sentence boundaries (and sentences
+    without usable boundaries at word boundaries). Sizes are counted on the joined chunk text, so the
+    separators count too. A trailing chunk under min_tokens (default: target_tokens // 8) is merged
+    into the previous chunk of its section if the result still fits; a section that is smaller than
+    that altogether (e.g. a bare heading) is skipped.
     Returns list of chunk dicts with associated footnotes and metadata.
     """
+    count_tokens = count_tokens or estimate_tokens
+    if min_tokens is None:
+        min_tokens = target_tokens // 8
     chunks_with_metadata: List[Dict] = []
 
     for section in sections:
-        section_content = section['content']
-        section_title = section['title']
-        section_number = section['section_number']
-        section_footnotes = section['footnotes']
-
-        paragraphs = re.split(r"\n\s*\n", section_content)
+        paragraphs = re.split(r"\n\s*\n", section['content'])
         paragraphs = [p.strip() for p in paragraphs if p.strip()]
 
-        current_chunk = ""
-        current_chunk_footnotes: Dict[int, str] = {}
-
-        for paragraph in paragraphs:
-            if current_chunk and len(current_chunk + "\n\n" + paragraph) > 1000:
-                if current_chunk:
-                    chunks_with_metadata.append({
-                        'text': current_chunk.strip(),
-                        'section': section_title,
-                        'section_number': section_number,
-                        'chunk_id': len(chunks_with_metadata),
-                        'footnotes': current_chunk_footnotes.copy(),
-                        'word_count': len(current_chunk.split()),
-                        'type': 'paragraph_group',
-                    })
-                current_chunk = paragraph
-                current_chunk_footnotes = extract_paragraph_footnotes(paragraph, section_footnotes)
+        # (chunk text, tokens) per chunk of this section
+        groups: List[Tuple[str, int]] = []
+        current, current_tokens, current_separator = "", 0, ""
+        for text, tokens, starts_paragraph in _chunk_units(paragraphs, target_tokens, count_tokens):
+            separator = "\n\n" if starts_paragraph else " "
+            if current:
+                joined = current + separator + text
+                joined_tokens = count_tokens(joined)
+                if joined_tokens <= target_tokens:
+                    current, current_tokens = joined, joined_tokens
+                    continue
+                groups.append((current, current_tokens))
+            current, current_tokens, current_separator = text, tokens, separator
+        if current and groups and current_tokens < min_tokens:
+            merged = groups[-1][0] + current_separator + current
+            merged_tokens = count_tokens(merged)
+            if merged_tokens <= target_tokens:
+                groups[-1] = (merged, merged_tokens)
             else:
-                if current_chunk:
-                    current_chunk += "\n\n" + paragraph
-                else:
-                    current_chunk = paragraph
-                para_footnotes = extract_paragraph_footnotes(paragraph, section_footnotes)
-                current_chunk_footnotes.update(para_footnotes)
-
-        if current_chunk and len(current_chunk.split()) >= min_chunk_size // 10:
+                groups.append((current, current_tokens))
+        elif current and (groups or current_tokens >= min_tokens):
+            groups.append((current, current_tokens))
+
+        for chunk_text, chunk_tokens in groups:
             chunks_with_metadata.append({
-                'text': current_chunk.strip(),
-                'section': section_title,
-                'section_number': section_number,
+                'text': chunk_text,
+                'section': section['title'],
+                'section_number': section['section_number'],
                 'chunk_id': len(chunks_with_metadata),
-                'footnotes': current_chunk_footnotes.copy(),
-                'word_count': len(current_chunk.split()),
+                'footnotes': extract_paragraph_footnotes(chunk_text, section['footnotes']),
+                'word_count': len(chunk_text.split()),
+                'token_count': chunk_tokens,
                 'type': 'paragraph_group',
             })
 
     return chunks_with_metadata
 
 
-def add_overlap_to_chunks(chunks: List[Dict], overlap_size: int) -> List[Dict]:
-    """Add overlapping content between consecutive chunks while preserving footnotes."""
+def add_overlap_to_chunks(chunks: List[Dict], overlap_tokens: int = DEFAULT_OVERLAP_TOKENS,
+                          count_tokens: Optional[Callable[[str], int]] = None) -> List[Dict]:
+    """
+    Prefix each chunk with the last whole sentences (at most overlap_tokens) of the previous chunk
+    of the same section, while preserving footnotes.
+    """
     if len(chunks) <= 1:
         return chunks
+    count_tokens = count_tokens or estimate_tokens
 
     overlapped_chunks: List[Dict] = []
     for i, chunk in enumerate(chunks):
         chunk_text = chunk['text']
         chunk_footnotes = chunk['footnotes'].copy()
-        if i > 0:
-            prev_chunk = chunks[i - 1]
-            prev_text = prev_chunk['text']
-            if len(prev_text) > overlap_size:
-                overlap_text = prev_text[-overlap_size:]
-                sentence_end = overlap_text.find('. ')
-                if sentence_end > overlap_size // 2:
-                    overlap_text = overlap_text[sentence_end + 2:]
-                chunk_text = overlap_text + "\n\n" + chunk_text
-                overlap_footnotes = extract_paragraph_footnotes(overlap_text, prev_chunk['footnotes'])
-                chunk_footnotes.update(overlap_footnotes)
+        overlap_text = ""
+        prev_chunk = chunks[i - 1] if i > 0 else None
+        if prev_chunk is not None and prev_chunk['section_number'] == chunk['section_number']:
+            # Take sentences from the end of the previous chunk's own text (not its overlap)
+            overlap: List[str] = []
+            overlap_size = 0
+            for sentence in reversed(split_sentences(prev_chunk['text'].split("\n\n")[-1])):
+                sentence_tokens = count_tokens(sentence)
+                if overlap_size + sentence_tokens > overlap_tokens:
+                    break
+                overlap.insert(0, sentence)
+                overlap_size += sentence_tokens
+            overlap_text = " ".join(overlap)
+        if overlap_text:
+            chunk_text = overlap_text + "\n\n" + chunk_text
+            chunk_footnotes.update(extract_paragraph_footnotes(overlap_text, prev_chunk['footnotes']))
         updated_chunk = chunk.copy()
         updated_chunk['text'] = chunk_text
         updated_chunk['footnotes'] = chunk_footnotes
         updated_chunk['word_count'] = len(chunk_text.split())
-        updated_chunk['has_overlap'] = i > 0
+        updated_chunk['token_count'] = count_tokens(chunk_text)
+        updated_chunk['has_overlap'] = bool(overlap_text)
         overlapped_chunks.append(updated_chunk)
     return overlapped_chunks
 
 
+def group_chunks_for_embedding(chunks: List[Dict], max_section_tokens: int = MAX_SECTION_TOKENS,
+                               count_tokens: Optional[Callable[[str], int]] = None) -> List[List[Dict]]:
+    """
+    Group chunks by section for contextualized embedding, splitting a section into consecutive
+    parts so that no group exceeds max_section_tokens.
+    """
+    count_tokens = count_tokens or estimate_tokens
+    groups: List[List[Dict]] = []
+    section_groups: Dict[int, List[Dict]] = {}
+    group_tokens: Dict[int, int] = {}
+    for chunk in chunks:
+        section_number = chunk['section_number']
+        tokens = chunk.get('token_count') or count_tokens(chunk['text'])
+        group = section_groups.get(section_number)
+        if group is None or group_tokens[section_number] + tokens > max_section_tokens:
+            group = []
+            groups.append(group)
+            section_groups[section_number] = group
+            group_tokens[section_number] = 0
+        group.append(chunk)
+        group_tokens[section_number] += tokens
+    return groups
+
+
 def format_chunk_with_footnotes(chunk: Dict) -> str:
     """Format a chunk with its associated footnotes for display or processing."""
     text = chunk['text']